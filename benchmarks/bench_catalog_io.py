@@ -0,0 +1,27 @@
+"""
+Benchmark for the streaming catalog import and export, in rows per second
+run from the root of the repository with: python -m benchmarks.bench_catalog_io
+"""
+import os
+import tempfile
+import time
+from src.products import Product
+from src.store import Store
+from src.catalog_io import import_catalog, export_catalog
+
+NUM_ROWS = 200000
+
+
+if __name__ == "__main__":
+    store = Store([Product.from_trusted(f"Product {i}", 10 + i, 1 + i) for i in range(NUM_ROWS)])
+    with tempfile.TemporaryDirectory() as directory:
+        for file_name in ("catalog.csv", "catalog.jsonl"):
+            path = os.path.join(directory, file_name)
+            start_time = time.perf_counter()
+            export_catalog(store, path)
+            export_rate = NUM_ROWS / (time.perf_counter() - start_time)
+            start_time = time.perf_counter()
+            report = import_catalog(path, Store([]))
+            import_rate = NUM_ROWS / (time.perf_counter() - start_time)
+            print(f"{file_name:<14} export {export_rate:10,.0f} rows/second, import {import_rate:10,.0f} rows/second"
+                  f" ({report})")
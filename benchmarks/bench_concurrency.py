@@ -0,0 +1,44 @@
+"""
+Benchmark for concurrent ordering on a thread safe store
+run from the root of the repository with: python -m benchmarks.bench_concurrency
+"""
+import threading
+import time
+from src.products import Product
+from src.store import Store
+
+NUM_PRODUCTS = 1000
+ORDERS_PER_THREAD = 20000
+
+
+def run_workers(num_threads):
+    """
+    let num_threads threads order from the same store and return the number of orders per second
+    checks at the end that no product has been oversold
+    """
+    products_list = [Product(f"Product {i}", price=10 + i, quantity=10 ** 9) for i in range(NUM_PRODUCTS)]
+    store = Store(products_list, thread_safe=True)
+
+    def worker(seed):
+        for i in range(ORDERS_PER_THREAD):
+            first = products_list[(seed * 7919 + i * 31) % NUM_PRODUCTS]
+            second = products_list[(seed * 104729 + i * 17) % NUM_PRODUCTS]
+            store.order([(first, 1), (second, 2)])
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(num_threads)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    expected_quantity = NUM_PRODUCTS * 10 ** 9 - num_threads * ORDERS_PER_THREAD * 3
+    if store.quantity != expected_quantity or store._recount_quantity() != expected_quantity:
+        raise Exception("products have been oversold or the total quantity is wrong")
+    return num_threads * ORDERS_PER_THREAD / elapsed
+
+
+if __name__ == "__main__":
+    for num_threads in (1, 2, 4, 8):
+        print(f"{num_threads} threads: {run_workers(num_threads):,.0f} orders/second")
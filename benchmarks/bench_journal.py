@@ -0,0 +1,46 @@
+"""
+Benchmark for the order journal: write throughput for different group sizes and recovery time
+for different journal lengths
+run from the root of the repository with: python -m benchmarks.bench_journal
+"""
+import tempfile
+import time
+from src.products import Product
+from src.store import Store
+from src.journal import StoreJournal, recover_store
+
+NUM_PRODUCTS = 1000
+
+
+def build_store():
+    """
+    return a store with NUM_PRODUCTS products and the list of its products
+    """
+    products_list = [Product(f"Product {i}", price=10 + i, quantity=10 ** 9) for i in range(NUM_PRODUCTS)]
+    return Store(products_list), products_list
+
+
+def write_orders(directory, num_orders, group_size):
+    """
+    order num_orders times with a journal attached, return the number of orders per second
+    """
+    store, products_list = build_store()
+    journal = StoreJournal(store, directory, group_size=group_size, max_delay=1.0)
+    start_time = time.perf_counter()
+    for i in range(num_orders):
+        store.order([(products_list[i % NUM_PRODUCTS], 1), (products_list[(i * 7) % NUM_PRODUCTS], 2)])
+    journal.close()
+    return num_orders / (time.perf_counter() - start_time)
+
+
+if __name__ == "__main__":
+    for group_size in (1, 16, 256):
+        with tempfile.TemporaryDirectory() as directory:
+            num_orders = 2000 if group_size == 1 else 50000
+            print(f"group size {group_size:>3}: {write_orders(directory, num_orders, group_size):,.0f} orders/second")
+    for num_orders in (1000, 10000, 100000):
+        with tempfile.TemporaryDirectory() as directory:
+            write_orders(directory, num_orders, group_size=256)
+            start_time = time.perf_counter()
+            recover_store(directory)
+            print(f"recovery with {num_orders:>6} journal records: {time.perf_counter() - start_time:.3f} seconds")
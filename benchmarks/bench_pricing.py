@@ -0,0 +1,68 @@
+"""
+Benchmark for the pricing of order lines: float prices, Decimal prices and the fixed-point (integer cents) mode
+run from the root of the repository with: python -m benchmarks.bench_pricing
+the same lines are priced and summed up in each mode; the float total is compared with the exact total
+"""
+import random
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from src.products import Product
+from src.promotions import SecondHalfPrice, ThirdOneFree, PercentDiscount
+
+NUM_PRODUCTS = 1000
+NUM_LINES = 500000
+CENT = Decimal("0.01")
+
+
+def decimal_price_for(product, price, quantity):
+    """
+    price of a line computed with Decimal, rounded half up to the cent once per line like the fixed-point mode
+    """
+    promotion = product.promotion
+    if promotion is None:
+        total = price * quantity
+    elif isinstance(promotion, SecondHalfPrice):
+        total = price * quantity - price / 2 * (quantity // 2)
+    elif isinstance(promotion, ThirdOneFree):
+        total = price * (quantity - quantity // 3)
+    else:
+        total = price * quantity * (100 - promotion._percent) / 100
+    return total.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+if __name__ == "__main__":
+    generator = random.Random(0)
+    promotions = [None, SecondHalfPrice("Second Half price!"), ThirdOneFree("Third One Free!"),
+                  PercentDiscount("30% off!", percent=30)]
+    products_list = []
+    for number in range(NUM_PRODUCTS):
+        product = Product.from_trusted(f"Product {number}", generator.randint(100, 200000) / 100, 10 ** 9)
+        if promotions[number % 4] is not None:
+            product.promotion = promotions[number % 4]
+        products_list.append(product)
+    lines = [(generator.choice(products_list), generator.randint(1, 9)) for _ in range(NUM_LINES)]
+    decimal_prices = {id(product): Decimal(repr(product.price)) for product in products_list}
+
+    start_time = time.perf_counter()
+    float_total = 0
+    for product, quantity in lines:
+        float_total += product.price_for(quantity)
+    float_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    decimal_total = Decimal(0)
+    for product, quantity in lines:
+        decimal_total += decimal_price_for(product, decimal_prices[id(product)], quantity)
+    decimal_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    cents_total = 0
+    for product, quantity in lines:
+        cents_total += product.price_for_cents(quantity)
+    cents_time = time.perf_counter() - start_time
+
+    for mode, elapsed in (("float", float_time), ("Decimal", decimal_time), ("integer cents", cents_time)):
+        print(f"{mode:<14} {NUM_LINES / elapsed:12,.0f} lines/second")
+    print(f"float total    {float_total!r}")
+    print(f"Decimal total  {decimal_total}")
+    print(f"cents total    {cents_total} (exact: {Decimal(cents_total) / 100 == decimal_total})")
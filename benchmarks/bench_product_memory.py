@@ -0,0 +1,38 @@
+"""
+Benchmark for the memory and the construction time of products
+run from the root of the repository with: python -m benchmarks.bench_product_memory
+"""
+import time
+import tracemalloc
+from src.products import Product
+
+NUM_PRODUCTS = 200000
+
+
+def measure(build_product):
+    """
+    build NUM_PRODUCTS products with build_product(name, i) and return (bytes per product, products per second)
+    """
+    names = [f"Product {i}" for i in range(NUM_PRODUCTS)]
+    start_time = time.perf_counter()
+    products_list = [build_product(name, i) for i, name in enumerate(names)]
+    elapsed = time.perf_counter() - start_time
+    del products_list
+    # tracemalloc slows down every allocation, so the memory is measured in a second run
+    tracemalloc.start()
+    products_list = [build_product(name, i) for i, name in enumerate(names)]
+    allocated_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # the list holding the products is not part of the products
+    allocated_bytes -= 8 * len(products_list)
+    return allocated_bytes / NUM_PRODUCTS, NUM_PRODUCTS / elapsed
+
+
+if __name__ == "__main__":
+    loaders = [("Product(...)", lambda name, i: Product(name, price=10 + i, quantity=1 + i))]
+    if hasattr(Product, "from_trusted"):
+        loaders.append(("Product.from_trusted(...)",
+                        lambda name, i: Product.from_trusted(name, price=10 + i, quantity=1 + i)))
+    for label, build_product in loaders:
+        bytes_per_product, products_per_second = measure(build_product)
+        print(f"{label:<26} {bytes_per_product:8.0f} bytes/product {products_per_second:12,.0f} products/second")
@@ -0,0 +1,42 @@
+"""
+Benchmark for the asyncio front end of the store with many simulated clients
+run from the root of the repository with: python -m benchmarks.bench_service
+"""
+import asyncio
+import random
+from src.products import Product
+from src.service import StoreService
+from src.store import Store
+
+NUM_PRODUCTS = 1000
+NUM_CLIENTS = 1000
+ORDERS_PER_CLIENT = 50
+
+
+async def client(service, products_list, seed):
+    """
+    a simulated client sending its orders one after another
+    """
+    random_generator = random.Random(seed)
+    for _ in range(ORDERS_PER_CLIENT):
+        shopping_list = [(random_generator.choice(products_list), random_generator.randint(1, 3))
+                         for _ in range(random_generator.randint(1, 5))]
+        await service.order(shopping_list)
+
+
+async def run_clients(max_batch_size):
+    """
+    run all simulated clients against a fresh store and return the statistics of the service
+    """
+    products_list = [Product(f"Product {i}", price=10 + i, quantity=10 ** 9) for i in range(NUM_PRODUCTS)]
+    async with StoreService(Store(products_list), max_queue_size=500, max_batch_size=max_batch_size) as service:
+        await asyncio.gather(*(client(service, products_list, seed) for seed in range(NUM_CLIENTS)))
+    return service.stats()
+
+
+if __name__ == "__main__":
+    for max_batch_size in (1, 10, 100):
+        stats = asyncio.run(run_clients(max_batch_size))
+        print(f"batch size {max_batch_size:>3}: {stats['orders_per_second']:,.0f} orders/second, "
+              f"p50 {stats['p50_latency_ms']:.2f} ms, p99 {stats['p99_latency_ms']:.2f} ms, "
+              f"{stats['batches']} batches")
@@ -0,0 +1,65 @@
+"""
+Benchmark for the sharded multi-process store, in orders per second for a growing number of shards
+run from the root of the repository with: python -m benchmarks.bench_sharded
+the orders are sent in batches by a few coordinator threads; MULTI_SHARD_SHARE of them have lines on
+2 products picked independently, so they mostly need a two-phase commit
+the scaling can only show on a machine with at least as many cores as shards
+"""
+import os
+import random
+import threading
+import time
+from src.products import Product
+from src.sharded_store import ShardedStore
+
+NUM_PRODUCTS = 10000
+NUM_ORDERS = 200000
+BATCH_SIZE = 500
+COORDINATOR_THREADS = 4
+MULTI_SHARD_SHARE = 0.1
+
+
+def make_orders(names):
+    generator = random.Random(0)
+    orders = []
+    for _ in range(NUM_ORDERS):
+        if generator.random() < MULTI_SHARD_SHARE:
+            orders.append([(generator.choice(names), 1), (generator.choice(names), 2)])
+        else:
+            orders.append([(generator.choice(names), generator.randint(1, 3))])
+    return orders
+
+
+def run(shards, orders, products_list):
+    """
+    send all orders through a sharded store with shards worker processes, return the orders per second
+    """
+    with ShardedStore(products_list, shards=shards) as store:
+        expected_quantity = store.quantity - sum(amount for shopping_list in orders for _, amount in shopping_list)
+        batches = [orders[start:start + BATCH_SIZE] for start in range(0, len(orders), BATCH_SIZE)]
+
+        def coordinator(thread_number):
+            for batch in batches[thread_number::COORDINATOR_THREADS]:
+                for result in store.order_batch(batch):
+                    if isinstance(result, Exception):
+                        raise result
+
+        threads = [threading.Thread(target=coordinator, args=(number,)) for number in range(COORDINATOR_THREADS)]
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start_time
+        if store.quantity != expected_quantity:
+            raise Exception("the total quantity of the sharded store is wrong")
+    return len(orders) / elapsed
+
+
+if __name__ == "__main__":
+    products_list = [Product.from_trusted(f"Product {i}", 10 + i, 10 ** 9) for i in range(NUM_PRODUCTS)]
+    orders = make_orders([f"Product {i}" for i in range(NUM_PRODUCTS)])
+    shard_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    print(f"{os.cpu_count()} cores")
+    for shards in shard_counts:
+        print(f"{shards} shards: {run(shards, orders, products_list):,.0f} orders/second")
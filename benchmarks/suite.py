@@ -0,0 +1,211 @@
+"""
+Benchmark suite for the hot paths of the store, with machine-readable results and a regression check
+run from the root of the repository with: python -m benchmarks.suite
+the catalogs and orders are generated from a fixed seed, so two runs with the same options measure the same work
+
+examples:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --sizes 1000 100000 10000000 --lines 10 --skew 1.2
+    python -m benchmarks.suite --save-baseline
+the run fails (exit code 1) when a result is slower than the baseline by more than the threshold
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+from src.products import Product, LimitedProduct, NonStockedProduct
+from src.promotions import SecondHalfPrice, ThirdOneFree, PercentDiscount
+from src.store import Store
+
+BASELINE_PATH = "benchmarks/baseline.json"
+DEFAULT_SIZES = (1000, 10000, 100000)
+MAX_SIZE = 10000000
+STOCK = 10 ** 12  # quantity of the stocked products, large enough that no workload sells out
+PROMOTIONS = (SecondHalfPrice("Second Half price!"), ThirdOneFree("Third One Free!"),
+              PercentDiscount("30% off!", percent=30))
+
+
+def make_catalog(size, seed=0):
+    """
+    return a list of size products: mostly stocked products, every 50th a LimitedProduct and every 100th a
+    NonStockedProduct, every 4th product with one of the promotions
+    """
+    generator = random.Random(seed)
+    catalog = []
+    for number in range(size):
+        price = generator.randint(1, 2000)
+        if number % 100 == 99:
+            product = NonStockedProduct.from_trusted(f"Service {number}", price)
+        elif number % 50 == 49:
+            product = LimitedProduct.from_trusted(f"Limited {number}", price, STOCK, 10 ** 6)
+        else:
+            product = Product.from_trusted(f"Product {number}", price, STOCK)
+        if number % 4 == 3:
+            product.promotion = PROMOTIONS[number // 4 % len(PROMOTIONS)]
+        catalog.append(product)
+    return catalog
+
+
+def make_orders(catalog, count, lines, skew, seed=0):
+    """
+    return count shopping lists of lines (product, quantity) pairs each
+    skew: the product of rank r is picked with a weight of 1 / r ** skew, 0 picks all products equally often
+    the non stocked products are ordered with quantity 1 and at most once per order, like the shipping of a
+    real order: a non stocked product picked again for the same order is left out, so the order can have fewer lines
+    """
+    generator = random.Random(seed)
+    cum_weights = []
+    total_weight = 0.0
+    for rank in range(1, len(catalog) + 1):
+        total_weight += rank ** -skew
+        cum_weights.append(total_weight)
+    orders = []
+    for _ in range(count):
+        shopping_list = []
+        non_stocked = set()  # ids of the non stocked products already in the order
+        for product in generator.choices(catalog, cum_weights=cum_weights, k=lines):
+            if isinstance(product, NonStockedProduct):
+                if id(product) in non_stocked:
+                    continue
+                non_stocked.add(id(product))
+                quantity = 1
+            else:
+                quantity = generator.randint(1, 5)
+            shopping_list.append((product, quantity))
+        orders.append(shopping_list)
+    return orders
+
+
+def measure(function, min_time):
+    """
+    return the best time of one call of function in seconds
+    function is called in rounds of growing length until a round takes min_time, then two more rounds
+    of that length are timed and the fastest round counts
+    """
+    number = 1
+    while True:
+        round_time = time_round(function, number)
+        if round_time >= min_time:
+            break
+        number *= 10 if round_time < min_time / 10 else 2
+    best_time = min([round_time] + [time_round(function, number) for _ in range(2)])
+    return best_time / number
+
+
+def time_round(function, number):
+    start_time = time.perf_counter()
+    for _ in range(number):
+        function()
+    return time.perf_counter() - start_time
+
+
+def bench_store(size, lines, skew, min_time):
+    """
+    return {benchmark name: seconds per call} for a store with a catalog of size products
+    """
+    catalog = make_catalog(size)
+    store = Store(catalog)
+    orders = make_orders(catalog, 1000, lines, skew)
+    label = f"[size={size}]"
+    results = {}
+
+    next_order = itertools.cycle(orders)
+    results[f"store.order{label}[lines={lines},skew={skew}]"] = measure(lambda: store.order(next(next_order)),
+                                                                        min_time)
+
+    def rebuild_products():
+        store._products_view = None
+        return store.products
+    results[f"store.products.cold{label}"] = measure(rebuild_products, min_time)
+    results[f"store.products.cached{label}"] = measure(lambda: store.products, min_time)
+    results[f"store.quantity{label}"] = measure(lambda: store.quantity, min_time)
+    middle_product = catalog[size // 2]
+    results[f"store.contains{label}"] = measure(lambda: middle_product in store, min_time)
+
+    half = size // 2
+    first_store, second_store = Store(catalog[:half]), Store(catalog[half:])
+    results[f"store.add{label}"] = measure(lambda: first_store + second_store, min_time)
+    return results
+
+
+def bench_promotions(min_time):
+    """
+    return {benchmark name: seconds per call} of apply_promotion for each promotion
+    """
+    results = {}
+    product = Product.from_trusted("MacBook Air M2", 1450, STOCK)
+    for promotion in PROMOTIONS:
+        for quantity in (1, 7):
+            results[f"promotion.{type(promotion).__name__}[quantity={quantity}]"] = measure(
+                lambda: promotion.apply_promotion(product, quantity), min_time)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    compare results with baseline results, both {benchmark name: seconds per call}
+    return the list of (name, baseline seconds, seconds) of the benchmarks slower than the baseline by more
+    than threshold (0.2 = 20 %); benchmarks missing in one of the two are skipped
+    """
+    regressions = []
+    for name, seconds in results.items():
+        baseline_seconds = baseline.get(name)
+        if baseline_seconds is not None and seconds > baseline_seconds * (1 + threshold):
+            regressions.append((name, baseline_seconds, seconds))
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="benchmark the hot paths of the store")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help=f"catalog sizes, from 1 to {MAX_SIZE}")
+    parser.add_argument("--lines", type=int, default=5, help="lines per order")
+    parser.add_argument("--skew", type=float, default=1.0, help="skew of the ordered products, 0 = uniform")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per timed round")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown against the baseline, 0.25 = 25 %%")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    options = parser.parse_args(arguments)
+    if any(not 1 <= size <= MAX_SIZE for size in options.sizes):
+        parser.error(f"the catalog sizes have to be between 1 and {MAX_SIZE}")
+
+    results = {}
+    for size in options.sizes:
+        results.update(bench_store(size, options.lines, options.skew, options.min_time))
+    results.update(bench_promotions(options.min_time))
+    for name, seconds in results.items():
+        print(f"{name:<60} {seconds * 1e6:14,.3f} µs")
+
+    report = {"python": platform.python_version(), "platform": platform.platform(),
+              "options": {"sizes": options.sizes, "lines": options.lines, "skew": options.skew},
+              "results": results}
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+    if options.save_baseline:
+        with open(options.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print(f"saved the baseline to {options.baseline}")
+        return 0
+
+    try:
+        with open(options.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+    except FileNotFoundError:
+        print(f"no baseline at {options.baseline}, run with --save-baseline to create one")
+        return 0
+    regressions = compare(results, baseline, options.threshold)
+    for name, baseline_seconds, seconds in regressions:
+        print(f"REGRESSION {name}: {baseline_seconds * 1e6:,.3f} µs -> {seconds * 1e6:,.3f} µs")
+    if not regressions:
+        print(f"no regression larger than {options.threshold:.0%} against {options.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,9 @@
 from src import products
 from src import store
+from src import cart
+import argparse
 import sys
+import time
 
 
 ui_display = """
@@ -11,6 +14,8 @@ ui_display = """
             3. Make an order
             4. Quit
             """
+# number of products shown at once by the product listing
+PAGE_SIZE = 20
 
 
 def start(input_store):
@@ -23,11 +28,16 @@ def start(input_store):
         handles the product listing feature from the menu dispatcher
         """
         print("------list all products-------")
-        products_list = input_store.products
+        # only one page of products is fetched and printed at a time, so large catalogs don't flood the screen
         index_num = 1
-        for product in products_list:
-            print(f"{index_num}. {product}")
-            index_num += 1
+        products_page, cursor = input_store.products_page(PAGE_SIZE)
+        while True:
+            for product in products_page:
+                print(f"{index_num}. {product}")
+                index_num += 1
+            if cursor is None or input("Press enter for more products, any other key to stop."):
+                break
+            products_page, cursor = input_store.products_page(PAGE_SIZE, cursor)
         print("------------------------------")
 
     def total_amount_handler():
@@ -46,18 +56,18 @@ def start(input_store):
         print("------Order processing-------")
         print("When you want to finish order, enter empty text.")
         list_all_products_handler()
-        # Create a dummy_products_list to show the user what the shop list looks like after ordering
         products_list = input_store.products
-        order_list = []
+        # the cart adds up repeated lines of a product and checks the stock against the total in the cart
+        order_cart = cart.Cart(input_store)
         while True:
             try:
                 product_index = input("Which product # do you want?")
                 amount_input = input("What amount do you want?")
                 # If the product_index and amount_input are both empty, end the ordering process
                 if not product_index and not amount_input:
-                    # Check if the order list empty or not, if empty then no order has been made while ending the ordering process
-                    if order_list:
-                        total_price = input_store.order(order_list)
+                    # Check if the cart is empty or not, if empty then no order has been made while ending the ordering process
+                    if order_cart:
+                        total_price = order_cart.checkout()
                         print(f"\nOrders made! Total payment: ${total_price}")
                         break
                     else:
@@ -69,26 +79,8 @@ def start(input_store):
                 # If the user enters an invalid index number while choosing the product, a warning should be raised
                 if product_index < 1 or product_index > len(products_list):
                     raise Exception("The chosen index number doesn't exist on the list")
-                # Check if the input amount is smaller or equal the existed amount in the warehouse
-                # if smaller or equal, add the order into the list in form of a tuple with 2 elements: product_name and amount_input
-                if amount_input <= products_list[product_index - 1].quantity:
-                    # if the order_list is not empty, check whether an order of the same product already exists
-                    # in the order_list, if the product exists, just add the new order amount to the existing amount of that product to
-                    # prevent more tuples of the same product order
-                    if order_list:
-                        is_product_in_order_list = False
-                        for i, product_tuple in enumerate(order_list):
-                            if products_list[product_index - 1] in product_tuple:
-                                order_list[i] = (products_list[product_index - 1], product_tuple[1] + amount_input)
-                                is_product_in_order_list = True
-                        if not is_product_in_order_list:
-                            order_list.append((products_list[product_index - 1], amount_input))
-                    else:
-                        order_list.append((products_list[product_index - 1], amount_input))
-
-                    print("Order for the product is added to the list")
-                else:
-                    raise Exception("The ordered amount is larger than the amount available in the store!")
+                order_cart.add(products_list[product_index - 1], amount_input)
+                print("Order for the product is added to the list")
             except ValueError:
                 print("Invalid input, please enter numbers only")
             except Exception as err_msg:
@@ -123,14 +115,117 @@ def start(input_store):
     menu_dispatch[str(user_input)]()
 
 
+def parse_order_line(line, products_list, input_store):
+    """
+    turn a line of a batch file into a Cart of input_store
+    a line holds the lines of one order separated by spaces, each as <product #>:<amount>, e.g. "1:2 3:1"
+    the product # is the number of the product in the product listing of the store (starting at 1)
+    """
+    order_cart = cart.Cart(input_store)
+    for order_item in line.split():
+        product_number, separator, amount = order_item.partition(":")
+        if not separator:
+            raise Exception(f"{order_item!r} is not in the form <product #>:<amount>")
+        try:
+            product_number = int(product_number)
+            amount = int(amount)
+        except ValueError:
+            raise Exception(f"{order_item!r} is not in the form <product #>:<amount>")
+        if product_number < 1 or product_number > len(products_list):
+            raise Exception(f"product #{product_number} doesn't exist on the list")
+        order_cart.add(products_list[product_number - 1], amount)
+    return order_cart
+
+
+def run_batch(input_store, order_lines, results_file, batch_size=100):
+    """
+    The batch mode of the store: order every line of order_lines (see parse_order_line) without asking anything
+    the orders are read and ordered batch_size lines at a time, the result of each batch is written to
+    results_file in one go: "<line #>\tOK\t<total price>" or "<line #>\tERROR\t<message>"
+    empty lines and lines starting with # are skipped
+    a summary line with the throughput ends the results, the summary is also returned
+    """
+    if not isinstance(batch_size, int) or batch_size < 1:
+        raise Exception("the batch size has to be larger than 0")
+    # the product numbers refer to the listing from before the batch, products selling out don't shift them
+    products_list = input_store.products
+    completed_orders = 0
+    failed_orders = 0
+    start_time = time.perf_counter()
+    batch = []
+    for line_number, line in enumerate(order_lines, start=1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            batch.append((line_number, line))
+        if len(batch) == batch_size:
+            completed, failed = order_batch(input_store, products_list, batch, results_file)
+            completed_orders += completed
+            failed_orders += failed
+            batch = []
+    if batch:
+        completed, failed = order_batch(input_store, products_list, batch, results_file)
+        completed_orders += completed
+        failed_orders += failed
+    elapsed = time.perf_counter() - start_time
+    orders_per_second = (completed_orders + failed_orders) / elapsed if elapsed > 0 else 0.0
+    summary = (f"{completed_orders + failed_orders} orders, {completed_orders} completed, {failed_orders} failed "
+               f"in {elapsed:.3f} seconds ({orders_per_second:,.0f} orders/second)")
+    results_file.write(f"# {summary}\n")
+    return summary
+
+
+def order_batch(input_store, products_list, batch, results_file):
+    """
+    order a batch of (line #, line) pairs and write their results
+    return the numbers of completed and failed orders
+    """
+    results = []
+    completed_orders = 0
+    for line_number, line in batch:
+        try:
+            total_price = parse_order_line(line, products_list, input_store).checkout()
+        except Exception as err:
+            results.append(f"{line_number}\tERROR\t{err}\n")
+        else:
+            results.append(f"{line_number}\tOK\t{total_price}\n")
+            completed_orders += 1
+    results_file.write("".join(results))
+    return completed_orders, len(batch) - completed_orders
+
+
+def open_batch_file(path, mode):
+    """
+    open a file of the batch mode, "-" is stdin or stdout
+    """
+    if path == "-":
+        return open(sys.stdin.fileno() if "r" in mode else sys.stdout.fileno(), mode, encoding="utf-8",
+                    closefd=False)
+    return open(path, mode, encoding="utf-8")
+
+
+def parse_arguments(arguments=None):
+    parser = argparse.ArgumentParser(description="Best Buy store, interactive or in batch mode")
+    parser.add_argument("--batch", metavar="ORDERS", help="order every line of this file (- for stdin) "
+                                                          "without prompting, lines like 1:2 3:1")
+    parser.add_argument("--output", default="-", help="file for the results of the batch mode (- for stdout)")
+    parser.add_argument("--batch-size", type=int, default=100, help="orders per batch in the batch mode")
+    return parser.parse_args(arguments)
+
+
 # setup initial stock of inventory
 if __name__ == "__main__":
+    options = parse_arguments()
     # setup initial stock of inventory
     mac = products.Product("MacBook Air M2", price=1450, quantity=100)
     bose = products.Product("Bose QuietComfort Earbuds", price=250, quantity=500)
     pixel = products.LimitedProduct("Google Pixel 7", price=500, quantity=250, maximum=1)
 
     best_buy = store.Store([mac, bose])
+    if options.batch:
+        with open_batch_file(options.batch, "r") as orders_file, open_batch_file(options.output, "w") as output:
+            batch_summary = run_batch(best_buy, orders_file, output, options.batch_size)
+        print(batch_summary, file=sys.stderr)
+        sys.exit()
     # mac.price = -100         # Should give error
     print(mac)  # Should print `MacBook Air M2, Price: $1450 Quantity:100`
     print(mac > bose)  # Should print True
@@ -0,0 +1,40 @@
+from src.promotions import Promotion
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for batch pricing
+    np = None
+
+NO_PROMOTION = -1
+
+
+def price_batch(prices, quantities, promotion_ids, promotions):
+    """
+    price many (price, quantity) lines in one vectorized pass
+    prices: array of product prices
+    quantities: array of purchased amounts
+    promotion_ids: array of indexes into promotions, NO_PROMOTION (-1) for lines without a promotion
+    promotions: list of Promotion objects
+    return an array of float totals, each equal to what apply_promotion (or quantity * price without a promotion)
+    gives for the line. The results are exact as long as the intermediate values stay below 2 ** 53
+    """
+    if np is None:
+        raise Exception("numpy is required for batch pricing")
+    prices = np.asarray(prices, dtype=np.float64)
+    quantities = np.asarray(quantities, dtype=np.int64)
+    promotion_ids = np.asarray(promotion_ids, dtype=np.int64)
+    if not (prices.shape == quantities.shape == promotion_ids.shape):
+        raise Exception("prices, quantities and promotion ids need to have the same length")
+    if np.any((promotion_ids < NO_PROMOTION) | (promotion_ids >= len(promotions))):
+        raise Exception("promotion id doesn't exist in the list of promotions")
+
+    totals = prices * quantities
+    for promotion_id in np.unique(promotion_ids):
+        if promotion_id == NO_PROMOTION:
+            continue
+        promotion = promotions[promotion_id]
+        if not isinstance(promotion, Promotion):
+            raise Exception("the input parameter is not an object of Class Promotion")
+        selected = promotion_ids == promotion_id
+        totals[selected] = promotion.apply_promotion_batch(prices[selected], quantities[selected])
+    return totals
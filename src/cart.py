@@ -0,0 +1,89 @@
+from src.products import is_int_type_check
+from src.store import is_product_type_check
+
+
+class Cart:
+    """
+    class Cart collects the lines of an order before it is ordered from a store.
+    The lines are kept in a dict keyed by the identity of the product (like the index of Store), so adding a
+    product which is already in the cart just adds to its amount in O(1). Every line is checked against the
+    total amount of the product in the cart: stock, maximum of a LimitedProduct, active, and the stock held
+    by reservations of the store
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._lines = {}  # id(product) -> (product, amount)
+
+    def add(self, product, amount):
+        """
+        add an amount of a product to the cart
+        raise an exception if the store can't sell the new total amount of the product, the cart is
+        left unchanged then
+        """
+        is_product_type_check(product)
+        is_int_type_check(amount)
+        if amount <= 0:
+            raise Exception("please give an amount larger than 0!")
+        if product not in self._store:
+            raise Exception("product doesn't exist in the store")
+        total_amount = self.amount(product) + amount
+        product.check_buy(total_amount)
+        self._store._check_reservations([(product, total_amount)])
+        self._lines[id(product)] = (product, total_amount)
+
+    def remove(self, product, amount=None):
+        """
+        take an amount of a product out of the cart, the whole line if amount is None
+        """
+        if amount is not None:
+            is_int_type_check(amount)
+            if amount <= 0:
+                raise Exception("please give an amount larger than 0!")
+        if id(product) not in self._lines:
+            return
+        total_amount = self._lines[id(product)][1] - amount if amount is not None else 0
+        if total_amount > 0:
+            self._lines[id(product)] = (product, total_amount)
+        else:
+            del self._lines[id(product)]
+
+    def amount(self, product):
+        """
+        return the amount of a product in the cart, 0 if it isn't in the cart
+        """
+        line = self._lines.get(id(product))
+        return 0 if line is None else line[1]
+
+    @property
+    def lines(self):
+        """
+        return the shopping list of the cart: a list of tuples (product, amount), one per product
+        """
+        return list(self._lines.values())
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __contains__(self, product):
+        return id(product) in self._lines
+
+    def total_price(self):
+        """
+        return the price the cart would cost, without buying anything
+        """
+        return self._store.quote(self.lines)
+
+    def checkout(self):
+        """
+        order the cart from the store and empty it, return the total price of the order
+        the cart is kept if the order fails
+        """
+        if not self._lines:
+            raise Exception("the cart is empty")
+        total_price = self._store.order(self.lines)
+        self._lines.clear()
+        return total_price
+
+    def clear(self):
+        self._lines.clear()
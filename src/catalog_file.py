@@ -0,0 +1,273 @@
+import mmap
+import struct
+import threading
+from src.products import Product, LimitedProduct, NonStockedProduct
+from src.promotions import Promotion
+from src.store import Store
+from src.encoding import pack_promotion, Reader
+
+CATALOG_MAGIC = b"BBC1"
+CATALOG_VERSION = 2  # version 2 stores the prices in integer cents
+# header: magic, version, number of records, total quantity, offsets of the records, the string table and the
+# promotion table, number of promotions
+CATALOG_HEADER = struct.Struct("<4sIQqQQQI4x")
+# record: price in cents, quantity, maximum, offset and length of the name in the string table,
+# promotion code, kind, active flag
+CATALOG_RECORD = struct.Struct("<qqqQIiBB6x")
+TOTAL_QUANTITY_OFFSET = 16  # position of the total quantity in the header, updated in place
+# positions of the fields inside a record
+PRICE_OFFSET = 0
+QUANTITY_OFFSET = 8
+MAXIMUM_OFFSET = 16
+NAME_OFFSET = 24
+PROMOTION_OFFSET = 36
+KIND_OFFSET = 40
+ACTIVE_OFFSET = 41
+
+KIND_PRODUCT = 0
+KIND_LIMITED = 1
+KIND_NON_STOCKED = 2
+NO_PROMOTION = -1
+
+
+def write_catalog(path, products_list):
+    """
+    write products into a catalog file: a header, fixed-width records, a string table with the names
+    and a table with the promotions used by the products
+    """
+    products_list = list(products_list)
+    promotions = []
+    promotion_codes = {}
+    names = bytearray()
+    records = bytearray()
+    total_quantity = 0
+    for product in products_list:
+        if product.promotion is None:
+            promotion_code = NO_PROMOTION
+        else:
+            if id(product.promotion) not in promotion_codes:
+                promotion_codes[id(product.promotion)] = len(promotions)
+                promotions.append(product.promotion)
+            promotion_code = promotion_codes[id(product.promotion)]
+        if isinstance(product, NonStockedProduct):
+            kind, quantity, maximum = KIND_NON_STOCKED, 0, 0
+        elif isinstance(product, LimitedProduct):
+            kind, quantity, maximum = KIND_LIMITED, product.quantity, product._maximum
+        else:
+            kind, quantity, maximum = KIND_PRODUCT, product.quantity, 0
+        name = product._name.encode("utf-8")
+        records += CATALOG_RECORD.pack(product.price_cents, quantity, maximum, len(names), len(name),
+                                       promotion_code, kind, product.active)
+        names += name
+        total_quantity += quantity
+    promotion_table = b"".join(pack_promotion(promotion) for promotion in promotions)
+    records_offset = CATALOG_HEADER.size
+    strings_offset = records_offset + len(records)
+    promotions_offset = strings_offset + len(names)
+    with open(path, "wb") as catalog_file:
+        catalog_file.write(CATALOG_HEADER.pack(CATALOG_MAGIC, CATALOG_VERSION, len(products_list), total_quantity,
+                                               records_offset, strings_offset, promotions_offset, len(promotions)))
+        catalog_file.write(records)
+        catalog_file.write(names)
+        catalog_file.write(promotion_table)
+
+
+class MappedCatalog:
+    """
+    class MappedCatalog opens a catalog file written by write_catalog with mmap.
+    Opening only reads the header, so it takes the same time for any catalog size. A product object is only
+    created when its row is asked for with product(); it reads and writes its fields directly in the mapped
+    file, so stock updates are written back in place. The materialized products are kept in an internal Store,
+    which handles the orders
+    """
+
+    def __init__(self, path, **store_options):
+        """
+        open a catalog file for reading and writing
+        the store_options are passed to the constructor of the internal Store
+        """
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        (magic, version, self._size, _, self._records_offset, self._strings_offset,
+         promotions_offset, promotions_count) = CATALOG_HEADER.unpack_from(self._map, 0)
+        if magic != CATALOG_MAGIC or version != CATALOG_VERSION:
+            raise Exception("not a catalog file")
+        reader = Reader(self._map, promotions_offset)
+        self._promotions = [reader.promotion() for _ in range(promotions_count)]
+        self._views = {}  # row -> product view, filled when a row is asked for
+        self._lock = threading.Lock()
+        self._store = Store([], **store_options)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def quantity(self):
+        """
+        return the total quantity of all products of the catalog, kept up to date in the header of the file
+        """
+        return struct.unpack_from("<q", self._map, TOTAL_QUANTITY_OFFSET)[0]
+
+    def _add_to_quantity(self, delta):
+        """
+        change the total quantity in the header of the file
+        """
+        with self._lock:
+            struct.pack_into("<q", self._map, TOTAL_QUANTITY_OFFSET, self.quantity + delta)
+
+    def _record_offset(self, row):
+        return self._records_offset + row * CATALOG_RECORD.size
+
+    def product(self, row):
+        """
+        return the product of a row, materializing it the first time the row is asked for
+        """
+        if not 0 <= row < self._size:
+            raise Exception("row doesn't exist in the catalog")
+        view = self._views.get(row)
+        if view is None:
+            with self._lock:
+                view = self._views.get(row)
+                if view is None:
+                    view = self._materialize(row)
+                    self._store.add_product(view)
+                    self._views[row] = view
+        return view
+
+    def _materialize(self, row):
+        """
+        create the product view of a row
+        """
+        kind = self._map[self._record_offset(row) + KIND_OFFSET]
+        if kind == KIND_NON_STOCKED:
+            view_class = MappedNonStockedProduct
+        elif kind == KIND_LIMITED:
+            view_class = MappedLimitedProduct
+        else:
+            view_class = MappedProduct
+        view = view_class.__new__(view_class)
+        view._catalog = self
+        view._offset = self._record_offset(row)
+        name_offset, name_length = struct.unpack_from("<QI", self._map, view._offset + NAME_OFFSET)
+        name_start = self._strings_offset + name_offset
+        view._name = self._map[name_start:name_start + name_length].decode("utf-8")
+        view._listeners = ()
+        view._lock = threading.RLock()
+        return view
+
+    def iter_products(self, active_only=True):
+        """
+        yield the products of the catalog row by row, materializing them on the way
+        """
+        for row in range(self._size):
+            if not active_only or self._map[self._record_offset(row) + ACTIVE_OFFSET]:
+                yield self.product(row)
+
+    def order(self, shopping_list):
+        """
+        order products of the catalog, like Store.order
+        """
+        return self._store.order(shopping_list)
+
+    def __contains__(self, product):
+        return product in self._store
+
+    def flush(self):
+        """
+        write the changes of the mapped file to disk
+        """
+        self._map.flush()
+
+    def close(self):
+        """
+        flush and close the catalog file, the products of the catalog can't be used anymore afterwards
+        """
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+
+
+class MappedRowMixin:
+    """
+    Mixin turning the fields of a product class into properties reading and writing a record of a MappedCatalog
+    """
+    __slots__ = ()
+
+    @property
+    def _str_cache(self):
+        # the fields can change in the mapped file without the view being told, so its text is never cached
+        return None
+
+    @_str_cache.setter
+    def _str_cache(self, text):
+        pass
+
+    @property
+    def _price_cents(self):
+        return struct.unpack_from("<q", self._catalog._map, self._offset + PRICE_OFFSET)[0]
+
+    @_price_cents.setter
+    def _price_cents(self, price_cents):
+        struct.pack_into("<q", self._catalog._map, self._offset + PRICE_OFFSET, price_cents)
+
+    @property
+    def _quantity(self):
+        return struct.unpack_from("<q", self._catalog._map, self._offset + QUANTITY_OFFSET)[0]
+
+    @_quantity.setter
+    def _quantity(self, quantity):
+        self._catalog._add_to_quantity(quantity - self._quantity)
+        struct.pack_into("<q", self._catalog._map, self._offset + QUANTITY_OFFSET, quantity)
+
+    @property
+    def _maximum(self):
+        return struct.unpack_from("<q", self._catalog._map, self._offset + MAXIMUM_OFFSET)[0]
+
+    @property
+    def _active(self):
+        return bool(self._catalog._map[self._offset + ACTIVE_OFFSET])
+
+    @_active.setter
+    def _active(self, active):
+        self._catalog._map[self._offset + ACTIVE_OFFSET] = bool(active)
+
+    @property
+    def _promotion(self):
+        promotion_code = struct.unpack_from("<i", self._catalog._map, self._offset + PROMOTION_OFFSET)[0]
+        if promotion_code == NO_PROMOTION:
+            return None
+        return self._catalog._promotions[promotion_code]
+
+    @_promotion.setter
+    def _promotion(self, promotion):
+        if promotion is not None and not isinstance(promotion, Promotion):
+            raise Exception("the input parameter is not an object of Class Promotion")
+        if promotion is None:
+            promotion_code = NO_PROMOTION
+        else:
+            promotion_code = next((code for code, catalog_promotion in enumerate(self._catalog._promotions)
+                                   if catalog_promotion is promotion), None)
+            if promotion_code is None:
+                raise Exception("only the promotions stored in the catalog file can be used")
+        struct.pack_into("<i", self._catalog._map, self._offset + PROMOTION_OFFSET, promotion_code)
+
+
+class MappedProduct(MappedRowMixin, Product):
+    """
+    Product stored in a record of a MappedCatalog
+    """
+    __slots__ = ("_catalog", "_offset")
+
+
+class MappedLimitedProduct(MappedRowMixin, LimitedProduct):
+    """
+    LimitedProduct stored in a record of a MappedCatalog
+    """
+    __slots__ = ("_catalog", "_offset")
+
+
+class MappedNonStockedProduct(MappedRowMixin, NonStockedProduct):
+    """
+    NonStockedProduct stored in a record of a MappedCatalog
+    """
+    __slots__ = ("_catalog", "_offset")
@@ -0,0 +1,236 @@
+import csv
+import json
+from src.products import Product, LimitedProduct, NonStockedProduct
+from src.promotions import SecondHalfPrice, ThirdOneFree, PercentDiscount
+
+# columns of a catalog row, in the order they are exported
+COLUMNS = ["name", "price", "quantity", "kind", "maximum", "active", "promotion", "promotion_name", "percent"]
+
+KIND_PRODUCT = "product"
+KIND_LIMITED = "limited"
+KIND_NON_STOCKED = "non_stocked"
+PROMOTION_TYPES = {"second_half_price": SecondHalfPrice, "third_one_free": ThirdOneFree,
+                   "percent_discount": PercentDiscount}
+
+
+class ImportReport:
+    """
+    class ImportReport counts the imported and rejected rows of an import
+    only the first max_errors rejected rows are kept with their error, so the report stays small for any feed
+    """
+
+    def __init__(self, max_errors=100):
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []  # tuples (row number, error message)
+        self._max_errors = max_errors
+
+    def reject(self, row_number, error):
+        """
+        count a rejected row and keep its error if there is still room
+        """
+        self.rejected += 1
+        if len(self.errors) < self._max_errors:
+            self.errors.append((row_number, str(error)))
+
+    def __str__(self):
+        return f"{self.imported} rows imported, {self.rejected} rows rejected"
+
+
+def iter_csv_rows(text_file):
+    """
+    yield the rows of a CSV catalog (with a header line) one by one as dicts
+    """
+    yield from csv.DictReader(text_file)
+
+
+def iter_jsonl_rows(text_file):
+    """
+    yield the rows of a JSON Lines catalog one by one as dicts, skipping empty lines
+    a line which isn't a JSON object is yielded as the exception describing the problem, so the importer
+    can reject it and go on
+    """
+    for line in text_file:
+        if line.strip():
+            try:
+                row = json.loads(line)
+            except ValueError as err:
+                row = Exception(f"invalid JSON: {err}")
+            if not isinstance(row, (dict, Exception)):
+                row = Exception("a JSON line has to be an object")
+            yield row
+
+
+def parse_number(value):
+    """
+    convert a value of a row into an int (or a float if it has a decimal part), None for an empty value
+    values from JSON are already numbers and are returned as they are
+    """
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            raise Exception(f"{value!r} is not a number")
+
+
+def parse_bool(value):
+    """
+    convert the active column of a row into a bool, True for an empty value
+    """
+    if value is None or value == "":
+        return True
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ("1", "true", "yes"):
+        return True
+    if str(value).lower() in ("0", "false", "no"):
+        return False
+    raise Exception(f"{value!r} is not a boolean")
+
+
+def product_from_row(row, promotions_cache):
+    """
+    create the product described by a row (a dict with the keys of COLUMNS, missing keys count as empty)
+    promotions_cache: dict reusing one promotion object for all rows with the same promotion
+    raise an exception if the row is invalid
+    """
+    kind = row.get("kind") or KIND_PRODUCT
+    name = row.get("name")
+    price = parse_number(row.get("price"))
+    quantity = parse_number(row.get("quantity"))
+    active = parse_bool(row.get("active"))
+    # a sold-out product is exported inactive with quantity 0, which the constructors don't accept:
+    # the row is checked with a quantity of 1 and the quantity is set to 0 afterwards
+    sold_out = not active and quantity == 0 and kind != KIND_NON_STOCKED
+    if sold_out:
+        quantity = 1
+    if kind == KIND_PRODUCT:
+        product = Product(name, price, quantity)
+    elif kind == KIND_LIMITED:
+        maximum = parse_number(row.get("maximum"))
+        if type(maximum) is not int or maximum <= 0:
+            raise Exception("a limited product needs a maximum larger than 0")
+        product = LimitedProduct(name, price, quantity, maximum)
+    elif kind == KIND_NON_STOCKED:
+        product = NonStockedProduct(name, price)
+    else:
+        raise Exception(f"unknown product kind {kind!r}")
+
+    promotion_type = row.get("promotion")
+    if promotion_type:
+        if promotion_type not in PROMOTION_TYPES:
+            raise Exception(f"unknown promotion {promotion_type!r}")
+        promotion_name = row.get("promotion_name") or promotion_type
+        percent = parse_number(row.get("percent"))
+        promotion_key = (promotion_type, promotion_name, percent)
+        if promotion_key not in promotions_cache:
+            if promotion_type == "percent_discount":
+                if percent is None:
+                    raise Exception("a percent discount needs a percent")
+                promotions_cache[promotion_key] = PercentDiscount(promotion_name, percent)
+            else:
+                promotions_cache[promotion_key] = PROMOTION_TYPES[promotion_type](promotion_name)
+        product.promotion = promotions_cache[promotion_key]
+    if sold_out:
+        product.quantity = 0
+    if not active:
+        product.deactivate()
+    return product
+
+
+def import_rows(rows, store, report=None):
+    """
+    add the products of an iterable of rows to a store, one row at a time
+    invalid rows (and products already in the store) are rejected and counted in the report without
+    stopping the import
+    return the ImportReport
+    """
+    if report is None:
+        report = ImportReport()
+    promotions_cache = {}
+    for row_number, row in enumerate(rows, start=1):
+        try:
+            if isinstance(row, Exception):
+                raise row
+            store.add_product(product_from_row(row, promotions_cache))
+        except Exception as err:
+            report.reject(row_number, err)
+        else:
+            report.imported += 1
+    return report
+
+
+def import_catalog(path, store, report=None):
+    """
+    stream a CSV (.csv) or JSON Lines (.jsonl) catalog file into a store, see import_rows
+    """
+    if str(path).endswith(".csv"):
+        iter_rows = iter_csv_rows
+    elif str(path).endswith(".jsonl"):
+        iter_rows = iter_jsonl_rows
+    else:
+        raise Exception("only .csv and .jsonl catalogs can be imported")
+    with open(path, newline="", encoding="utf-8") as text_file:
+        return import_rows(iter_rows(text_file), store, report)
+
+
+def row_from_product(product):
+    """
+    return the row (dict with the keys of COLUMNS) describing a product
+    """
+    row = {"name": product._name, "price": product.price, "quantity": product.quantity, "kind": KIND_PRODUCT,
+           "maximum": None, "active": product.active, "promotion": None, "promotion_name": None, "percent": None}
+    if isinstance(product, NonStockedProduct):
+        row["kind"] = KIND_NON_STOCKED
+    elif isinstance(product, LimitedProduct):
+        row["kind"] = KIND_LIMITED
+        row["maximum"] = product._maximum
+    promotion = product.promotion
+    if promotion is not None:
+        for promotion_type, promotion_class in PROMOTION_TYPES.items():
+            if type(promotion) is promotion_class:
+                row["promotion"] = promotion_type
+        if row["promotion"] is None:
+            raise Exception(f"the promotion {promotion} can't be exported")
+        row["promotion_name"] = str(promotion)
+        if isinstance(promotion, PercentDiscount):
+            row["percent"] = promotion._percent
+    return row
+
+
+def iter_store_rows(store):
+    """
+    yield the rows of all products of a store (active or not), one by one
+    the products are copied into a tuple first, so products added or removed during the export don't
+    break the iteration
+    """
+    for product in tuple(store._products_index.values()):
+        yield row_from_product(product)
+
+
+def export_catalog(store, path):
+    """
+    stream the products of a store into a CSV (.csv) or JSON Lines (.jsonl) file
+    return the number of exported rows
+    """
+    if not str(path).endswith((".csv", ".jsonl")):
+        raise Exception("only .csv and .jsonl catalogs can be exported")
+    exported_rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as text_file:
+        if str(path).endswith(".csv"):
+            writer = csv.DictWriter(text_file, fieldnames=COLUMNS)
+            writer.writeheader()
+            for row in iter_store_rows(store):
+                writer.writerow({column: "" if value is None else value for column, value in row.items()})
+                exported_rows += 1
+        else:
+            for row in iter_store_rows(store):
+                text_file.write(json.dumps(row) + "\n")
+                exported_rows += 1
+    return exported_rows
@@ -0,0 +1,159 @@
+import threading
+
+DEFAULT_CAPACITY = 65536
+
+# kinds of change events
+EVENT_CHANGED = "changed"  # a field of a product changed: quantity (also by buy), price, promotion or active
+EVENT_ADDED = "added"  # a product was added to the store
+EVENT_REMOVED = "removed"  # a product was removed from the store
+
+
+class ChangeEvent:
+    """
+    class ChangeEvent describes one change of the inventory of a store
+    field, old_value and new_value are None for added and removed products
+    """
+    __slots__ = ("sequence", "kind", "product", "field", "old_value", "new_value")
+
+    def __init__(self, sequence, kind, product, field=None, old_value=None, new_value=None):
+        self.sequence = sequence
+        self.kind = kind
+        self.product = product
+        self.field = field
+        self.old_value = old_value
+        self.new_value = new_value
+
+    def __str__(self):
+        if self.kind == EVENT_CHANGED:
+            return f"#{self.sequence} {self.product._name}: {self.field} {self.old_value} -> {self.new_value}"
+        return f"#{self.sequence} {self.product._name}: {self.kind}"
+
+
+class ChangeFeed:
+    """
+    class ChangeFeed publishes the changes of the products of a store (stock, price, promotion, active) and the
+    added and removed products as a stream of ChangeEvents, so other services can follow the inventory
+    instead of polling and diffing the whole catalog.
+    The events are kept in a ring buffer of a fixed capacity. Publishing an event only stores it in the next
+    slot, so the order path never waits for a consumer. Every Subscription reads the events with its own
+    cursor, in batches. A consumer falling more than capacity events behind loses the overwritten events:
+    it is told how many it missed and can resync from Store.products, so a slow consumer never makes the
+    memory grow
+    """
+
+    def __init__(self, store, capacity=DEFAULT_CAPACITY):
+        if not isinstance(capacity, int) or capacity < 1:
+            raise Exception("the capacity of a change feed has to be larger than 0")
+        self._store = store
+        self._capacity = capacity
+        self._buffer = [None] * capacity
+        self._next_sequence = 0  # sequence number of the next event, the event is stored at sequence % capacity
+        self._lock = threading.Lock()
+        self._new_events = threading.Condition(self._lock)
+        self._waiting = 0  # number of subscriptions waiting in poll() for new events
+        for product in store._products_index.values():
+            product.add_listener(self)
+        store.add_listener(self)
+
+    @property
+    def next_sequence(self):
+        """
+        return the sequence number the next event will get
+        """
+        return self._next_sequence
+
+    def close(self):
+        """
+        stop following the store
+        """
+        self._store.remove_listener(self)
+        for product in self._store._products_index.values():
+            product.remove_listener(self)
+
+    def subscribe(self, from_start=False):
+        """
+        return a new Subscription reading the events published from now on,
+        or from the oldest event still in the buffer if from_start is True
+        """
+        with self._lock:
+            cursor = max(0, self._next_sequence - self._capacity) if from_start else self._next_sequence
+        return Subscription(self, cursor)
+
+    def product_changed(self, product, field, old_value, new_value):
+        """
+        called by the products of the store whenever one of their fields changes
+        """
+        self._publish(EVENT_CHANGED, product, field, old_value, new_value)
+
+    def store_changed(self, store, event, data):
+        """
+        called by the store, added and removed products are published and followed from then on
+        """
+        if event == "add_product":
+            data.add_listener(self)
+            self._publish(EVENT_ADDED, data)
+        elif event == "remove_product":
+            data.remove_listener(self)
+            self._publish(EVENT_REMOVED, data)
+
+    def _publish(self, kind, product, field=None, old_value=None, new_value=None):
+        """
+        store an event in the next slot of the ring buffer, overwriting the oldest event when it is full
+        """
+        with self._lock:
+            sequence = self._next_sequence
+            self._buffer[sequence % self._capacity] = ChangeEvent(sequence, kind, product, field, old_value,
+                                                                  new_value)
+            self._next_sequence = sequence + 1
+            if self._waiting:
+                self._new_events.notify_all()
+
+    def _read(self, cursor, max_events, timeout):
+        """
+        return (events from cursor on, new cursor, number of missed events), see Subscription.poll
+        """
+        with self._lock:
+            if cursor == self._next_sequence and timeout:
+                self._waiting += 1
+                try:
+                    self._new_events.wait_for(lambda: cursor != self._next_sequence, timeout)
+                finally:
+                    self._waiting -= 1
+            oldest_sequence = self._next_sequence - self._capacity
+            missed = 0
+            if cursor < oldest_sequence:
+                missed = oldest_sequence - cursor
+                cursor = oldest_sequence
+            end = self._next_sequence if max_events is None else min(self._next_sequence, cursor + max_events)
+            buffer, capacity = self._buffer, self._capacity
+            events = [buffer[sequence % capacity] for sequence in range(cursor, end)]
+        return events, end, missed
+
+
+class Subscription:
+    """
+    class Subscription reads the events of a ChangeFeed with its own cursor
+    """
+
+    def __init__(self, feed, cursor):
+        self._feed = feed
+        self.cursor = cursor  # sequence number of the next event to read
+        self.missed = 0  # number of events overwritten before this subscription could read them
+
+    def poll(self, max_events=1000, timeout=0):
+        """
+        return the next batch of at most max_events events (all available events if None), oldest first
+        an empty list means there is no new event; with a timeout (in seconds, None for no limit) poll waits
+        for a first event when there is none yet
+        if events were overwritten before they could be read, they are skipped and counted in missed
+        """
+        events, self.cursor, missed = self._feed._read(self.cursor, max_events, timeout)
+        self.missed += missed
+        return events
+
+    @property
+    def lag(self):
+        """
+        return the number of published events this subscription hasn't read yet
+        """
+        return self._feed.next_sequence - self.cursor
@@ -0,0 +1,353 @@
+import threading
+from src.money import CENTS_PER_UNIT, to_cents
+from src.products import Product, LimitedProduct, NonStockedProduct
+from src.promotions import Promotion
+from src.store import Store
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the columnar inventory
+    np = None
+
+KIND_PRODUCT = 0
+KIND_LIMITED = 1
+KIND_NON_STOCKED = 2
+NO_PROMOTION = -1
+NO_MAXIMUM = -1
+
+
+class ColumnarInventory:
+    """
+    class ColumnarInventory keeps the fields of many products in parallel NumPy arrays (one row per product):
+    price in integer cents, quantity, active flag, maximum (LimitedProduct) and promotion code.
+    The products handed out by the inventory are lightweight views into a row, so they can be used like any
+    other Product (e.g. in a Store), while aggregates, filters and bulk price changes run vectorized
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        initialize an empty inventory with room for capacity rows, the arrays grow when they are full
+        """
+        if np is None:
+            raise Exception("numpy is required for the columnar inventory")
+        self._size = 0
+        self._price_cents = np.zeros(capacity, dtype=np.int64)
+        self._quantity = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=np.bool_)
+        self._maximum = np.full(capacity, NO_MAXIMUM, dtype=np.int64)
+        self._promotion_code = np.full(capacity, NO_PROMOTION, dtype=np.int32)
+        self._kind = np.zeros(capacity, dtype=np.int8)
+        self._names = []
+        self._views = []  # product view of each row, None until the view is asked for
+        self._promotions = []  # promotion objects, the promotion code of a row is an index into this list
+        self._promotion_codes = {}  # id(promotion) -> promotion code
+
+    @classmethod
+    def from_products(cls, products_list):
+        """
+        create an inventory holding a copy of the fields of existing products
+        """
+        inventory = cls(capacity=max(len(products_list), 1))
+        for product in products_list:
+            if isinstance(product, NonStockedProduct):
+                inventory.add_product(product._name, product.price, 0, non_stocked=True)
+            elif isinstance(product, LimitedProduct):
+                inventory.add_product(product._name, product.price, product.quantity, maximum=product._maximum)
+            else:
+                inventory.add_product(product._name, product.price, product.quantity)
+            row = len(inventory) - 1
+            inventory._price_cents[row] = product.price_cents
+            if product.promotion is not None:
+                inventory._promotion_code[row] = inventory._code_of_promotion(product.promotion)
+            inventory._active[row] = product.active
+        return inventory
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def products(self):
+        """
+        return the list of the product views of all rows
+        """
+        return [self.product(row) for row in range(self._size)]
+
+    def product(self, row):
+        """
+        return the product view of a row, the view is created the first time it is asked for
+        """
+        if not 0 <= row < self._size:
+            raise Exception("row doesn't exist in the inventory")
+        view = self._views[row]
+        if view is None:
+            kind = self._kind[row]
+            if kind == KIND_NON_STOCKED:
+                view = ColumnNonStockedProduct._for_row(self, row)
+            elif kind == KIND_LIMITED:
+                view = ColumnLimitedProduct._for_row(self, row)
+            else:
+                view = ColumnProduct._for_row(self, row)
+            self._views[row] = view
+        return view
+
+    def add_product(self, name, price, quantity, maximum=None, non_stocked=False):
+        """
+        add a row to the inventory and return the product view of the row
+        maximum makes the product a LimitedProduct, non_stocked = True a NonStockedProduct
+        the name, price and quantity are checked like in the constructor of class Product
+        """
+        if non_stocked:
+            NonStockedProduct(name, price)
+        elif maximum is not None:
+            LimitedProduct(name, price, quantity, maximum)
+        else:
+            Product(name, price, quantity)
+        if self._size == len(self._price_cents):
+            self._grow()
+        row = self._size
+        self._price_cents[row] = to_cents(price)
+        self._quantity[row] = 0 if non_stocked else quantity
+        self._active[row] = True
+        self._maximum[row] = NO_MAXIMUM if maximum is None else maximum
+        self._promotion_code[row] = NO_PROMOTION
+        self._kind[row] = KIND_NON_STOCKED if non_stocked else KIND_LIMITED if maximum is not None else KIND_PRODUCT
+        self._names.append(name)
+        self._views.append(None)
+        self._size += 1
+        return self.product(row)
+
+    def add_products(self, names, prices, quantities):
+        """
+        add many plain products at once from a list of names and arrays of prices and quantities
+        the values are checked vectorized: names have to be non-empty strings, prices and quantities positive
+        and quantities whole numbers; the prices are rounded half up to the cent
+        return the number of added rows
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        quantities = np.asarray(quantities)
+        if not (len(names) == len(prices) == len(quantities)):
+            raise Exception("names, prices and quantities need to have the same length")
+        if not all(type(name) is str and name for name in names):
+            raise Exception("empty name, please enter a valid string")
+        if quantities.dtype.kind not in "iu":
+            raise Exception("please only enter an integer!")
+        if np.any(prices <= 0):
+            raise Exception("price can not be negative")
+        if np.any(quantities <= 0):
+            raise Exception("quantity can not be negative")
+        count = len(names)
+        while self._size + count > len(self._price_cents):
+            self._grow()
+        rows = slice(self._size, self._size + count)
+        self._price_cents[rows] = prices_to_cents(prices)
+        self._quantity[rows] = quantities
+        self._active[rows] = True
+        self._maximum[rows] = NO_MAXIMUM
+        self._promotion_code[rows] = NO_PROMOTION
+        self._kind[rows] = KIND_PRODUCT
+        self._names.extend(names)
+        self._views.extend([None] * count)
+        self._size += count
+        return count
+
+    def _grow(self):
+        """
+        double the capacity of all arrays
+        """
+        new_capacity = max(2 * len(self._price_cents), 1)
+        for column_name, fill_value in (("_price_cents", 0), ("_quantity", 0), ("_active", False),
+                                        ("_maximum", NO_MAXIMUM), ("_promotion_code", NO_PROMOTION), ("_kind", 0)):
+            column = getattr(self, column_name)
+            new_column = np.full(new_capacity, fill_value, dtype=column.dtype)
+            new_column[:len(column)] = column
+            setattr(self, column_name, new_column)
+
+    def _code_of_promotion(self, promotion):
+        """
+        return the promotion code of a promotion object, registering the promotion if it is new
+        """
+        if promotion is None:
+            return NO_PROMOTION
+        if id(promotion) not in self._promotion_codes:
+            self._promotion_codes[id(promotion)] = len(self._promotions)
+            self._promotions.append(promotion)
+        return self._promotion_codes[id(promotion)]
+
+    def to_store(self, **store_options):
+        """
+        create a Store backed by the product views of the inventory
+        """
+        return Store(self.products, **store_options)
+
+    def total_quantity(self, active_only=False):
+        """
+        return the total quantity of all products (or only of the active products)
+        """
+        quantity = self._quantity[:self._size]
+        if active_only:
+            return int(quantity[self._active[:self._size]].sum())
+        return int(quantity.sum())
+
+    def inventory_value(self, active_only=False):
+        """
+        return the sum of price * quantity over all products (or only over the active products)
+        """
+        value = self._price_cents[:self._size] * self._quantity[:self._size]
+        if active_only:
+            value = value[self._active[:self._size]]
+        return int(value.sum()) / CENTS_PER_UNIT
+
+    def active_count(self):
+        """
+        return the number of active products
+        """
+        return int(np.count_nonzero(self._active[:self._size]))
+
+    def mask(self, min_price=None, max_price=None, active_only=False, promotion=None):
+        """
+        return a boolean array selecting the rows which match all given filters
+        min_price and max_price are inclusive, promotion selects the rows having that promotion object
+        """
+        selected = np.ones(self._size, dtype=np.bool_)
+        prices_cents = self._price_cents[:self._size]
+        if min_price is not None:
+            selected &= prices_cents >= min_price * CENTS_PER_UNIT
+        if max_price is not None:
+            selected &= prices_cents <= max_price * CENTS_PER_UNIT
+        if active_only:
+            selected &= self._active[:self._size]
+        if promotion is not None:
+            selected &= self._promotion_code[:self._size] == self._promotion_codes.get(id(promotion), -2)
+        return selected
+
+    def select(self, **filters):
+        """
+        return the product views of the rows matching the filters of mask()
+        """
+        return [self.product(int(row)) for row in np.flatnonzero(self.mask(**filters))]
+
+    def reprice(self, factor=None, new_price=None, selected=None):
+        """
+        change the price of many products at once
+        factor multiplies the current prices, new_price sets the prices to a value (or an array of values)
+        selected is a boolean array (see mask()) choosing the rows to change, all rows if None
+        the new prices are rounded half up to the cent and checked to be positive before any price is changed
+        the listeners of the product views (e.g. the price index of a store) are notified of the new prices
+        """
+        if (factor is None) == (new_price is None):
+            raise Exception("please give either a factor or a new price")
+        rows = slice(0, self._size) if selected is None else np.flatnonzero(selected)
+        if factor is not None:
+            new_prices_cents = np.floor(self._price_cents[rows] * factor + 0.5).astype(np.int64)
+        else:
+            new_prices_cents = np.broadcast_to(prices_to_cents(np.asarray(new_price, dtype=np.float64)),
+                                               self._price_cents[rows].shape)
+        if np.any(new_prices_cents < 0):
+            raise Exception("price can't take a negative value")
+        views = self._views[:self._size] if selected is None else [self._views[row] for row in rows]
+        followed_views = [(view, view.price) for view in views if view is not None and view._listeners]
+        self._price_cents[rows] = new_prices_cents
+        for view, old_price in followed_views:
+            view._notify("price", old_price, view.price)
+
+
+def prices_to_cents(prices):
+    """
+    convert an array of prices in major units into integer cents, rounded half up
+    """
+    return np.floor(prices * CENTS_PER_UNIT + 0.5).astype(np.int64)
+
+
+class ColumnRowMixin:
+    """
+    Mixin turning the fields of a product class into properties reading and writing a row of a ColumnarInventory
+    """
+    __slots__ = ()
+
+    @classmethod
+    def _for_row(cls, inventory, row):
+        """
+        create the view of a row without going through the constructor of the product class
+        """
+        view = cls.__new__(cls)
+        view._inventory = inventory
+        view._row = row
+        view._name = inventory._names[row]
+        view._listeners = ()
+        view._lock = threading.RLock()
+        return view
+
+    @property
+    def _str_cache(self):
+        # the fields can change in the arrays of the inventory without the view being told, so its text is never cached
+        return None
+
+    @_str_cache.setter
+    def _str_cache(self, text):
+        pass
+
+    @property
+    def _price_cents(self):
+        return int(self._inventory._price_cents[self._row])
+
+    @_price_cents.setter
+    def _price_cents(self, price_cents):
+        self._inventory._price_cents[self._row] = price_cents
+
+    @property
+    def _quantity(self):
+        return int(self._inventory._quantity[self._row])
+
+    @_quantity.setter
+    def _quantity(self, quantity):
+        self._inventory._quantity[self._row] = quantity
+
+    @property
+    def _active(self):
+        return bool(self._inventory._active[self._row])
+
+    @_active.setter
+    def _active(self, active):
+        self._inventory._active[self._row] = active
+
+    @property
+    def _maximum(self):
+        return int(self._inventory._maximum[self._row])
+
+    @_maximum.setter
+    def _maximum(self, maximum):
+        self._inventory._maximum[self._row] = maximum
+
+    @property
+    def _promotion(self):
+        promotion_code = self._inventory._promotion_code[self._row]
+        if promotion_code == NO_PROMOTION:
+            return None
+        return self._inventory._promotions[promotion_code]
+
+    @_promotion.setter
+    def _promotion(self, promotion):
+        if promotion is not None and not isinstance(promotion, Promotion):
+            raise Exception("the input parameter is not an object of Class Promotion")
+        self._inventory._promotion_code[self._row] = self._inventory._code_of_promotion(promotion)
+
+
+class ColumnProduct(ColumnRowMixin, Product):
+    """
+    Product stored in a row of a ColumnarInventory
+    """
+    __slots__ = ("_inventory", "_row")
+
+
+class ColumnLimitedProduct(ColumnRowMixin, LimitedProduct):
+    """
+    LimitedProduct stored in a row of a ColumnarInventory
+    """
+    __slots__ = ("_inventory", "_row")
+
+
+class ColumnNonStockedProduct(ColumnRowMixin, NonStockedProduct):
+    """
+    NonStockedProduct stored in a row of a ColumnarInventory
+    """
+    __slots__ = ("_inventory", "_row")
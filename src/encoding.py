@@ -0,0 +1,111 @@
+import struct
+from src.products import Product, LimitedProduct, NonStockedProduct
+from src.promotions import SecondHalfPrice, ThirdOneFree, PercentDiscount
+
+# kinds of products in an encoded product
+KIND_PRODUCT = 0
+KIND_LIMITED = 1
+KIND_NON_STOCKED = 2
+
+
+def pack_str(text):
+    """
+    encode a string as its utf-8 length followed by the utf-8 bytes
+    """
+    encoded = text.encode("utf-8")
+    return struct.pack("<I", len(encoded)) + encoded
+
+
+def pack_number(number):
+    """
+    encode an int or a float, keeping its type
+    """
+    if type(number) is int:
+        return b"i" + struct.pack("<q", number)
+    return b"f" + struct.pack("<d", number)
+
+
+def pack_promotion(promotion):
+    """
+    encode one of the promotions of src.promotions (or None)
+    """
+    if promotion is None:
+        return b"\x00"
+    if type(promotion) is SecondHalfPrice:
+        return b"\x01" + pack_str(promotion._name)
+    if type(promotion) is ThirdOneFree:
+        return b"\x02" + pack_str(promotion._name)
+    if type(promotion) is PercentDiscount:
+        return b"\x03" + pack_str(promotion._name) + pack_number(promotion._percent)
+    raise Exception(f"the promotion {promotion} can't be encoded")
+
+
+def pack_product(product):
+    """
+    encode all fields of a product
+    """
+    if isinstance(product, NonStockedProduct):
+        data = struct.pack("<B", KIND_NON_STOCKED)
+    elif isinstance(product, LimitedProduct):
+        data = struct.pack("<B", KIND_LIMITED)
+    else:
+        data = struct.pack("<B", KIND_PRODUCT)
+    data += pack_str(product._name)
+    data += struct.pack("<qq?q", product._price_cents, product._quantity, product._active,
+                        product._maximum if isinstance(product, LimitedProduct) else 0)
+    return data + pack_promotion(product._promotion)
+
+
+class Reader:
+    """
+    reads the values encoded by the pack functions from bytes, one after another
+    """
+
+    def __init__(self, data, offset=0):
+        self._data = data
+        self._offset = offset
+
+    def unpack(self, struct_format):
+        value = struct.unpack_from(struct_format, self._data, self._offset)[0]
+        self._offset += struct.calcsize(struct_format)
+        return value
+
+    def str(self):
+        length = self.unpack("<I")
+        text = bytes(self._data[self._offset:self._offset + length]).decode("utf-8")
+        self._offset += length
+        return text
+
+    def number(self):
+        number_type = self._data[self._offset:self._offset + 1]
+        self._offset += 1
+        return self.unpack("<q") if number_type == b"i" else self.unpack("<d")
+
+    def promotion(self):
+        promotion_type = self.unpack("<B")
+        if promotion_type == 0:
+            return None
+        name = self.str()
+        if promotion_type == 1:
+            return SecondHalfPrice(name)
+        if promotion_type == 2:
+            return ThirdOneFree(name)
+        return PercentDiscount(name, self.number())
+
+    def product(self):
+        kind = self.unpack("<B")
+        name = self.str()
+        price_cents = self.unpack("<q")
+        quantity = self.unpack("<q")
+        active = self.unpack("<?")
+        maximum = self.unpack("<q")
+        if kind == KIND_NON_STOCKED:
+            product = NonStockedProduct.from_trusted(name, None, price_cents=price_cents)
+        elif kind == KIND_LIMITED:
+            product = LimitedProduct.from_trusted(name, None, quantity, maximum, price_cents=price_cents)
+        else:
+            product = Product.from_trusted(name, None, quantity, price_cents=price_cents)
+        product._quantity = quantity
+        product._active = active
+        product._promotion = self.promotion()
+        return product
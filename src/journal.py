@@ -0,0 +1,308 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from src.encoding import pack_str, pack_promotion, pack_product, Reader
+from src.store import Store
+
+JOURNAL_FILE_NAME = "journal.bin"
+SNAPSHOT_FILE_NAME = "snapshot.bin"
+# the version in the magic numbers was raised when the prices started to be stored in integer cents
+JOURNAL_MAGIC = b"BBJ2"
+SNAPSHOT_MAGIC = b"BBS2"
+
+# journal record types
+RECORD_ORDER = 1
+RECORD_QUANTITY = 2
+RECORD_ACTIVE = 3
+RECORD_PRICE = 4
+RECORD_PROMOTION = 5
+RECORD_ADD_PRODUCT = 6
+RECORD_REMOVE_PRODUCT = 7
+
+# record header: payload length, sequence number, record type. The record ends with a crc32 of header + payload
+RECORD_HEADER = struct.Struct("<IQB")
+RECORD_CRC = struct.Struct("<I")
+
+
+class StoreJournal:
+    """
+    class StoreJournal makes the state of a store survive a restart.
+    Every committed order and every change of a product is appended to a binary journal file. The records are
+    written in groups: they are collected in memory and written + fsync'ed together once group_size records
+    are pending or max_delay seconds passed since the first pending record (a timer syncs the group when no
+    further record is added in time).
+    Records which are not synced yet are lost on a crash, like with any group commit.
+    Snapshots of the whole store are written by checkpoint(), after which the journal starts empty again.
+    The products of the store are identified by their name, so the names have to be unique in the store
+    """
+
+    def __init__(self, store, directory, group_size=64, max_delay=0.01, snapshot_every=None):
+        """
+        attach a journal to a store, writing its files into directory
+        a snapshot of the current state of the store is written first, so the journal always starts from
+        the state the store has when it is attached
+        snapshot_every: write a new snapshot automatically after this many records, never if None
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._store = store
+        self._journal_path = os.path.join(directory, JOURNAL_FILE_NAME)
+        self._snapshot_path = os.path.join(directory, SNAPSHOT_FILE_NAME)
+        self._group_size = group_size
+        self._max_delay = max_delay
+        self._snapshot_every = snapshot_every
+        self._lock = threading.RLock()
+        self._pending = bytearray()
+        self._pending_records = 0
+        self._first_pending_time = None
+        self._sync_timer = None  # threading.Timer syncing the pending group once max_delay passed
+        self._records_since_snapshot = 0
+        # the sequence numbers continue after the old snapshot and journal, so recovery never mistakes
+        # old records for records written after the new snapshot
+        self._next_sequence = last_sequence(directory) + 1
+        self._in_order = threading.local()  # set while the thread is buying the lines of an order
+        self._journal_file = None
+        self._products_by_name = {}
+        for product in store._products_index.values():
+            self._follow_product(product)
+        self.checkpoint()
+        store.add_listener(self)
+
+    def _follow_product(self, product):
+        """
+        start recording the changes of a product
+        """
+        if product._name in self._products_by_name:
+            raise Exception(f"the journal needs unique product names, {product._name} is used twice")
+        self._products_by_name[product._name] = product
+        product.add_listener(self)
+
+    def product_changed(self, product, field, old_value, new_value):
+        """
+        called by the products of the store when one of their fields changes
+        the changes made while an order is bought are not recorded, the order is recorded as a whole instead
+        """
+        if getattr(self._in_order, "value", False):
+            return
+        if field == "quantity":
+            self._append(RECORD_QUANTITY, pack_str(product._name) + struct.pack("<q", new_value))
+        elif field == "active":
+            self._append(RECORD_ACTIVE, pack_str(product._name) + struct.pack("<?", new_value))
+        elif field == "price":
+            self._append(RECORD_PRICE, pack_str(product._name) + struct.pack("<q", product._price_cents))
+        elif field == "promotion":
+            self._append(RECORD_PROMOTION, pack_str(product._name) + pack_promotion(new_value))
+
+    def store_changed(self, store, event, data):
+        """
+        called by the store for added and removed products and for orders
+        """
+        if event == "add_product":
+            with self._lock:
+                self._follow_product(data)
+                self._append(RECORD_ADD_PRODUCT, pack_product(data))
+        elif event == "remove_product":
+            with self._lock:
+                data.remove_listener(self)
+                self._products_by_name.pop(data._name, None)
+                self._append(RECORD_REMOVE_PRODUCT, pack_str(data._name))
+        elif event == "order_started":
+            self._in_order.value = True
+        elif event == "order_failed":
+            self._in_order.value = False
+        elif event == "order_committed":
+            self._in_order.value = False
+            payload = bytearray(struct.pack("<I", len(data)))
+            for product, amount in data:
+                payload += pack_str(product._name) + struct.pack("<q", amount)
+            self._append(RECORD_ORDER, bytes(payload))
+
+    def _append(self, record_type, payload):
+        """
+        add a record to the pending group, syncing the group when it is full or old enough
+        """
+        with self._lock:
+            header = RECORD_HEADER.pack(len(payload), self._next_sequence, record_type)
+            self._pending += header
+            self._pending += payload
+            self._pending += RECORD_CRC.pack(zlib.crc32(payload, zlib.crc32(header)))
+            self._next_sequence += 1
+            self._pending_records += 1
+            self._records_since_snapshot += 1
+            if self._first_pending_time is None:
+                self._first_pending_time = time.monotonic()
+            if self._snapshot_every is not None and self._records_since_snapshot >= self._snapshot_every:
+                self.checkpoint()
+            elif (self._pending_records >= self._group_size
+                  or time.monotonic() - self._first_pending_time >= self._max_delay):
+                self.sync()
+            elif self._sync_timer is None:
+                # without further records the group would wait for the next one, the timer syncs it in time
+                self._sync_timer = threading.Timer(self._max_delay, self.sync)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+
+    def sync(self):
+        """
+        write the pending records to the journal file and fsync it
+        """
+        with self._lock:
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+                self._sync_timer = None
+            if self._pending:
+                self._journal_file.write(self._pending)
+                self._journal_file.flush()
+                os.fsync(self._journal_file.fileno())
+                self._pending = bytearray()
+            self._pending_records = 0
+            self._first_pending_time = None
+
+    def checkpoint(self):
+        """
+        write a snapshot of the store and start an empty journal
+        the snapshot replaces the old one atomically; if the process dies before the journal is emptied,
+        recovery skips the journal records already contained in the snapshot
+        the store should not be changed by other threads while the snapshot is taken
+        """
+        with self._lock:
+            if self._journal_file is not None:
+                self.sync()
+            write_snapshot(self._snapshot_path, self._next_sequence - 1, self._products_by_name.values())
+            if self._journal_file is not None:
+                self._journal_file.close()
+            self._journal_file = open(self._journal_path, "wb")
+            self._journal_file.write(JOURNAL_MAGIC)
+            self._journal_file.flush()
+            os.fsync(self._journal_file.fileno())
+            self._records_since_snapshot = 0
+
+    def close(self):
+        """
+        sync the pending records and stop recording the changes of the store
+        """
+        with self._lock:
+            self.sync()
+            self._store.remove_listener(self)
+            for product in self._products_by_name.values():
+                product.remove_listener(self)
+            self._journal_file.close()
+
+
+def recover_store(directory, **store_options):
+    """
+    rebuild a store from the latest snapshot in directory and the journal records written after it
+    a torn or corrupted record at the end of the journal (e.g. from a crash during a write) ends the replay
+    the store_options are passed to the constructor of Store
+    """
+    snapshot_sequence, products_list = read_snapshot(os.path.join(directory, SNAPSHOT_FILE_NAME))
+    products_by_name = {product._name: product for product in products_list}
+    journal_path = os.path.join(directory, JOURNAL_FILE_NAME)
+    if os.path.exists(journal_path):
+        with open(journal_path, "rb") as journal_file:
+            data = journal_file.read()
+        for sequence, record_type, payload in iter_records(data):
+            if sequence > snapshot_sequence:
+                apply_record(products_by_name, record_type, payload)
+    return Store(list(products_by_name.values()), **store_options)
+
+
+def last_sequence(directory):
+    """
+    return the sequence number of the last record in the snapshot or the journal of directory, 0 if there is none
+    """
+    sequence = 0
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILE_NAME)
+    if os.path.exists(snapshot_path):
+        sequence = read_snapshot(snapshot_path)[0]
+    journal_path = os.path.join(directory, JOURNAL_FILE_NAME)
+    if os.path.exists(journal_path):
+        with open(journal_path, "rb") as journal_file:
+            for record_sequence, _, _ in iter_records(journal_file.read()):
+                sequence = max(sequence, record_sequence)
+    return sequence
+
+
+def iter_records(data):
+    """
+    yield (sequence, record type, payload) for every complete and valid record of journal file data
+    """
+    if data[:len(JOURNAL_MAGIC)] != JOURNAL_MAGIC:
+        raise Exception("not a journal file")
+    offset = len(JOURNAL_MAGIC)
+    while offset + RECORD_HEADER.size <= len(data):
+        payload_length, sequence, record_type = RECORD_HEADER.unpack_from(data, offset)
+        payload_start = offset + RECORD_HEADER.size
+        payload_end = payload_start + payload_length
+        if payload_end + RECORD_CRC.size > len(data):
+            return
+        header = data[offset:payload_start]
+        payload = data[payload_start:payload_end]
+        if RECORD_CRC.unpack_from(data, payload_end)[0] != zlib.crc32(payload, zlib.crc32(header)):
+            return
+        yield sequence, record_type, payload
+        offset = payload_end + RECORD_CRC.size
+
+
+def apply_record(products_by_name, record_type, payload):
+    """
+    replay a journal record on the products of a store being recovered (name -> product, in store order)
+    """
+    reader = Reader(payload)
+    if record_type == RECORD_ADD_PRODUCT:
+        product = reader.product()
+        products_by_name[product._name] = product
+        return
+    if record_type == RECORD_ORDER:
+        for _ in range(reader.unpack("<I")):
+            product = products_by_name[reader.str()]
+            product._remove_stock(reader.unpack("<q"))
+        return
+    name = reader.str()
+    if record_type == RECORD_QUANTITY:
+        products_by_name[name]._quantity = reader.unpack("<q")
+    elif record_type == RECORD_ACTIVE:
+        products_by_name[name]._active = reader.unpack("<?")
+    elif record_type == RECORD_PRICE:
+        products_by_name[name]._price_cents = reader.unpack("<q")
+    elif record_type == RECORD_PROMOTION:
+        products_by_name[name]._promotion = reader.promotion()
+    elif record_type == RECORD_REMOVE_PRODUCT:
+        del products_by_name[name]
+    else:
+        raise Exception(f"unknown journal record type {record_type}")
+
+
+def write_snapshot(path, sequence, products_list):
+    """
+    write a snapshot of products into path, covering the journal records up to sequence
+    the snapshot is written into a temporary file first and then moved over the old snapshot
+    """
+    data = bytearray(SNAPSHOT_MAGIC)
+    data += struct.pack("<QQ", sequence, len(products_list))
+    for product in products_list:
+        data += pack_product(product)
+    data += RECORD_CRC.pack(zlib.crc32(data))
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as snapshot_file:
+        snapshot_file.write(data)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temporary_path, path)
+
+
+def read_snapshot(path):
+    """
+    read a snapshot file, return (sequence of the last journal record it covers, list of products)
+    """
+    with open(path, "rb") as snapshot_file:
+        data = snapshot_file.read()
+    if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise Exception("not a snapshot file")
+    if RECORD_CRC.unpack_from(data, len(data) - RECORD_CRC.size)[0] != zlib.crc32(data[:-RECORD_CRC.size]):
+        raise Exception("the snapshot file is corrupted")
+    reader = Reader(data, len(SNAPSHOT_MAGIC))
+    sequence = reader.unpack("<Q")
+    products_list = [reader.product() for _ in range(reader.unpack("<Q"))]
+    return sequence, products_list
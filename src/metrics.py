@@ -0,0 +1,217 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+# upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.000001, 0.000005, 0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+# the active registry, None while the instrumentation is disabled
+registry = None
+
+
+class Histogram:
+    """
+    class Histogram counts observed latencies in the buckets of LATENCY_BUCKETS (plus one bucket for larger values)
+    """
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.bucket_counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class MetricsRegistry:
+    """
+    class MetricsRegistry collects counters and latency histograms, keyed by a metric name and a tuple of labels
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> int
+        self._histograms = {}  # (name, labels) -> Histogram
+
+    def increment(self, name, labels=(), amount=1):
+        """
+        add amount to a counter
+        labels: tuple of (label name, value) pairs
+        """
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + amount
+
+    def observe(self, name, seconds, labels=()):
+        """
+        record a latency in a histogram
+        """
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram()
+            histogram.observe(seconds)
+
+    def call(self, name, function, args=(), kwargs=None, labels=(), classify_error=None):
+        """
+        call function(*args, **kwargs), counting the call in name_total, its latency in name_seconds and a raised
+        exception in name_errors_total (with a "reason" label given by classify_error(exception) if set)
+        """
+        start_time = time.perf_counter()
+        try:
+            return function(*args, **(kwargs or {}))
+        except Exception as err:
+            reason = classify_error(err) if classify_error is not None else "error"
+            self.increment(name + "_errors_total", labels + (("reason", reason),))
+            raise
+        finally:
+            self.increment(name + "_total", labels)
+            self.observe(name + "_seconds", time.perf_counter() - start_time, labels)
+
+    def counter(self, name, labels=()):
+        """
+        return the value of a counter, 0 if it was never incremented
+        """
+        return self._counters.get((name, labels), 0)
+
+    def snapshot(self):
+        """
+        return a copy of all metrics: {"counters": {(name, labels): value},
+        "histograms": {(name, labels): {"buckets": [...], "count": n, "sum": seconds}}}
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "histograms": {key: {"buckets": list(histogram.bucket_counts), "count": histogram.count,
+                                     "sum": histogram.sum}
+                               for key, histogram in self._histograms.items()},
+            }
+
+    def export(self, callback):
+        """
+        hand a snapshot of all metrics to a callback, e.g. to push them to a monitoring system
+        """
+        callback(self.snapshot())
+
+    def to_prometheus(self):
+        """
+        return all metrics in the Prometheus text exposition format
+        """
+        snapshot = self.snapshot()
+        lines = []
+        typed_names = set()
+        for (name, labels), value in sorted(snapshot["counters"].items()):
+            if name not in typed_names:
+                lines.append(f"# TYPE {name} counter")
+                typed_names.add(name)
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(snapshot["histograms"].items()):
+            if name not in typed_names:
+                lines.append(f"# TYPE {name} histogram")
+                typed_names.add(name)
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(LATENCY_BUCKETS + ("+Inf",), histogram["buckets"]):
+                cumulative_count += bucket_count
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', str(upper_bound)),))} {cumulative_count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    """
+    format a tuple of (label name, value) pairs as {name="value",...}, empty string without labels
+    """
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{label}="{value}"' for label, value in labels) + "}"
+
+
+# (class, attribute name, plain attribute, instrumented attribute) of every attribute marked by instrumented()
+instrumented_attributes = []
+
+
+def enable():
+    """
+    start collecting metrics into a new registry and return it
+    the instrumented methods are swapped into their classes
+    """
+    global registry
+    registry = MetricsRegistry()
+    for cls, attribute_name, _, instrumented_attribute in instrumented_attributes:
+        setattr(cls, attribute_name, instrumented_attribute)
+    return registry
+
+
+def disable():
+    """
+    stop collecting metrics, return the registry which was active (or None)
+    the plain methods are put back into their classes, so they don't cost anything while disabled
+    """
+    global registry
+    active_registry = registry
+    registry = None
+    for cls, attribute_name, plain_attribute, _ in instrumented_attributes:
+        setattr(cls, attribute_name, plain_attribute)
+    return active_registry
+
+
+def instrumented(name, classify_error=None, **labels):
+    """
+    decorator marking a method (or the getter of a property) to count its calls, errors and latency under name
+    the method itself is left unchanged: instrument_class registers it, and enable() swaps an instrumented
+    copy into the class
+    """
+    labels = tuple(sorted(labels.items()))
+
+    def decorator(function):
+        function.metric = (name, classify_error, labels)
+        return function
+    return decorator
+
+
+def instrument_class(cls):
+    """
+    class decorator registering the methods and property getters of a class marked by instrumented()
+    """
+    for attribute_name, attribute in list(vars(cls).items()):
+        function = attribute.fget if isinstance(attribute, property) else attribute
+        metric = getattr(function, "metric", None)
+        if metric is None:
+            continue
+        instrumented_attribute = instrument(function, *metric)
+        if isinstance(attribute, property):
+            instrumented_attribute = attribute.getter(instrumented_attribute)
+        instrumented_attributes.append((cls, attribute_name, attribute, instrumented_attribute))
+        if registry is not None:
+            setattr(cls, attribute_name, instrumented_attribute)
+    return cls
+
+
+def instrument(function, name, classify_error, labels):
+    """
+    return a wrapper of function counting its calls, errors and latency in the active registry
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        active_registry = registry
+        if active_registry is None:
+            return function(*args, **kwargs)
+        return active_registry.call(name, function, args, kwargs, labels, classify_error)
+    return wrapper
+
+
+def classify_buy_error(err):
+    """
+    return the reason label of an exception raised by Product.buy
+    """
+    message = str(err)
+    if message.startswith("not enough"):
+        return "stock"
+    if message.startswith("please order a quantity less than"):
+        return "maximum"
+    if message == "Product is not active":
+        return "inactive"
+    return "invalid"
@@ -0,0 +1,58 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# prices in the fixed-point mode are integers counting the minor unit (cents)
+CENTS_PER_UNIT = 100
+# cents of the float prices converted so far: a catalog only has a limited number of distinct prices,
+# so the exact (but slow) decimal conversion is done once per price
+_float_cents = {}
+MAX_CACHED_PRICES = 100000
+
+
+def to_cents(price):
+    """
+    convert a price in major units (int or float) into integer cents
+    a float is read by its shortest representation (19.99 -> 1999) and rounded half up to the cent
+    """
+    if type(price) is int:
+        return price * CENTS_PER_UNIT
+    cents = _float_cents.get(price)
+    if cents is None:
+        cents = int((Decimal(repr(price)) * CENTS_PER_UNIT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+        if len(_float_cents) >= MAX_CACHED_PRICES:
+            _float_cents.clear()
+        _float_cents[price] = cents
+    return cents
+
+
+def from_cents(cents):
+    """
+    convert integer cents back into a price in major units like the price property uses:
+    an int for whole units, a float otherwise
+    """
+    units, rest = divmod(cents, CENTS_PER_UNIT)
+    return units if rest == 0 else cents / CENTS_PER_UNIT
+
+
+def divide_round(numerator, denominator):
+    """
+    integer division of non-negative numbers rounding half up, the rounding rule of the fixed-point mode
+    """
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def ratio(number):
+    """
+    return (numerator, denominator) of a percentage or other int / float as integers, e.g. 12.5 -> (25, 2)
+    """
+    if type(number) is int:
+        return number, 1
+    return Decimal(repr(number)).as_integer_ratio()
+
+
+def format_cents(cents):
+    """
+    return integer cents as a text with 2 decimals, e.g. 217550 -> "2175.50"
+    """
+    sign = "-" if cents < 0 else ""
+    units, rest = divmod(abs(cents), CENTS_PER_UNIT)
+    return f"{sign}{units}.{rest:02d}"
@@ -0,0 +1,151 @@
+import re
+from bisect import bisect_left, bisect_right, insort
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")  # runs of letters and digits, including non-ASCII ones
+
+
+def tokenize(name):
+    """
+    split a product name into case-folded words, e.g. "Google Pixel 7" -> ["google", "pixel", "7"],
+    "Café Crème" -> ["café", "crème"]
+    """
+    return TOKEN_PATTERN.findall(name.casefold())
+
+
+class NameIndex:
+    """
+    class NameIndex finds products by their name:
+    exact names through a dict, case-insensitive prefixes through a sorted array of case-folded names
+    (binary search) and single words of the names through a dict of tokens
+    most names and tokens belong to a single product, so a bucket of the dicts holds the product itself and
+    only becomes a dict {id(product): product} once a second product shares the name or token
+    """
+
+    def __init__(self, products_list=()):
+        """
+        build the index for a list of products, sorting the names only once
+        """
+        self._by_name = {}  # name -> bucket of products
+        self._by_token = {}  # token -> bucket of products
+        self._products = {}  # id(product) -> product
+        self._sorted_names = []  # sorted tuples (case-folded name, id(product))
+        for product in products_list:
+            self._add_to_dicts(product)
+        self._sorted_names = sorted((product._name.casefold(), product_id)
+                                    for product_id, product in self._products.items())
+
+    def _add_to_dicts(self, product):
+        self._products[id(product)] = product
+        add_to_bucket(self._by_name, product._name, product)
+        for token in tokenize(product._name):
+            add_to_bucket(self._by_token, token, product)
+
+    def add(self, product):
+        """
+        add a product to the index
+        """
+        self._add_to_dicts(product)
+        insort(self._sorted_names, (product._name.casefold(), id(product)))
+
+    def remove(self, product):
+        """
+        remove a product from the index
+        """
+        if self._products.pop(id(product), None) is None:
+            return
+        remove_from_bucket(self._by_name, product._name, product)
+        for token in tokenize(product._name):
+            remove_from_bucket(self._by_token, token, product)
+        key = (product._name.casefold(), id(product))
+        position = bisect_left(self._sorted_names, key)
+        if position < len(self._sorted_names) and self._sorted_names[position] == key:
+            del self._sorted_names[position]
+
+    def exact(self, name, active_only=False):
+        """
+        return the list of products having exactly this name
+        active_only = True leaves out the inactive products
+        """
+        return [product for product in bucket_products(self._by_name, name) if product.active or not active_only]
+
+    def prefix(self, prefix, limit=None, active_only=False):
+        """
+        return the products whose name starts with prefix (case-insensitive), sorted by name
+        limit: maximum number of products to return, all if None
+        active_only = True leaves out the inactive products
+        """
+        prefix = prefix.casefold()
+        found_products = []
+        position = bisect_left(self._sorted_names, (prefix,))
+        while position < len(self._sorted_names) and (limit is None or len(found_products) < limit):
+            name, product_id = self._sorted_names[position]
+            if not name.startswith(prefix):
+                break
+            product = self._products[product_id]
+            if product.active or not active_only:
+                found_products.append(product)
+            position += 1
+        return found_products
+
+    def iter_sorted(self, after=None):
+        """
+        yield (key, product) pairs sorted by name (case-insensitive), starting after the key after (from the
+        first product if None), the key of a product is (case-folded name, id(product))
+        the position is looked up again for every product, so products added or removed while iterating are
+        neither skipped nor repeated
+        """
+        sorted_names = self._sorted_names
+        while True:
+            position = 0 if after is None else bisect_right(sorted_names, after)
+            if position >= len(sorted_names):
+                return
+            after = sorted_names[position]
+            product = self._products.get(after[1])
+            if product is not None:
+                yield after, product
+
+    def token(self, word, active_only=False):
+        """
+        return the products having word as one of the words of their name (case-insensitive)
+        active_only = True leaves out the inactive products
+        """
+        return [product for product in bucket_products(self._by_token, word.casefold())
+                if product.active or not active_only]
+
+
+def add_to_bucket(buckets, key, product):
+    """
+    add a product to the bucket stored under key
+    """
+    bucket = buckets.get(key)
+    if bucket is None:
+        buckets[key] = product
+    elif type(bucket) is dict:
+        bucket[id(product)] = product
+    elif bucket is not product:
+        buckets[key] = {id(bucket): bucket, id(product): product}
+
+
+def remove_from_bucket(buckets, key, product):
+    """
+    remove a product from the bucket stored under key, dropping the bucket when it becomes empty
+    """
+    bucket = buckets.get(key)
+    if bucket is product:
+        del buckets[key]
+    elif type(bucket) is dict:
+        bucket.pop(id(product), None)
+        if not bucket:
+            del buckets[key]
+
+
+def bucket_products(buckets, key):
+    """
+    return the products of the bucket stored under key
+    """
+    bucket = buckets.get(key)
+    if bucket is None:
+        return ()
+    if type(bucket) is dict:
+        return bucket.values()
+    return (bucket,)
@@ -0,0 +1,97 @@
+from bisect import bisect_left, bisect_right, insort
+
+
+class PriceIndex:
+    """
+    class PriceIndex keeps the active products of a store sorted by price (a sorted array searched by bisect),
+    so range and top-N queries cost O(log n + k). Inactive products are not in the index at all,
+    so the queries never have to skip them
+    """
+
+    def __init__(self, products_list=()):
+        """
+        build the index for the active products of a list, sorting them only once
+        """
+        self._products = {}  # id(product) -> product
+        self._sorted_prices = []  # sorted tuples (price, id(product))
+        for product in products_list:
+            if product.active:
+                self._products[id(product)] = product
+        self._sorted_prices = sorted((product.price, product_id)
+                                     for product_id, product in self._products.items())
+
+    def __len__(self):
+        return len(self._sorted_prices)
+
+    def add(self, product, price=None):
+        """
+        add a product to the index with its current price (or the price passed as argument)
+        """
+        if id(product) not in self._products:
+            self._products[id(product)] = product
+            insort(self._sorted_prices, (product.price if price is None else price, id(product)))
+
+    def remove(self, product, price=None):
+        """
+        remove a product which is in the index with its current price (or the price passed as argument)
+        """
+        if self._products.pop(id(product), None) is not None:
+            key = (product.price if price is None else price, id(product))
+            position = bisect_left(self._sorted_prices, key)
+            if position < len(self._sorted_prices) and self._sorted_prices[position] == key:
+                del self._sorted_prices[position]
+
+    def change_price(self, product, old_price, new_price):
+        """
+        move a product of the index from its old price to its new price
+        """
+        if id(product) in self._products:
+            self.remove(product, old_price)
+            self.add(product, new_price)
+
+    def price_range(self, min_price=None, max_price=None, limit=None):
+        """
+        return the products with min_price <= price <= max_price (both optional), cheapest first
+        limit: maximum number of products to return, all if None
+        """
+        start = 0 if min_price is None else bisect_left(self._sorted_prices, (min_price,))
+        if max_price is None:
+            end = len(self._sorted_prices)
+        else:
+            end = bisect_right(self._sorted_prices, (max_price, float("inf")))
+        if limit is not None:
+            end = min(end, start + limit)
+        return [self._products[product_id] for _, product_id in self._sorted_prices[start:end]]
+
+    def iter_sorted(self, after=None):
+        """
+        yield (key, product) pairs cheapest first, starting after the key after (from the cheapest product
+        if None), the key of a product is (price, id(product))
+        the position is looked up again for every product, so products added, removed or repriced while
+        iterating are neither skipped nor repeated
+        """
+        sorted_prices = self._sorted_prices
+        while True:
+            position = 0 if after is None else bisect_right(sorted_prices, after)
+            if position >= len(sorted_prices):
+                return
+            after = sorted_prices[position]
+            product = self._products.get(after[1])
+            if product is not None:
+                yield after, product
+
+    def cheapest(self, count):
+        """
+        return the count cheapest products, cheapest first
+        """
+        if count <= 0:
+            return []
+        return [self._products[product_id] for _, product_id in self._sorted_prices[:count]]
+
+    def most_expensive(self, count):
+        """
+        return the count most expensive products, most expensive first
+        """
+        if count <= 0:
+            return []
+        return [self._products[product_id] for _, product_id in reversed(self._sorted_prices[-count:])]
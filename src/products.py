@@ -1,10 +1,18 @@
+import threading
+from src import metrics
+from src.money import CENTS_PER_UNIT, to_cents, from_cents
 from src.promotions import Promotion, SecondHalfPrice, PercentDiscount, ThirdOneFree
+from src.quote_cache import default_quote_cache
 
 
+@metrics.instrument_class
 class Product:
     """
     class Product to handle all information of a product
+    the fields are kept in __slots__ instead of a per-instance __dict__ to keep large catalogs compact
+    the price is stored in integer cents (_price_cents), the price property hands it out in major units
     """
+    __slots__ = ("_name", "_price_cents", "_quantity", "_active", "_promotion", "_listeners", "_lock", "_str_cache")
 
     def __init__(self, name, price, quantity):
         """
@@ -14,8 +22,12 @@ class Product:
         :param quantity:
         bool active = True (default)
         additional instance variable for promotion object: _promotion
+        additional instance variable for the objects listening to changes of the product: _listeners
         """
         self._promotion = None  # instance variable of class Promotion
+        self._listeners = ()  # objects (e.g. stores) with a product_changed(product, field, old, new) method
+        self._lock = threading.RLock()  # guards the stock of the product against concurrent purchases
+        self._str_cache = None  # text returned by __str__, None until asked for and after a field changed
         if quantity:
             if is_int_type_check(quantity):
                 if quantity > 0:
@@ -28,7 +40,7 @@ class Product:
         if price:
             if is_int_or_float_type_check(price):
                 if price > 0:
-                    self._price = price
+                    self._price_cents = to_cents(price)
                 else:
                     raise Exception("price can not be negative")
         else:
@@ -40,6 +52,23 @@ class Product:
             raise Exception("empty name, please enter a valid string")
         self._active = True
 
+    @classmethod
+    def from_trusted(cls, name, price, quantity, price_cents=None):
+        """
+        create a product without checking the arguments, for bulk loads of catalogs which are already validated
+        price_cents: the price in integer cents, used instead of price if given
+        """
+        product = cls.__new__(cls)
+        product._name = name
+        product._price_cents = to_cents(price) if price_cents is None else price_cents
+        product._quantity = quantity
+        product._active = True
+        product._promotion = None
+        product._listeners = ()
+        product._lock = threading.RLock()
+        product._str_cache = None
+        return product
+
     # A getter and setter for the promotion instance variable using
     @property
     def promotion(self):
@@ -54,25 +83,52 @@ class Product:
         set _promotion value with an Object of the children class of abstract class Promotion
         """
         if isinstance(promotion, Promotion) and promotion is not None:
+            old_promotion = self._promotion
             self._promotion = promotion
+            self._notify("promotion", old_promotion, promotion)
         else:
             raise Exception("the input parameter is not an object of Class Promotion")
 
     @property
     def price(self):
         """
-        return price of the product
+        return price of the product in major units: an int for whole units, a float otherwise (see from_cents)
         """
-        return self._price
+        # from_cents written out, since the float pricing reads the price for every order line
+        price_cents = self._price_cents
+        if price_cents % CENTS_PER_UNIT:
+            return price_cents / CENTS_PER_UNIT
+        return price_cents // CENTS_PER_UNIT
 
     @price.setter
     def price(self, price):
         if is_int_or_float_type_check(price):
             if price >= 0:
-                self._price = price
+                self.price_cents = to_cents(price)
             else:
                 raise Exception("price can't take a negative value")
 
+    @property
+    def price_cents(self):
+        """
+        return the price of the product in integer cents, for the fixed-point pricing
+        """
+        return self._price_cents
+
+    @price_cents.setter
+    def price_cents(self, price_cents):
+        """
+        set the price of the product in integer cents
+        the listeners are told the old and the new price in major units, like price returns them
+        """
+        if type(price_cents) is not int:
+            raise Exception("a price in cents has to be an int")
+        if price_cents < 0:
+            raise Exception("price can't take a negative value")
+        old_price = self.price
+        self._price_cents = price_cents
+        self._notify("price", old_price, from_cents(price_cents))
+
     @property
     def quantity(self):
         """
@@ -86,7 +142,10 @@ class Product:
         set the quantity of the product
         """
         if is_int_type_check(quantity):
-            self._quantity = quantity
+            with self._lock:
+                old_quantity = self._quantity
+                self._quantity = quantity
+                self._notify("quantity", old_quantity, quantity)
 
     @property
     def active(self):
@@ -100,23 +159,61 @@ class Product:
         activate the product
         set the active attribute of the product to True
         """
-        self._active = True
+        with self._lock:
+            if not self._active:
+                self._active = True
+                self._notify("active", False, True)
 
     def deactivate(self):
         """
         deactivate the product
         set the active attribute of the product to False
         """
-        self._active = False
+        with self._lock:
+            if self._active:
+                self._active = False
+                self._notify("active", True, False)
+
+    def add_listener(self, listener):
+        """
+        register an object which gets notified through listener.product_changed(product, field, old, new)
+        whenever the quantity, the price, the promotion or the active state of the product changes
+        """
+        # the list is replaced instead of changed in place, so a _notify running in another thread
+        # keeps iterating over the old list
+        if listener not in self._listeners:
+            self._listeners = self._listeners + (listener,)
+
+    def remove_listener(self, listener):
+        """
+        unregister a listener added with add_listener
+        """
+        if listener in self._listeners:
+            self._listeners = tuple(other_listener for other_listener in self._listeners
+                                    if other_listener is not listener)
+
+    def _notify(self, field, old_value, new_value):
+        """
+        inform all listeners that a field of the product changed
+        every field change goes through here, so it is also where the cached text of __str__ is dropped
+        """
+        self._str_cache = None
+        for listener in self._listeners:
+            listener.product_changed(self, field, old_value, new_value)
 
     def __str__(self):
         """
         return the information of the product
+        the text is cached until a field of the product changes, so listing a catalog again is cheap
         """
-        if self._promotion:
-            return f"{self._name}, Price: {self._price}, Quantity: {self._quantity}, Promotion: {self._promotion}"
-        else:
-            return f"{self._name}, Price: {self._price}, Quantity: {self._quantity}"
+        text = self._str_cache
+        if text is None:
+            if self._promotion:
+                text = f"{self._name}, Price: {self.price}, Quantity: {self._quantity}, Promotion: {self._promotion}"
+            else:
+                text = f"{self._name}, Price: {self.price}, Quantity: {self._quantity}"
+            self._str_cache = text
+        return text
 
     def __lt__(self, other_product):
         """
@@ -124,7 +221,7 @@ class Product:
         for comparing the price of the Product objects
         """
         if isinstance(other_product, Product):
-            return self._price < other_product._price
+            return self._price_cents < other_product._price_cents
         else:
             raise Exception("Not an object of Product")
 
@@ -134,44 +231,115 @@ class Product:
         for comparing the price of the Product objects
         """
         if isinstance(other_product, Product):
-            return self._price > other_product._price
+            return self._price_cents > other_product._price_cents
         else:
             raise Exception("Not an object of Product")
 
-    def buy(self, quantity):
+    def check_buy(self, quantity):
         """
-        reduce the total quantity of the product by the quantity passed as argument
+        check whether the quantity passed as argument can be bought, without changing the product
+        raise the same exception as buy() would if it can't
         """
         if self._active:
             if is_int_type_check(quantity):
-                if 0 < quantity <= self._quantity:
-                    self._quantity -= quantity
-                    if self._quantity == 0:
-                        self.deactivate()
-                    if not self._promotion:
-                        return quantity * self._price
+                if not 0 < quantity <= self._quantity:
+                    if quantity < 0:
+                        raise Exception("please give a quantity larger than 0!")
                     else:
-                        return self._promotion.apply_promotion(self, quantity)
-                elif quantity < 0:
-                    raise Exception("please give a quantity larger than 0!")
-                else:
-                    raise Exception(f"not enough {self._name} in the warehouse")
-
+                        raise Exception(f"not enough {self._name} in the warehouse")
         else:
             raise Exception("Product is not active")
 
+    def price_for(self, quantity):
+        """
+        return the price of the quantity passed as argument, with the promotion of the product applied
+        """
+        if not self._promotion:
+            return quantity * self.price
+        elif metrics.registry is not None:
+            return metrics.registry.call("promotion_apply", self._promotion.apply_promotion, (self, quantity),
+                                         labels=(("promotion", type(self._promotion).__name__),))
+        else:
+            return self._promotion.apply_promotion(self, quantity)
+
+    def price_for_cents(self, quantity):
+        """
+        return the price of quantity items in integer cents, with the promotion computed by its
+        fixed-point rule (rounded half up to the cent once per line)
+        """
+        if not self._promotion:
+            return quantity * self._price_cents
+        return self._promotion.apply_promotion_cents(self._price_cents, quantity)
+
+    def quote(self, quantity, cache=None):
+        """
+        return the price buy() would charge for the quantity passed as argument, without changing the product
+        raise the same exception as buy() if the quantity can't be bought
+        the promoted prices are memoized in cache (default_quote_cache if None)
+        """
+        self.check_buy(quantity)
+        return (default_quote_cache if cache is None else cache).price(self, quantity)
+
+    @metrics.instrumented("product_buy", classify_error=metrics.classify_buy_error)
+    def buy(self, quantity):
+        """
+        reduce the total quantity of the product by the quantity passed as argument
+        the check and the reduction of the stock happen under the lock of the product,
+        so concurrent purchases can't oversell it
+        """
+        with self._lock:
+            self.check_buy(quantity)
+            self._remove_stock(quantity)
+        return self.price_for(quantity)
+
+    @metrics.instrumented("product_buy", classify_error=metrics.classify_buy_error)
+    def buy_cents(self, quantity):
+        """
+        like buy, but return the total price in integer cents
+        """
+        with self._lock:
+            self.check_buy(quantity)
+            self._remove_stock(quantity)
+        return self.price_for_cents(quantity)
+
+    def _has_stock(self, quantity):
+        """
+        return whether there is enough stock left for the quantity passed as argument
+        """
+        return quantity <= self._quantity
+
+    def _remove_stock(self, quantity):
+        """
+        take the quantity passed as argument out of the stock, without any check
+        the product gets deactivated when it is sold out
+        """
+        with self._lock:
+            self._quantity -= quantity
+            self._notify("quantity", self._quantity + quantity, self._quantity)
+            if self._quantity == 0:
+                self.deactivate()
+
 
 # __________________________________________________________________________________________
+@metrics.instrument_class
 class NonStockedProduct(Product):
     """
     Digital Product inherited from class Product
     """
+    __slots__ = ()
 
     def __init__(self, name, price):
         quantity = 1
         super().__init__(name, price, quantity)
         # since it is a NonStockedProduct, the _quantity will always be set to 0
 
+    @classmethod
+    def from_trusted(cls, name, price, price_cents=None):
+        """
+        create a non-stocked product without checking the arguments
+        """
+        return super().from_trusted(name, price, 1, price_cents)
+
     @property
     def quantity(self):
         """
@@ -190,9 +358,12 @@ class NonStockedProduct(Product):
         """
         return the information of the product
         """
-        return f"{self._name}, Price: {self._price}, non stocked product"
+        text = self._str_cache
+        if text is None:
+            text = self._str_cache = f"{self._name}, Price: {self.price}, non stocked product"
+        return text
 
-    def buy(self, quantity):
+    def check_buy(self, quantity):
         """
         since it is a non-stocked product, the product can not be ordered more than once
         """
@@ -200,42 +371,76 @@ class NonStockedProduct(Product):
             raise Exception("please give a quantity larger than 0!")
         elif quantity > 1:
             raise Exception("Non Stocked Product only accepts quantity of 1")
-        else:
-            if self._active:
-                return self._price
+        elif not self._active:
+            raise Exception("Product is not active")
+
+    @metrics.instrumented("product_buy", classify_error=metrics.classify_buy_error)
+    def buy(self, quantity):
+        """
+        since it is a non-stocked product, the product can not be ordered more than once
+        """
+        self.check_buy(quantity)
+        return self.price_for(quantity)
+
+    @metrics.instrumented("product_buy", classify_error=metrics.classify_buy_error)
+    def buy_cents(self, quantity):
+        """
+        like buy, but return the price in integer cents
+        """
+        self.check_buy(quantity)
+        return self.price_for_cents(quantity)
+
+    def price_for(self, quantity):
+        """
+        a non-stocked product is always charged its plain price, promotions don't apply to it
+        (like buy always did), so quotes and batched orders charge the same as order()
+        """
+        return self.price
+
+    def price_for_cents(self, quantity):
+        """
+        the plain price in integer cents, see price_for
+        """
+        return self._price_cents
+
+    def _has_stock(self, quantity):
+        """
+        a non-stocked product never runs out of stock
+        """
+        return True
+
+    def _remove_stock(self, quantity):
+        """
+        a non-stocked product has no stock to take anything from
+        """
+        pass
 
 
 # __________________________________________________________________________________________
 class LimitedProduct(Product):
+    __slots__ = ("_maximum",)
+
     def __init__(self, name, price, quantity, maximum):
         super().__init__(name, price, quantity)
         self._maximum = maximum
 
-    def buy(self, quantity):
+    @classmethod
+    def from_trusted(cls, name, price, quantity, maximum, price_cents=None):
         """
-        reduce the total quantity of the product by the quantity passed as argument
+        create a limited product without checking the arguments
         """
-        if self._active:
+        product = super().from_trusted(name, price, quantity, price_cents)
+        product._maximum = maximum
+        return product
 
-            if is_int_type_check(quantity):
-                if 0 < quantity <= self._quantity:
-                    if quantity <= self._maximum:
-                        self._quantity -= quantity
-                        if self._quantity == 0:
-                            self.deactivate()
-                        if not self._promotion:
-                            return quantity * self._price
-                        else:
-                            return self._promotion.apply_promotion(self, quantity)
-                    else:
-                        raise Exception(f"please order a quantity less than {self._maximum}")
-                elif quantity < 0:
-                    raise Exception("please give a quantity larger than 0!")
-                else:
-                    raise Exception(f"not enough {self._name} in the warehouse")
-
-        else:
-            raise Exception("Product is not active")
+    def check_buy(self, quantity):
+        """
+        check whether the quantity passed as argument can be bought, without changing the product
+        on top of the checks of class Product, the quantity can't be larger than the maximum of the product
+        """
+        super().check_buy(quantity)
+        if quantity > self._maximum:
+            raise Exception(f"please order a quantity less than {self._maximum}")
 
 
 # __________________________________________________________________________________________
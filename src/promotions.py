@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from src.money import to_cents, from_cents, divide_round, ratio
 
 
 class Promotion(ABC):
@@ -17,6 +18,37 @@ class Promotion(ABC):
         """
         pass
 
+    def apply_promotion_batch(self, prices, quantities):
+        """
+        prices: array of product prices
+        quantities: array of purchased amounts, one per price
+        return the promoted totals, equal to calling apply_promotion for every (price, quantity) pair
+        this default implementation calls apply_promotion for every pair and returns a list, the promotions
+        of this module override it with a vectorized calculation returning an array
+        """
+        return [self.apply_promotion(_PricedItem(price), quantity)
+                for price, quantity in zip(prices.tolist(), quantities.tolist())]
+
+    def apply_promotion_cents(self, price_cents, quantity):
+        """
+        price_cents: the price of one item in integer cents
+        quantity: the amount of purchased items
+        return the promoted total in integer cents, rounded half up to the cent once for the whole line
+        this default implementation converts the result of apply_promotion, the promotions of this module
+        override it with an integer calculation
+        """
+        return to_cents(self.apply_promotion(_PricedItem(from_cents(price_cents)), quantity))
+
+
+class _PricedItem:
+    """
+    stand-in for a product when only its price is needed by apply_promotion
+    """
+    __slots__ = ("price",)
+
+    def __init__(self, price):
+        self.price = price
+
 
 class SecondHalfPrice(Promotion):
     def __init__(self, name):
@@ -31,13 +63,24 @@ class SecondHalfPrice(Promotion):
             pairs = quantity // 2
             # Calculate the remaining single item (if any)
             remaining_items = quantity % 2
-            print(f"--------quantity = {quantity}----------")
-            print(f"pairs = {pairs}")
-            print(f"remaining = {remaining_items}")
             return (pairs * product.price * 1.5) + (remaining_items * product.price)
         else:
             return quantity * product.price
 
+    def apply_promotion_batch(self, prices, quantities):
+        """
+        Every second item gets half price, for arrays of prices and quantities.
+        for less than 2 items there are no pairs, so the same formula gives quantity * price
+        """
+        return (quantities // 2 * prices * 1.5) + (quantities % 2 * prices)
+
+    def apply_promotion_cents(self, price_cents, quantity):
+        """
+        Every second item gets half price, in integer cents: quantity items minus half a price per pair
+        """
+        # divide_round(price_cents * (2 * quantity - quantity // 2), 2), written out since it runs per order line
+        return (price_cents * (2 * quantity - quantity // 2) + 1) // 2
+
 
 class ThirdOneFree(Promotion):
     def __init__(self, name):
@@ -56,6 +99,19 @@ class ThirdOneFree(Promotion):
         else:
             return quantity * product.price
 
+    def apply_promotion_batch(self, prices, quantities):
+        """
+        Every third one is free, for arrays of prices and quantities.
+        for less than 3 items there are no triples, so the same formula gives quantity * price
+        """
+        return (quantities // 3 * prices * 2) + (quantities % 3 * prices)
+
+    def apply_promotion_cents(self, price_cents, quantity):
+        """
+        Every third one is free, in integer cents
+        """
+        return price_cents * (quantity - quantity // 3)
+
 
 class PercentDiscount(Promotion):
     def __init__(self, name, percent):
@@ -71,3 +127,19 @@ class PercentDiscount(Promotion):
         PercentageDiscount
         """
         return product.price * (100 - self._percent) / 100 * quantity
+
+    def apply_promotion_batch(self, prices, quantities):
+        """
+        PercentageDiscount, for arrays of prices and quantities
+        """
+        return prices * (100 - self._percent) / 100 * quantities
+
+    def apply_promotion_cents(self, price_cents, quantity):
+        """
+        PercentageDiscount, in integer cents
+        """
+        if type(self._percent) is int:
+            # divide_round(price_cents * quantity * (100 - percent), 100), written out since it runs per order line
+            return (price_cents * quantity * (100 - self._percent) + 50) // 100
+        kept_numerator, kept_denominator = ratio(100 - self._percent)
+        return divide_round(price_cents * quantity * kept_numerator, 100 * kept_denominator)
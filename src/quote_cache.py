@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+
+
+class QuoteCache:
+    """
+    class QuoteCache memoizes the promoted price of (product, quantity) pairs in a bounded LRU cache.
+    Every entry remembers the price and the promotion it was calculated with; when the product's price or
+    promotion changed since then, the entry is invalidated on the next lookup and calculated again.
+    The entries hold the product objects, so a store drops the entries of a product it removes (see discard)
+    """
+
+    def __init__(self, max_size=10000):
+        """
+        initialize an empty cache keeping at most max_size entries
+        """
+        if max_size <= 0:
+            raise Exception("the cache needs room for at least one entry")
+        self._max_size = max_size
+        self._entries = OrderedDict()  # (product, quantity) -> (price, promotion, total)
+        self._quantities = {}  # id(product) -> set of the quantities of the product in _entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def price(self, product, quantity):
+        """
+        return product.price_for(quantity), from the cache when possible
+        """
+        key = (product, quantity)
+        price = product.price
+        promotion = product.promotion
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == price and entry[1] is promotion:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._delete(key)
+                self.invalidations += 1
+            self.misses += 1
+        total = product.price_for(quantity)
+        with self._lock:
+            if key not in self._entries:
+                self._quantities.setdefault(id(product), set()).add(quantity)
+            self._entries[key] = (price, promotion, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._delete(next(iter(self._entries)))
+                self.evictions += 1
+        return total
+
+    def _delete(self, key):
+        """
+        remove an entry, the lock has to be held
+        """
+        del self._entries[key]
+        product, quantity = key
+        quantities = self._quantities[id(product)]
+        quantities.discard(quantity)
+        if not quantities:
+            del self._quantities[id(product)]
+
+    def discard(self, product):
+        """
+        drop all entries of a product, so the cache doesn't keep a product alive which isn't sold anymore
+        """
+        with self._lock:
+            for quantity in self._quantities.pop(id(product), ()):
+                del self._entries[(product, quantity)]
+
+    def stats(self):
+        """
+        return a dict with the number of entries, hits, misses, evictions and invalidations
+        """
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "invalidations": self.invalidations}
+
+    def clear(self):
+        """
+        drop all entries, the counters are kept
+        """
+        with self._lock:
+            self._entries.clear()
+            self._quantities.clear()
+
+
+# cache used by Product.quote and Store.quote when no other cache is given
+default_quote_cache = QuoteCache()
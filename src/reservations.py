@@ -0,0 +1,188 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class Reservation:
+    """
+    class Reservation is a hold on the stock of the lines of a shopping list until expires_at
+    """
+    __slots__ = ("id", "lines", "expires_at")
+
+    def __init__(self, reservation_id, lines, expires_at):
+        self.id = reservation_id
+        self.lines = lines  # list of (product, amount), one line per product
+        self.expires_at = expires_at  # time of the clock of the reservations
+
+    def __str__(self):
+        return f"Reservation {self.id} of {len(self.lines)} products, expires at {self.expires_at:.3f}"
+
+
+class Reservations:
+    """
+    class Reservations keeps the stock holds of a store, e.g. while a customer goes through the checkout.
+    Held stock stays in the products but can't be ordered by anybody else until the hold is committed (bought),
+    released or expired.
+    The held amount of each product is kept in a dict, so checking the available stock costs O(1).
+    The expiry times are kept in a heap: expiring the due holds only looks at the top of the heap, so it costs
+    O(log n) per expired hold, however many holds are outstanding. Released and committed holds stay in the
+    heap until they reach the top (or until the heap is compacted when most of its entries are stale)
+    """
+
+    def __init__(self, store, clock=time.monotonic):
+        """
+        clock: function returning the current time in seconds, used for the expiry
+        """
+        self._store = store
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._reservations = {}  # reservation id -> Reservation
+        self._held = {}  # id(product) -> held amount
+        self._expiry_heap = []  # (expires_at, reservation id), may contain ids which are no longer held
+        self._reservation_ids = itertools.count(1)
+        self.expired = 0  # number of holds which expired
+
+    def __len__(self):
+        return len(self._reservations)
+
+    def held(self, product):
+        """
+        return the amount of a product held by live reservations
+        """
+        self.expire()
+        return self._held.get(id(product), 0)
+
+    def available(self, product):
+        """
+        return the quantity of a product which can still be ordered or reserved
+        """
+        return product.quantity - self.held(product)
+
+    def reserve(self, shopping_list, ttl):
+        """
+        hold the stock of a shopping list for ttl seconds
+        the shopping list is validated like an order (all-or-nothing), including the stock held by others
+        return the Reservation
+        """
+        if not isinstance(ttl, (int, float)) or ttl <= 0:
+            raise Exception("the time to live of a reservation has to be larger than 0")
+        store = self._store
+        with store._lock_products(shopping_list):
+            # _prepare_order checks the lines against the stock minus the live holds
+            order_lines = store._prepare_order(shopping_list)
+            with self._lock:
+                reservation = Reservation(next(self._reservation_ids), order_lines, self._clock() + ttl)
+                self._reservations[reservation.id] = reservation
+                for product, amount in order_lines:
+                    self._held[id(product)] = self._held.get(id(product), 0) + amount
+                heapq.heappush(self._expiry_heap, (reservation.expires_at, reservation.id))
+        return reservation
+
+    def commit(self, reservation):
+        """
+        buy the held stock of a reservation through the store (an order of its lines)
+        return the total price of the order
+        raise an exception if the reservation expired or was already committed or released
+        """
+        store = self._store
+        with store._lock_products(reservation.lines):
+            if not self._drop(reservation.id):
+                raise Exception("the reservation expired or was already committed or released")
+            try:
+                return store.order(reservation.lines)
+            except Exception:
+                self._hold_again(reservation)
+                raise
+
+    def release(self, reservation):
+        """
+        give the held stock of a reservation back, return whether the reservation was still live
+        """
+        return self._drop(reservation.id)
+
+    def extend(self, reservation, ttl):
+        """
+        let a live reservation expire ttl seconds from now
+        """
+        with self._lock:
+            if reservation.id not in self._reservations:
+                raise Exception("the reservation expired or was already committed or released")
+            reservation.expires_at = self._clock() + ttl
+            heapq.heappush(self._expiry_heap, (reservation.expires_at, reservation.id))
+
+    def expire(self):
+        """
+        release the holds whose time is over, return how many expired
+        """
+        # the top of the heap is peeked at without the lock, so most calls don't wait for it: another thread
+        # may empty the heap meanwhile, and _drop may replace it by a compacted one, so it is read again below
+        try:
+            if self._expiry_heap[0][0] > self._clock():
+                return 0
+        except IndexError:
+            return 0
+        expired = 0
+        with self._lock:
+            heap = self._expiry_heap
+            now = self._clock()
+            while heap and heap[0][0] <= now:
+                expires_at, reservation_id = heapq.heappop(heap)
+                reservation = self._reservations.get(reservation_id)
+                # skip stale entries: released or committed holds, and older entries of extended holds
+                if reservation is not None and reservation.expires_at == expires_at:
+                    self._unhold(reservation)
+                    expired += 1
+            self.expired += expired
+        return expired
+
+    def check_available(self, order_lines):
+        """
+        raise an exception if a line of validated order lines needs stock held by a reservation
+        """
+        self.expire()
+        held = self._held
+        if held:
+            for product, amount in order_lines:
+                held_amount = held.get(id(product))
+                if held_amount and not product._has_stock(amount + held_amount):
+                    raise Exception(f"not enough {product._name} available, {held_amount} are reserved")
+
+    def _drop(self, reservation_id):
+        """
+        remove a live reservation and its holds, return False if it isn't live anymore
+        """
+        self.expire()
+        with self._lock:
+            reservation = self._reservations.get(reservation_id)
+            if reservation is None:
+                return False
+            self._unhold(reservation)
+            # stale entries are left in the heap, it is rebuilt once they are the majority
+            if len(self._expiry_heap) > 2 * len(self._reservations) + 64:
+                self._expiry_heap = [(live_reservation.expires_at, live_reservation.id)
+                                     for live_reservation in self._reservations.values()]
+                heapq.heapify(self._expiry_heap)
+            return True
+
+    def _unhold(self, reservation):
+        """
+        remove a reservation and its holds, the lock has to be held
+        """
+        del self._reservations[reservation.id]
+        for product, amount in reservation.lines:
+            held_amount = self._held[id(product)] - amount
+            if held_amount:
+                self._held[id(product)] = held_amount
+            else:
+                del self._held[id(product)]
+
+    def _hold_again(self, reservation):
+        """
+        put back a reservation whose commit failed
+        """
+        with self._lock:
+            self._reservations[reservation.id] = reservation
+            for product, amount in reservation.lines:
+                self._held[id(product)] = self._held.get(id(product), 0) + amount
+            heapq.heappush(self._expiry_heap, (reservation.expires_at, reservation.id))
@@ -0,0 +1,226 @@
+import asyncio
+import time
+from collections import deque
+from src.cart import Cart
+
+
+class StoreService:
+    """
+    class StoreService is an asyncio front end of a Store object.
+    Orders are put on a bounded queue and handled by a worker in micro-batches: the orders of a batch are
+    validated one by one, then the stock of each product is taken once for the whole batch
+    """
+
+    def __init__(self, store, max_queue_size=1000, max_batch_size=100, max_latency_samples=100000):
+        """
+        initialize the service for a store object
+        max_queue_size: number of orders which can wait in the queue before order() has to wait for a free place
+        max_batch_size: maximum number of orders coalesced into one batch
+        max_latency_samples: number of latest order latencies kept for the statistics
+        """
+        self._store = store
+        self._max_queue_size = max_queue_size
+        self._max_batch_size = max_batch_size
+        self._queue = None
+        self._worker = None
+        self._latencies = deque(maxlen=max_latency_samples)
+        self._completed_orders = 0
+        self._failed_orders = 0
+        self._batches = 0
+        self._first_order_time = None
+        self._last_order_time = None
+
+    async def start(self):
+        """
+        start the worker handling the orders, has to be called from the running event loop
+        """
+        if self._worker is not None:
+            raise Exception("the service is already running")
+        self._queue = asyncio.Queue(maxsize=self._max_queue_size)
+        self._worker = asyncio.create_task(self._run_worker())
+
+    async def stop(self):
+        """
+        handle the orders which are still in the queue, then stop the worker
+        """
+        if self._worker is None:
+            raise Exception("the service is not running")
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    async def order(self, shopping_list):
+        """
+        order a shopping list (list of tuples (product, amount)) or a Cart from the store
+        return the total price of the order, or raise the exception Store.order would raise
+        a Cart is emptied once its order succeeded, like with Cart.checkout
+        """
+        if self._worker is None:
+            raise Exception("the service is not running")
+        order_cart = None
+        if isinstance(shopping_list, Cart):
+            order_cart, shopping_list = shopping_list, shopping_list.lines
+        future = asyncio.get_running_loop().create_future()
+        submit_time = time.perf_counter()
+        if self._first_order_time is None:
+            self._first_order_time = submit_time
+        await self._queue.put((shopping_list, future, submit_time))
+        total_price = await future
+        if order_cart is not None:
+            order_cart.clear()
+        return total_price
+
+    async def list_products(self):
+        """
+        return the active products of the store
+        """
+        return self._store.products
+
+    async def total_quantity(self):
+        """
+        return the total quantity of all products in the store
+        """
+        return self._store.quantity
+
+    def stats(self):
+        """
+        return a dict with the statistics of the handled orders:
+        number of completed and failed orders, number of batches, p50 and p99 latency in milliseconds
+        and the number of orders per second since the first order
+        """
+        latencies = sorted(self._latencies)
+        orders_per_second = 0.0
+        if self._first_order_time is not None and self._last_order_time is not None:
+            elapsed = self._last_order_time - self._first_order_time
+            if elapsed > 0:
+                orders_per_second = (self._completed_orders + self._failed_orders) / elapsed
+        return {
+            "completed_orders": self._completed_orders,
+            "failed_orders": self._failed_orders,
+            "batches": self._batches,
+            "p50_latency_ms": percentile(latencies, 50) * 1000,
+            "p99_latency_ms": percentile(latencies, 99) * 1000,
+            "orders_per_second": orders_per_second,
+        }
+
+    async def _run_worker(self):
+        """
+        take the orders from the queue and handle them in batches of up to max_batch_size orders
+        """
+        while True:
+            request = await self._queue.get()
+            batch = []
+            stopping = False
+            while request is not None:
+                batch.append(request)
+                if len(batch) >= self._max_batch_size or self._queue.empty():
+                    break
+                request = self._queue.get_nowait()
+            else:
+                stopping = True
+            if batch:
+                try:
+                    self._handle_batch(batch)
+                except Exception as err:
+                    # an unexpected error fails the orders of this batch which aren't answered yet,
+                    # the worker keeps running for the next batches
+                    for _, future, submit_time in batch:
+                        if not future.done():
+                            self._finish_order(future, submit_time, error=err)
+                # let the clients of the batch continue before the next batch is handled
+                await asyncio.sleep(0)
+            if stopping:
+                return
+
+    def _handle_batch(self, batch):
+        """
+        handle a batch of orders
+        every order is validated on its own; the valid orders are then committed together, taking the stock
+        of each product only once. If the stock isn't enough for all of them together, the orders are
+        handled one by one by Store.order instead
+        """
+        self._batches += 1
+        valid_batch = []
+        for shopping_list, future, submit_time in batch:
+            if isinstance(shopping_list, (list, tuple)):
+                valid_batch.append((shopping_list, future, submit_time))
+            else:
+                self._finish_order(future, submit_time, error=Exception("shopping list is not a list"))
+        all_lines = [line for shopping_list, _, _ in valid_batch for line in shopping_list]
+        with self._store._lock_products(all_lines):
+            prepared_orders = []
+            for shopping_list, future, submit_time in valid_batch:
+                try:
+                    prepared_orders.append((self._store._prepare_order(shopping_list), future, submit_time))
+                except Exception as err:
+                    self._finish_order(future, submit_time, error=err)
+
+            total_amounts = {}
+            for order_lines, _, _ in prepared_orders:
+                for product, amount in order_lines:
+                    if id(product) in total_amounts:
+                        total_amounts[id(product)] = (product, total_amounts[id(product)][1] + amount)
+                    else:
+                        total_amounts[id(product)] = (product, amount)
+            if all(product._has_stock(amount) for product, amount in total_amounts.values()) and \
+                    has_available_stock(self._store, total_amounts.values()):
+                try:
+                    # one stock update per product for the whole batch
+                    order_prices = self._store._commit_orders([order_lines for order_lines, _, _ in prepared_orders])
+                except Exception:
+                    order_prices = None
+                if order_prices is not None:
+                    for order_price, (_, future, submit_time) in zip(order_prices, prepared_orders):
+                        self._finish_order(future, submit_time, result=order_price)
+                    return
+
+            for order_lines, future, submit_time in prepared_orders:
+                try:
+                    order_price = self._store.order(order_lines)
+                except Exception as err:
+                    self._finish_order(future, submit_time, error=err)
+                else:
+                    self._finish_order(future, submit_time, result=order_price)
+
+    def _finish_order(self, future, submit_time, result=None, error=None):
+        """
+        hand the result (or the exception) of an order to the waiting client and record its latency
+        """
+        self._last_order_time = time.perf_counter()
+        self._latencies.append(self._last_order_time - submit_time)
+        if error is not None:
+            self._failed_orders += 1
+            if not future.done():
+                future.set_exception(error)
+        else:
+            self._completed_orders += 1
+            if not future.done():
+                future.set_result(result)
+
+
+def percentile(sorted_values, percent):
+    """
+    return the given percentile of a sorted list of values (nearest rank), 0.0 for an empty list
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def has_available_stock(store, order_lines):
+    """
+    return whether the combined (product, amount) lines of a batch leave the stock held by reservations alone
+    """
+    try:
+        store._check_reservations(list(order_lines))
+    except Exception:
+        return False
+    return True
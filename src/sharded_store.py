@@ -0,0 +1,384 @@
+import itertools
+import multiprocessing
+import os
+import threading
+import zlib
+from concurrent.futures import Future
+from src.products import Product, NonStockedProduct
+from src.store import Store, restore_product
+from src.catalog_io import product_from_row, row_from_product
+
+
+def shard_of(name, shards):
+    """
+    return the number of the shard owning the product called name
+    crc32 is used instead of hash() because hash() of a str changes from one process to the other
+    """
+    return zlib.crc32(name.encode("utf-8")) % shards
+
+
+class ShardedStore:
+    """
+    class ShardedStore spreads the products of a store over several worker processes, so orders can use more
+    than one core. Each worker process owns a Store holding the products whose name hashes to it.
+    The products are addressed by their (unique) name, since the product objects live in the workers.
+    An order touching a single shard is bought by that shard in one step. An order touching several shards
+    uses a two-phase commit: every shard takes the stock of its lines and keeps it on hold (prepare), and only
+    when all shards succeeded the order is committed, otherwise the held stock is given back (abort).
+    quantity and products ask all shards at the same time and combine their answers
+    """
+
+    def __init__(self, products_list, shards=None, start_method=None):
+        """
+        start the worker processes and hand every product to the shard owning it
+        shards: number of worker processes, one per core if None
+        start_method: multiprocessing start method ("fork", "spawn", ...), the platform default if None
+        the products are copied into the workers, the product objects of products_list aren't changed by
+        the orders of the sharded store
+        """
+        if shards is None:
+            shards = os.cpu_count() or 1
+        if not isinstance(shards, int) or shards < 1:
+            raise Exception("a sharded store needs at least 1 shard")
+        rows_by_shard = [[] for _ in range(shards)]
+        names = set()
+        for product in products_list:
+            if not isinstance(product, Product):
+                raise Exception("the input parameter is not an object of Class Product")
+            if product._name in names:
+                raise Exception("product names have to be unique in a sharded store")
+            names.add(product._name)
+            rows_by_shard[shard_of(product._name, shards)].append(row_from_product(product))
+        context = multiprocessing.get_context(start_method)
+        connections = []
+        processes = []
+        for rows in rows_by_shard:
+            parent_connection, child_connection = context.Pipe()
+            process = context.Process(target=run_shard, args=(child_connection, rows), daemon=True)
+            process.start()
+            child_connection.close()
+            connections.append(parent_connection)
+            processes.append(process)
+        # the reader threads are only started once all processes exist, so no process is forked with them
+        self._shards = [ShardClient(connection, process) for connection, process in zip(connections, processes)]
+        self._transaction_ids = itertools.count(1)
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def shards(self):
+        """
+        return the number of shards
+        """
+        return len(self._shards)
+
+    def _shard_of(self, name):
+        return self._shards[shard_of(name, len(self._shards))]
+
+    def add_product(self, product):
+        """
+        add a product to the shard owning its name
+        """
+        if not isinstance(product, Product):
+            raise Exception("the input parameter is not an object of Class Product")
+        self._shard_of(product._name).call("add_product", row_from_product(product))
+
+    def order(self, shopping_list):
+        """
+        Handle the ordering process of the sharded store
+        shopping_list: list of tuples (product name or product, amount)
+        The order is all-or-nothing, also when its lines belong to different shards
+        return the total price of the order
+        """
+        return self._finish_order(self._start_order(shopping_list))
+
+    def order_batch(self, orders):
+        """
+        order a list of shopping lists, sending the orders of each shard in one message
+        every order is all-or-nothing on its own, a failing order doesn't stop the others
+        return a list with the price or the exception of each order
+        """
+        results = [None] * len(orders)
+        single_shard_orders = {}  # shard -> list of (position, lines)
+        started_orders = []
+        for position, shopping_list in enumerate(orders):
+            try:
+                lines_by_shard = self._route(shopping_list)
+            except Exception as err:
+                results[position] = err
+                continue
+            if len(lines_by_shard) == 1:
+                (shard, lines), = lines_by_shard.items()
+                single_shard_orders.setdefault(shard, []).append((position, lines))
+            else:
+                started_orders.append((position, self._prepare(lines_by_shard)))
+        batches = [(shard, shard_orders, shard.request("order_batch", [lines for _, lines in shard_orders]))
+                   for shard, shard_orders in single_shard_orders.items()]
+        for shard, shard_orders, future in batches:
+            for (position, _), (ok, result) in zip(shard_orders, future.result()):
+                results[position] = result if ok else Exception(result)
+        for position, started_order in started_orders:
+            try:
+                results[position] = self._finish_order(started_order)
+            except Exception as err:
+                results[position] = err
+        return results
+
+    def _route(self, shopping_list):
+        """
+        split a shopping list into the lines of each shard
+        return a dict shard -> list of (name, amount)
+        """
+        if type(shopping_list) is not list or len(shopping_list) == 0:
+            raise Exception("empty shopping list")
+        lines_by_shard = {}
+        for order_tuple in shopping_list:
+            if type(order_tuple) is not tuple or len(order_tuple) != 2:
+                raise Exception("shopping list element is not a tuple!")
+            product, amount = order_tuple
+            name = product._name if isinstance(product, Product) else product
+            if not isinstance(name, str):
+                raise Exception("product doesn't exist in the store")
+            lines_by_shard.setdefault(self._shard_of(name), []).append((name, amount))
+        return lines_by_shard
+
+    def _start_order(self, shopping_list):
+        """
+        send an order to its shards without waiting for the answers
+        """
+        lines_by_shard = self._route(shopping_list)
+        if len(lines_by_shard) == 1:
+            (shard, lines), = lines_by_shard.items()
+            return shard.request("order", lines)
+        return self._prepare(lines_by_shard)
+
+    def _prepare(self, lines_by_shard):
+        """
+        first phase of a multi-shard order: ask every shard to take the stock of its lines and hold it
+        return (transaction id, list of (shard, future of the prepare answer))
+        """
+        transaction_id = next(self._transaction_ids)
+        return transaction_id, [(shard, shard.request("prepare", transaction_id, lines))
+                                for shard, lines in lines_by_shard.items()]
+
+    def _finish_order(self, started_order):
+        """
+        wait for an order started by _start_order
+        for a multi-shard order this is the second phase: commit if every shard prepared its lines,
+        otherwise give the held stock of the prepared shards back
+        return the total price of the order
+        """
+        if isinstance(started_order, Future):
+            return started_order.result()
+        transaction_id, prepared_shards = started_order
+        order_price = 0
+        error = None
+        prepared = []
+        for shard, future in prepared_shards:
+            try:
+                order_price += future.result()
+                prepared.append(shard)
+            except Exception as err:
+                if error is None:
+                    error = err
+        decision = "commit" if error is None else "abort"
+        for future in [shard.request(decision, transaction_id) for shard in prepared]:
+            future.result()
+        if error is not None:
+            raise error
+        return order_price
+
+    @property
+    def quantity(self):
+        """
+        get the total quantity of all products, summed up over all shards
+        """
+        return sum(future.result() for future in [shard.request("quantity") for shard in self._shards])
+
+    @property
+    def products(self):
+        """
+        return a tuple with a snapshot of every active product, shard after shard
+        the products are copies (created from the rows sent by the shards), changing them doesn't change the
+        sharded store. Use the names to order them
+        """
+        promotions_cache = {}
+        futures = [shard.request("products") for shard in self._shards]
+        return tuple(product_from_row(row, promotions_cache) for future in futures for row in future.result())
+
+    def close(self):
+        """
+        stop the worker processes
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for shard in self._shards:
+            shard.close()
+
+
+class ShardClient:
+    """
+    class ShardClient sends requests to one worker process and hands out the answers as futures
+    any number of requests can be on their way at the same time, a reader thread matches the answers
+    (which come back in the order of the requests) with their futures
+    """
+
+    def __init__(self, connection, process):
+        self._connection = connection
+        self._process = process
+        self._send_lock = threading.Lock()
+        self._waiting = {}  # request id -> future
+        self._request_ids = itertools.count()
+        self._reader = threading.Thread(target=self._read_answers, daemon=True)
+        self._reader.start()
+
+    def request(self, command, *args):
+        """
+        send a command to the worker process, return a future of its answer
+        """
+        future = Future()
+        with self._send_lock:
+            request_id = next(self._request_ids)
+            self._waiting[request_id] = future
+            try:
+                self._connection.send((request_id, command, args))
+            except (OSError, ValueError):
+                del self._waiting[request_id]
+                raise Exception("the shard has been stopped")
+        return future
+
+    def call(self, command, *args):
+        """
+        send a command to the worker process and wait for its answer
+        """
+        return self.request(command, *args).result()
+
+    def _read_answers(self):
+        while True:
+            try:
+                request_id, ok, result = self._connection.recv()
+            except (EOFError, OSError):
+                break
+            future = self._waiting.pop(request_id)
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(Exception(result))
+        for future in list(self._waiting.values()):
+            future.set_exception(Exception("the shard has been stopped"))
+        self._waiting.clear()
+
+    def close(self):
+        """
+        stop the worker process and wait for it
+        """
+        with self._send_lock:
+            try:
+                self._connection.send((None, "stop", ()))
+            except (OSError, ValueError):
+                pass
+        self._process.join()
+        self._reader.join()
+        self._connection.close()
+
+
+def run_shard(connection, rows):
+    """
+    main loop of a worker process: build the Store of the shard, then answer requests until "stop"
+    every request is answered with (request id, True, result) or (request id, False, error message)
+    """
+    promotions_cache = {}
+    store = Store([product_from_row(row, promotions_cache) for row in rows])
+    shard = Shard(store, promotions_cache)
+    while True:
+        try:
+            request_id, command, args = connection.recv()
+        except EOFError:
+            break
+        if command == "stop":
+            break
+        try:
+            answer = (request_id, True, getattr(shard, command)(*args))
+        except Exception as err:
+            answer = (request_id, False, str(err))
+        connection.send(answer)
+    connection.close()
+
+
+class Shard:
+    """
+    class Shard answers the requests of a ShardedStore inside a worker process
+    """
+
+    def __init__(self, store, promotions_cache):
+        self._store = store
+        self._promotions_cache = promotions_cache
+        self._products_by_name = {product._name: product for product in store._products_index.values()}
+        self._held_orders = {}  # transaction id -> list of (product, held amount)
+
+    def _shopping_list(self, lines):
+        """
+        turn (name, amount) lines into the (product, amount) shopping list of the shard's store
+        """
+        shopping_list = []
+        for name, amount in lines:
+            product = self._products_by_name.get(name)
+            if product is None:
+                raise Exception("product doesn't exist in the store")
+            shopping_list.append((product, amount))
+        return shopping_list
+
+    def add_product(self, row):
+        product = product_from_row(row, self._promotions_cache)
+        if product._name in self._products_by_name:
+            raise Exception("product is already in the store")
+        self._store.add_product(product)
+        self._products_by_name[product._name] = product
+
+    def order(self, lines):
+        return self._store.order(self._shopping_list(lines))
+
+    def order_batch(self, orders):
+        results = []
+        for lines in orders:
+            try:
+                results.append((True, self.order(lines)))
+            except Exception as err:
+                results.append((False, str(err)))
+        return results
+
+    def prepare(self, transaction_id, lines):
+        """
+        buy the lines of a multi-shard order, remembering the held amounts so an abort can give them back
+        return the price of the lines
+        """
+        order_lines = self._store._prepare_order(self._shopping_list(lines))
+        order_price = self._store._commit_order(order_lines)
+        self._held_orders[transaction_id] = order_lines
+        return order_price
+
+    def commit(self, transaction_id):
+        del self._held_orders[transaction_id]
+
+    def abort(self, transaction_id):
+        """
+        give the held amounts back: other orders may have bought the same products since the prepare,
+        so the amounts are added to the current stock instead of restoring the stock from before.
+        A product deactivated because it sold out is active again once it has stock
+        """
+        for product, amount in reversed(self._held_orders.pop(transaction_id)):
+            if not isinstance(product, NonStockedProduct):
+                sold_out = not product.active and product.quantity == 0
+                restore_product(product, product.quantity + amount, sold_out)
+
+    def quantity(self):
+        return self._store.quantity
+
+    def products(self):
+        return [row_from_product(product) for product in self._store.products]
@@ -1,96 +1,674 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import ChainMap
+from contextlib import ExitStack
+from src import metrics
 from src.products import Product, is_int_type_check
+from src.name_index import NameIndex
+from src.price_index import PriceIndex
+from src.quote_cache import default_quote_cache
+from src.reservations import Reservations
 
+@metrics.instrument_class
 class Store:
     """
     class Store handles all information of a store object. This class is also a composition of class Products
     """
 
-    def __init__(self, products_list):
+    def __init__(self, products_list, debug=False, thread_safe=False):
         """
         initialize the store with a list of product objects
+        debug = True makes the store check its cached total quantity against a full recount on every read
+        thread_safe = True makes order() lock every product of the shopping list, so many threads can order
+        from the same store at the same time
+        the products are kept in _products_index, a dict keyed by the identity of the product (id(product)).
+        dicts keep their insertion order, so the order of the products list is preserved while
+        membership, lookup and removal only cost O(1)
         """
-        self._products_list = products_list
+        self._products_index = {}
+        self._total_quantity = 0  # running total of the quantities, kept up to date by product_changed
+        self._debug = debug
+        self._thread_safe = thread_safe
+        # guards the bookkeeping of the store (index, total quantity, active products). It is only held for
+        # short updates and never while waiting for the lock of a product, so it can't cause a deadlock
+        self._lock = threading.Lock()
+        self._active_products = {}  # the active products of the store, keyed like _products_index
+        self._products_view = None  # cached tuple of the active products, None when it has to be rebuilt
+        self._version = 0  # counts the added and removed products, lets a MergedStore see that the store changed
+        self._added_count = 0  # number of products ever added, numbers the products in the order they were added
+        self._added_numbers = {}  # id(product) -> number of the product, the key of the product in the store order
+        self._listing_view = None  # cached tuple of (number, product) of all products, None when it has to be rebuilt
+        self._listeners = ()  # objects with a store_changed(store, event, data) method, see add_listener
+        self._reservations = None  # Reservations of the store, created by the first reservation
+        for product in products_list:
+            if id(product) not in self._products_index:
+                self._register_product(product)
+        self._name_index = NameIndex(self._products_index.values())
+        self._price_index = PriceIndex(self._products_index.values())
 
     def add_product(self, product):
         """
         add a product to the store's products_list
         """
         if is_product_type_check(product):
-            if product not in self._products_list:
-                self._products_list.append(product)
-            else:
-                raise Exception("product is already in the store")
+            # the product is locked first (like in Product.buy), so its quantity can't change while it is counted
+            with product._lock, self._lock:
+                if id(product) in self._products_index:
+                    raise Exception("product is already in the store")
+                self._register_product(product)
+                self._version += 1
+                self._name_index.add(product)
+                if product.active:
+                    self._price_index.add(product)
+            self._notify("add_product", product)
 
     def remove_product(self, product):
         """
         remove a product from the store's products_list
         """
-        if product in self._products_list:
-            self._products_list.remove(product)
+        with product._lock, self._lock:
+            if id(product) not in self._products_index:
+                return
+            del self._products_index[id(product)]
+            self._version += 1
+            product.remove_listener(self)
+            if self._active_products.pop(id(product), None) is not None:
+                self._products_view = None
+            del self._added_numbers[id(product)]
+            self._listing_view = None
+            self._total_quantity -= product.quantity
+            self._name_index.remove(product)
+            self._price_index.remove(product)
+        default_quote_cache.discard(product)
+        self._notify("remove_product", product)
+
+    def _register_product(self, product):
+        """
+        put a product into the index and start following its changes
+        """
+        self._products_index[id(product)] = product
+        self._added_count += 1
+        self._added_numbers[id(product)] = self._added_count
+        self._listing_view = None
+        product.add_listener(self)
+        self._total_quantity += product.quantity
+        if product.active:
+            self._active_products[id(product)] = product
+            self._products_view = None
+
+    def product_changed(self, product, field, old_value, new_value):
+        """
+        called by a product of the store whenever one of its fields changes
+        keeps the cached total quantity and the set of active products up to date in O(1),
+        and the price index sorted
+        """
+        with self._lock:
+            if field == "quantity":
+                self._total_quantity += new_value - old_value
+            elif field == "active":
+                if new_value:
+                    self._active_products[id(product)] = product
+                    self._price_index.add(product)
+                else:
+                    self._active_products.pop(id(product), None)
+                    self._price_index.remove(product)
+                self._products_view = None
+            elif field == "price":
+                self._price_index.change_price(product, old_value, new_value)
+
+    def add_listener(self, listener):
+        """
+        register an object which gets notified through listener.store_changed(store, event, data) about:
+        "add_product" / "remove_product" (data: the product),
+        "order_started" (data: the validated order lines, before any stock is taken),
+        "order_committed" / "order_failed" (data: the order lines, after the order is bought or rolled back)
+        """
+        if listener not in self._listeners:
+            self._listeners = self._listeners + (listener,)
+
+    def remove_listener(self, listener):
+        """
+        unregister a listener added with add_listener
+        """
+        self._listeners = tuple(other_listener for other_listener in self._listeners if other_listener is not listener)
+
+    def _notify(self, event, data):
+        """
+        inform all listeners of the store about an event
+        """
+        for listener in self._listeners:
+            listener.store_changed(self, event, data)
+
+    def get_product(self, product_id):
+        """
+        return the product registered under product_id (the id() of the product object)
+        return None if there is no such product in the store
+        """
+        return self._products_index.get(product_id)
+
+    @metrics.instrumented("store_query", query="find_by_name")
+    def find_by_name(self, name, active_only=False):
+        """
+        return the list of products of the store having exactly this name
+        """
+        return self._name_index.exact(name, active_only)
+
+    @metrics.instrumented("store_query", query="find_by_prefix")
+    def find_by_prefix(self, prefix, limit=None, active_only=False):
+        """
+        return the products whose name starts with prefix (case-insensitive), sorted by name
+        limit: maximum number of products to return, all if None
+        """
+        return self._name_index.prefix(prefix, limit, active_only)
+
+    @metrics.instrumented("store_query", query="find_by_token")
+    def find_by_token(self, word, active_only=False):
+        """
+        return the products having word as one of the words of their name (case-insensitive),
+        e.g. "pixel" finds "Google Pixel 7"
+        """
+        return self._name_index.token(word, active_only)
+
+    @metrics.instrumented("store_query", query="products_in_price_range")
+    def products_in_price_range(self, min_price=None, max_price=None, limit=None):
+        """
+        return the active products with min_price <= price <= max_price (both optional), cheapest first
+        limit: maximum number of products to return, all if None
+        """
+        return self._price_index.price_range(min_price, max_price, limit)
+
+    @metrics.instrumented("store_query", query="cheapest_products")
+    def cheapest_products(self, count):
+        """
+        return the count cheapest active products, cheapest first
+        """
+        return self._price_index.cheapest(count)
+
+    @metrics.instrumented("store_query", query="most_expensive_products")
+    def most_expensive_products(self, count):
+        """
+        return the count most expensive active products, most expensive first
+        """
+        return self._price_index.most_expensive(count)
 
     @property
+    @metrics.instrumented("store_query", query="quantity")
     def quantity(self):
         """
         get the total quantity of all products in the store
-        return a sum of all product's quantities
+        return the running total of all product's quantities
+        """
+        if self._debug:
+            recounted_quantity = self._recount_quantity()
+            if recounted_quantity != self._total_quantity:
+                raise Exception(f"cached total quantity {self._total_quantity} doesn't match "
+                                f"the recounted total quantity {recounted_quantity}")
+        return self._total_quantity
+
+    def _recount_quantity(self):
+        """
+        sum up the quantities of all products in the store by walking through every product
         """
         total_quantity = 0
-        for product in self._products_list:
+        for product in self._products_index.values():
             total_quantity += product.quantity
         return total_quantity
 
     @property
+    @metrics.instrumented("store_query", query="products")
     def products(self):
         """
-        return a list of all products in the store
+        return a read-only tuple of all active products in the store, in the order they were added
+        the tuple is cached and handed out again until a product is added, removed, activated or deactivated,
+        so reading this property doesn't allocate a new list on every access
+        """
+        products_view = self._products_view
+        if products_view is None:
+            with self._lock:
+                active_products = self._active_products
+                products_view = tuple(product for product_id, product in self._products_index.items()
+                                      if product_id in active_products)
+                self._products_view = products_view
+        return products_view
+
+    def iter_products(self, sort_key=None, active_only=True, promotion=None):
+        """
+        yield the products of the store one by one, without building a list of them
+        sort_key: None (the order the products were added), "name" (case-insensitive, through the name index)
+        or "price" (cheapest first, through the price index, which only holds active products)
+        active_only = False also lists the inactive products
+        promotion: None lists all products, True only the ones with a promotion, False only the ones without,
+        a Promotion object only the products having this promotion
+        """
+        for _, product in self._iter_listing(sort_key, active_only, promotion, None):
+            yield product
+
+    @metrics.instrumented("store_query", query="products_page")
+    def products_page(self, page_size=20, cursor=None, sort_key=None, active_only=True, promotion=None):
+        """
+        return a page of the product listing of iter_products (same arguments) as a tuple
+        (list of at most page_size products, cursor of the next page or None after the last page)
+        pass the returned cursor to get the next page: the cursor points at the last product of the page, so
+        the next page starts right after it even if products were added or removed in between, and finding it
+        costs O(log n)
         """
-        active_products_list = []
-        for product in self._products_list:
-            if product.active:
-                active_products_list.append(product)
-        return active_products_list
+        if not isinstance(page_size, int) or page_size < 1:
+            raise Exception("the page size has to be larger than 0")
+        after = None
+        if cursor is not None:
+            cursor_sort_key, after = cursor
+            if cursor_sort_key != sort_key:
+                raise Exception("the cursor belongs to a listing with another sort key")
+        page = []
+        last_key = None
+        for key, product in self._iter_listing(sort_key, active_only, promotion, after):
+            if len(page) == page_size:
+                return page, (sort_key, last_key)
+            page.append(product)
+            last_key = key
+        return page, None
 
+    def _iter_listing(self, sort_key, active_only, promotion, after):
+        """
+        yield (key, product) pairs of the listing of iter_products, starting after the product with key after
+        the key is the number the product got when it was added to the store (store order),
+        or the key of the product in the name or price index
+        """
+        if sort_key is None:
+            listing_view = self._listing_view
+            if listing_view is None:
+                with self._lock:
+                    listing_view = tuple((self._added_numbers[product_id], product)
+                                         for product_id, product in self._products_index.items())
+                    self._listing_view = listing_view
+            # the numbers grow in store order, so the first product added after the cursor is found by bisect
+            for position in range(0 if after is None else bisect_left(listing_view, (after + 1,)), len(listing_view)):
+                key, product = listing_view[position]
+                if (product.active or not active_only) and matches_promotion(product, promotion):
+                    yield key, product
+            return
+        if sort_key == "name":
+            listing = self._name_index.iter_sorted(after)
+        elif sort_key == "price":
+            if not active_only:
+                raise Exception("sorted by price only the active products can be listed")
+            listing = self._price_index.iter_sorted(after)
+        else:
+            raise Exception(f"unknown sort key {sort_key!r}, use None, 'name' or 'price'")
+        for key, product in listing:
+            if (product.active or not active_only) and matches_promotion(product, promotion):
+                yield key, product
+
+    @metrics.instrumented("store_order")
     def order(self, shopping_list):
         """
         Handle the ordering process in the store
+        The order is all-or-nothing: the whole shopping list is validated first, and if any line can't be bought
+        no stock is taken at all
+        """
+        if self._thread_safe:
+            with self._lock_products(shopping_list):
+                order_lines = self._prepare_order(shopping_list)
+                return self._commit_order(order_lines)
+        order_lines = self._prepare_order(shopping_list)
+        return self._commit_order(order_lines)
+
+    @metrics.instrumented("store_order", unit="cents")
+    def order_cents(self, shopping_list):
+        """
+        Handle the ordering process like order(), in the fixed-point pricing mode:
+        every line is priced in integer cents (see Product.price_for_cents) and the total is summed up exactly
+        return the total price of the order in integer cents
         """
+        if self._thread_safe:
+            with self._lock_products(shopping_list):
+                order_lines = self._prepare_order(shopping_list)
+                return self._commit_order(order_lines, in_cents=True)
+        order_lines = self._prepare_order(shopping_list)
+        return self._commit_order(order_lines, in_cents=True)
+
+    @metrics.instrumented("store_query", query="quote")
+    def quote(self, shopping_list, cache=None):
+        """
+        return the total price order() would charge for a shopping list, without buying anything
+        raise the same exception as order() if the shopping list can't be ordered
+        the promoted prices are memoized in cache (default_quote_cache if None)
+        """
+        if cache is None:
+            cache = default_quote_cache
+        order_lines = self._prepare_order(shopping_list)
         order_price = 0
+        for product, amount in order_lines:
+            order_price += cache.price(product, amount)
+        return order_price
+
+    def _lock_products(self, shopping_list):
+        """
+        return a context manager holding the locks of all products of a shopping list
+        the locks are always taken in the same order (by the id of the product), so two orders sharing products
+        can't wait for each other forever
+        """
+        products_by_id = {}
+        for order_tuple in shopping_list:
+            # malformed lines are skipped here, _prepare_order rejects them
+            if type(order_tuple) is tuple and len(order_tuple) == 2 and isinstance(order_tuple[0], Product):
+                products_by_id[id(order_tuple[0])] = order_tuple[0]
+        lock_stack = ExitStack()
+        for product_id in sorted(products_by_id):
+            lock_stack.enter_context(products_by_id[product_id]._lock)
+        return lock_stack
+
+    def _prepare_order(self, shopping_list):
+        """
+        validate a shopping list without changing any product
+        lines for the same product are aggregated, so the checks (stock, maximum of a LimitedProduct)
+        are done against the total amount ordered of each product
+        return a list of tuples (product, amount) with one tuple per product
+        """
         # shopping_list is a list of tuples, each tuple has 2 elements: product_name, amount
         if len(shopping_list) > 0:
+            aggregated_amounts = {}
             for order_tuple in shopping_list:
                 if type(order_tuple) is tuple:
                     if is_product_type_check(order_tuple[0]) and is_int_type_check(order_tuple[1]):
-                        if order_tuple[0] in self._products_list:
-                            order_price += order_tuple[0].buy(order_tuple[1])
+                        if id(order_tuple[0]) in self._products_index:
+                            product, amount = order_tuple
+                            # every line is checked on its own, a negative line must not cancel out another
+                            if amount <= 0:
+                                raise Exception("please give a quantity larger than 0!")
+                            if id(product) in aggregated_amounts:
+                                aggregated_amounts[id(product)] = (product, aggregated_amounts[id(product)][1] + amount)
+                            else:
+                                aggregated_amounts[id(product)] = (product, amount)
                         else:
                             raise Exception("product doesn't exist in the store")
                 else:
                     raise Exception("shopping list element is not a tuple!")
-            return order_price
+            order_lines = list(aggregated_amounts.values())
+            for product, amount in order_lines:
+                product.check_buy(amount)
+            self._check_reservations(order_lines)
+            return order_lines
         else:
             raise Exception("empty shopping list")
 
+    def _commit_order(self, order_lines, in_cents=False):
+        """
+        buy every (product, amount) line of a validated order
+        if a line still fails, the lines bought before it are rolled back before the exception is raised again
+        return the total price of the order, in integer cents if in_cents is True
+        """
+        order_price = 0
+        bought_lines = []
+        self._notify("order_started", order_lines)
+        try:
+            for product, amount in order_lines:
+                bought_lines.append((product, product.quantity, product.active))
+                order_price += product.buy_cents(amount) if in_cents else product.buy(amount)
+        except Exception:
+            for product, old_quantity, was_active in reversed(bought_lines):
+                restore_product(product, old_quantity, was_active)
+            self._notify("order_failed", order_lines)
+            raise
+        self._notify("order_committed", order_lines)
+        return order_price
+
+    def _commit_orders(self, orders):
+        """
+        buy several validated orders (lists of order lines) together, taking the stock of each product once
+        the caller holds the locks of the products and has checked that the stock is enough for all orders
+        together. Every order is announced to the listeners and counted in the store_order metrics like an
+        order() of its own, the time of the commit is shared out evenly between the orders
+        raise the exception of a line which can't be priced before anything is bought
+        return the list of the total prices of the orders
+        """
+        start_time = time.perf_counter()
+        order_prices = [sum(product.price_for(amount) for product, amount in order_lines) for order_lines in orders]
+        total_amounts = {}
+        for order_lines in orders:
+            self._notify("order_started", order_lines)
+            for product, amount in order_lines:
+                if id(product) in total_amounts:
+                    total_amounts[id(product)] = (product, total_amounts[id(product)][1] + amount)
+                else:
+                    total_amounts[id(product)] = (product, amount)
+        for product, amount in total_amounts.values():
+            product._remove_stock(amount)
+        for order_lines in orders:
+            self._notify("order_committed", order_lines)
+        registry = metrics.registry
+        if registry is not None and orders:
+            order_seconds = (time.perf_counter() - start_time) / len(orders)
+            for _ in orders:
+                registry.increment("store_order_total")
+                registry.observe("store_order_seconds", order_seconds)
+        return order_prices
+
+    @property
+    def reservations(self):
+        """
+        return the Reservations holding stock of the store for checkouts
+        """
+        if self._reservations is None:
+            with self._lock:
+                if self._reservations is None:
+                    self._reservations = Reservations(self)
+        return self._reservations
+
+    def reserve(self, shopping_list, ttl):
+        """
+        hold the stock of a shopping list for ttl seconds, so other orders can't take it
+        the shopping list is validated like an order
+        return the Reservation, which has to be committed with commit_reservation or released
+        with release_reservation before it expires
+        """
+        return self.reservations.reserve(shopping_list, ttl)
+
+    def commit_reservation(self, reservation):
+        """
+        buy the stock held by a reservation, return the total price of the order
+        """
+        return self.reservations.commit(reservation)
+
+    def release_reservation(self, reservation):
+        """
+        give the stock held by a reservation back, return whether the reservation was still live
+        """
+        return self.reservations.release(reservation)
+
+    def available_quantity(self, product):
+        """
+        return the quantity of a product which can be ordered, i.e. its quantity minus the live holds
+        """
+        if self._reservations is None:
+            return product.quantity
+        return self._reservations.available(product)
+
+    def _check_reservations(self, order_lines):
+        """
+        raise an exception if validated order lines need stock held by a reservation
+        """
+        if self._reservations is not None:
+            self._reservations.check_available(order_lines)
+
+    @metrics.instrumented("store_query", query="contains")
     def __contains__(self, product):
         """
         magic method for (in) operator to check whether a product is in the store
         """
-        return product in self._products_list
+        return id(product) in self._products_index
 
     def __add__(self, store):
         """
-        using (+) operator to create a new store out of 2 other store objects.
-        The products of both stores will be added together and create a new list for the new store
-        Assuming that the products of the 2 stores are not identical since the assignment doesn't mention
-        the condition
+        using (+) operator to combine 2 stores (or merged stores) into a MergedStore.
+        The merged store only references both stores, no product list is copied
+        """
+        return MergedStore([self, store])
+
+
+@metrics.instrument_class
+class MergedStore:
+    """
+    class MergedStore is a read-through view over several stores, created by adding stores together (a + b + c).
+    It keeps references to its member stores instead of copying their products, so merging n stores only costs
+    O(n). Changes of the member stores are seen right away. A product belonging to several member stores is
+    only counted and listed once.
+    Ordering through a merged store buys the products themselves, so the stock is taken from every member
+    store holding them
+    """
+
+    def __init__(self, stores):
+        """
+        merge a list of stores, the members of a merged store in the list are merged directly
+        """
+        members = []
+        for store in stores:
+            if isinstance(store, MergedStore):
+                store_members = store._stores
+            elif isinstance(store, Store):
+                store_members = (store,)
+            else:
+                raise Exception("only stores can be added together")
+            for member in store_members:
+                if all(member is not other_member for other_member in members):
+                    members.append(member)
+        self._stores = tuple(members)
+        # membership test and lookup through the indexes of the member stores, without merging them
+        self._products_index = ChainMap(*(member._products_index for member in self._stores))
+        self._thread_safe = any(member._thread_safe for member in self._stores)
+        self._listeners = ()
+        self._duplicates = {}  # id(product) -> (product, number of extra member stores holding it)
+        self._duplicates_versions = None  # versions of the member stores when _duplicates was computed
+        self._products_key = None  # products views of the member stores when _products_view was built
+        self._products_view = ()
+
+    @property
+    def stores(self):
         """
-        return Store(self._products_list + store._products_list)
+        return the tuple of member stores
+        """
+        return self._stores
+
+    def _find_duplicates(self):
+        """
+        return the products held by more than one member store, found through the indexes of the member stores
+        recomputed only after products were added to or removed from a member store
+        """
+        versions = tuple(member._version for member in self._stores)
+        if versions != self._duplicates_versions:
+            duplicates = {}
+            for position, member in enumerate(self._stores):
+                earlier_members = self._stores[:position]
+                for product_id, product in member._products_index.items():
+                    if any(product_id in earlier_member._products_index for earlier_member in earlier_members):
+                        duplicates[product_id] = (product, duplicates.get(product_id, (product, 0))[1] + 1)
+            self._duplicates = duplicates
+            self._duplicates_versions = versions
+        return self._duplicates
+
+    def __iter__(self):
+        """
+        yield the active products of all member stores, member store after member store
+        """
+        duplicates = self._find_duplicates()
+        for position, member in enumerate(self._stores):
+            for product in member.products:
+                if duplicates and id(product) in duplicates and \
+                        any(id(product) in earlier_member._products_index for earlier_member in self._stores[:position]):
+                    continue
+                yield product
+
+    @property
+    def products(self):
+        """
+        return a read-only tuple of all active products of the member stores
+        the tuple is cached until the products of a member store change
+        """
+        products_key = tuple(member.products for member in self._stores)
+        if self._products_key is None or any(view is not cached_view
+                                             for view, cached_view in zip(products_key, self._products_key)):
+            self._products_view = tuple(self)
+            self._products_key = products_key
+        return self._products_view
+
+    @property
+    def quantity(self):
+        """
+        get the total quantity of all products of the member stores, counting shared products once
+        """
+        total_quantity = 0
+        for member in self._stores:
+            total_quantity += member.quantity
+        for product, extra_count in self._find_duplicates().values():
+            total_quantity -= product.quantity * extra_count
+        return total_quantity
+
+    def get_product(self, product_id):
+        """
+        return the product registered under product_id in one of the member stores, None if there is none
+        """
+        return self._products_index.get(product_id)
+
+    def __contains__(self, product):
+        """
+        magic method for (in) operator to check whether a product is in one of the member stores
+        """
+        return id(product) in self._products_index
+
+    def __add__(self, store):
+        return MergedStore([self, store])
+
+    def _check_reservations(self, order_lines):
+        """
+        raise an exception if validated order lines need stock held by a reservation of a member store
+        """
+        for member in self._stores:
+            member._check_reservations(order_lines)
+
+    # ordering works exactly like in a single store: _prepare_order checks the products against
+    # _products_index, which looks through the indexes of all member stores
+    order = Store.order
+    order_cents = Store.order_cents
+    quote = Store.quote
+    _lock_products = Store._lock_products
+    _prepare_order = Store._prepare_order
+    _commit_order = Store._commit_order
+    _commit_orders = Store._commit_orders
+    add_listener = Store.add_listener
+    remove_listener = Store.remove_listener
+    _notify = Store._notify
 
 
 def is_product_type_check(product):
     """
     check whether a variable points to an object of class Product
     """
-    if type(product) is Product:
+    if isinstance(product, Product):
         return True
     else:
         raise Exception("This is not an instance of class Product!")
+
+
+def matches_promotion(product, promotion):
+    """
+    check a product against the promotion filter of Store.iter_products
+    """
+    if promotion is None:
+        return True
+    if promotion is True:
+        return product.promotion is not None
+    if promotion is False:
+        return product.promotion is None
+    return product.promotion is promotion
+
+
+def restore_product(product, quantity, active):
+    """
+    set the quantity and the active state of a product back to the given values
+    used to roll back an order which could only be bought partially
+    """
+    if product.quantity != quantity:
+        product.quantity = quantity
+    if active and not product.active:
+        product.activate()
@@ -0,0 +1,58 @@
+import pytest
+from src.products import Product
+from src.promotions import SecondHalfPrice, ThirdOneFree, PercentDiscount, Promotion
+
+np = pytest.importorskip("numpy")
+hypothesis = pytest.importorskip("hypothesis")
+from hypothesis import given, strategies
+from src.batch_pricing import price_batch, NO_PROMOTION
+
+PROMOTIONS = [SecondHalfPrice("Second Half price!"), ThirdOneFree("Third one free!"),
+              PercentDiscount("Percent Discount!", 30), PercentDiscount("Percent Discount!", 100)]
+
+
+class BuyOneGetOneFree(Promotion):
+    """
+    promotion without a vectorized implementation, priced through the default apply_promotion_batch
+    """
+
+    def apply_promotion(self, product, quantity):
+        return (quantity + 1) // 2 * product.price
+
+
+def expected_total(price, quantity, promotion_id, promotions):
+    """
+    price a line through Product and apply_promotion like Product.price_for does
+    """
+    product = Product("Macbook", price=price, quantity=quantity)
+    if promotion_id != NO_PROMOTION:
+        product.promotion = promotions[promotion_id]
+    return product.price_for(quantity)
+
+
+lines = strategies.lists(strategies.tuples(strategies.integers(min_value=1, max_value=10 ** 6),
+                                           strategies.integers(min_value=1, max_value=10 ** 4),
+                                           strategies.integers(min_value=NO_PROMOTION, max_value=len(PROMOTIONS))),
+                         min_size=1, max_size=200)
+
+
+@given(lines)
+def test_price_batch_matches_apply_promotion(order_lines):
+    """
+    Property based test: price_batch gives exactly the totals of the existing apply_promotion implementations
+    """
+    promotions = PROMOTIONS + [BuyOneGetOneFree("Buy one get one free")]
+    prices, quantities, promotion_ids = zip(*order_lines)
+    totals = price_batch(prices, quantities, promotion_ids, promotions)
+    for total, (price, quantity, promotion_id) in zip(totals.tolist(), order_lines):
+        assert total == expected_total(price, quantity, promotion_id, promotions)
+
+
+def test_price_batch_invalid_input():
+    """
+    Testing price_batch with invalid arguments
+    """
+    with pytest.raises(Exception, match="need to have the same length"):
+        price_batch([10, 20], [1], [NO_PROMOTION, NO_PROMOTION], PROMOTIONS)
+    with pytest.raises(Exception, match="promotion id doesn't exist"):
+        price_batch([10], [1], [len(PROMOTIONS)], PROMOTIONS)
@@ -0,0 +1,44 @@
+from benchmarks.suite import make_catalog, make_orders, compare
+from src.products import NonStockedProduct
+from src.store import Store
+
+
+def test_workload_is_reproducible():
+    """
+    Test that the synthetic catalogs and orders only depend on their seed
+    """
+    catalog = make_catalog(200)
+    assert [product.price for product in catalog] == [product.price for product in make_catalog(200)]
+    orders = make_orders(catalog, 20, lines=4, skew=1.5)
+    again = make_orders(catalog, 20, lines=4, skew=1.5)
+    assert [[(catalog.index(product), quantity) for product, quantity in shopping_list] for shopping_list in orders] \
+        == [[(catalog.index(product), quantity) for product, quantity in shopping_list] for shopping_list in again]
+    # a non stocked product picked twice for an order is left out, so an order can be shorter
+    assert all(1 <= len(shopping_list) <= 4 for shopping_list in orders)
+    for shopping_list in orders:
+        non_stocked = [id(product) for product, _ in shopping_list if isinstance(product, NonStockedProduct)]
+        assert len(non_stocked) == len(set(non_stocked))
+    assert all(quantity == 1 for shopping_list in orders for product, quantity in shopping_list
+               if isinstance(product, NonStockedProduct))
+
+
+def test_compare_with_baseline():
+    """
+    Test that only results slower than the baseline by more than the threshold are reported
+    """
+    baseline = {"store.order": 1.0, "store.quantity": 1.0}
+    results = {"store.order": 1.3, "store.quantity": 1.1, "store.add": 5.0}
+    assert compare(results, baseline, 0.25) == [("store.order", 1.0, 1.3)]
+
+
+def test_orders_with_many_lines_can_be_ordered():
+    """
+    Test that long orders never contain the same non stocked product twice, so every order can be bought
+    """
+    catalog = make_catalog(100)
+    store = Store(catalog)
+    orders = make_orders(catalog, 100, lines=50, skew=0)
+    for shopping_list in orders:
+        non_stocked = [id(product) for product, _ in shopping_list if isinstance(product, NonStockedProduct)]
+        assert len(non_stocked) == len(set(non_stocked))
+        assert store.order(shopping_list) > 0
@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from src.cart import Cart
+from src.products import Product, LimitedProduct
+from src.service import StoreService
+from src.store import Store
+
+
+def test_cart_aggregates_lines():
+    """
+    Testing that repeated products are added up and checked against their total in the cart
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=10)
+    pixel = LimitedProduct("Google Pixel 7", price=500, quantity=250, maximum=2)
+    best_buy = Store([mac, pixel])
+    cart = Cart(best_buy)
+
+    for _ in range(4):
+        cart.add(mac, 2)
+    cart.add(pixel, 1)
+    assert cart.lines == [(mac, 8), (pixel, 1)]
+    assert len(cart) == 2 and mac in cart and cart.amount(mac) == 8
+    # the checks count what is already in the cart
+    with pytest.raises(Exception, match="not enough"):
+        cart.add(mac, 3)
+    with pytest.raises(Exception, match="less than"):
+        cart.add(pixel, 2)
+    with pytest.raises(Exception, match="doesn't exist"):
+        cart.add(Product("Galaxy Buds", price=120, quantity=10), 1)
+    with pytest.raises(Exception, match="larger than 0"):
+        cart.add(mac, 0)
+    assert cart.lines == [(mac, 8), (pixel, 1)]
+
+    with pytest.raises(Exception, match="larger than 0"):
+        cart.remove(mac, -100)
+    with pytest.raises(Exception, match="integer"):
+        cart.remove(mac, "x")
+    assert cart.amount(mac) == 8
+    cart.remove(mac, 3)
+    assert cart.total_price() == 5 * 1450 + 500
+    assert cart.checkout() == 7750
+    assert mac.quantity == 5 and len(cart) == 0
+    with pytest.raises(Exception, match="empty"):
+        cart.checkout()
+
+
+def test_cart_respects_reservations():
+    """
+    Testing that a cart can't take stock held by a reservation
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=3)
+    best_buy = Store([mac])
+    best_buy.reserve([(mac, 2)], ttl=60)
+    cart = Cart(best_buy)
+    cart.add(mac, 1)
+    with pytest.raises(Exception, match="reserved"):
+        cart.add(mac, 1)
+
+
+def test_cart_through_the_service():
+    """
+    Testing that StoreService takes a Cart and empties it after the order
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=10)
+    best_buy = Store([mac])
+    cart = Cart(best_buy)
+    cart.add(mac, 1)
+    cart.add(mac, 2)
+
+    async def run():
+        async with StoreService(best_buy) as service:
+            return await service.order(cart)
+
+    assert asyncio.run(run()) == 4350
+    assert mac.quantity == 7 and len(cart) == 0
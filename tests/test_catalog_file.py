@@ -0,0 +1,51 @@
+import pytest
+from src.products import Product, LimitedProduct, NonStockedProduct
+from src.promotions import ThirdOneFree
+from src.catalog_file import write_catalog, MappedCatalog
+
+
+def test_mapped_catalog(tmp_path):
+    """
+    Testing that a MappedCatalog materializes products lazily and writes stock updates back into the file
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    bose.promotion = ThirdOneFree("Third one free!")
+    pixel = LimitedProduct("Google Pixel 7", price=500, quantity=250, maximum=1)
+    pixel.deactivate()
+    catalog_path = tmp_path / "catalog.bin"
+    write_catalog(catalog_path, [mac, bose, pixel, NonStockedProduct("Photoshop", price=200)])
+
+    catalog = MappedCatalog(catalog_path)
+    assert len(catalog) == 4
+    assert catalog.quantity == 850
+    assert not catalog._views
+
+    mapped_bose = catalog.product(1)
+    assert len(catalog._views) == 1
+    assert str(mapped_bose) == "Bose QuietComfort Earbuds, Price: 250, Quantity: 500, Promotion: Third one free!"
+    assert catalog.product(1) is mapped_bose
+    assert [product._name for product in catalog.iter_products()] == \
+        ["MacBook Air M2", "Bose QuietComfort Earbuds", "Photoshop"]
+    assert not catalog.product(2).active
+    assert isinstance(catalog.product(2), LimitedProduct)
+
+    mapped_mac = catalog.product(0)
+    assert catalog.order([(mapped_bose, 3), (mapped_mac, 100), (catalog.product(3), 1)]) == 145700
+    with pytest.raises(Exception, match="Product is not active"):
+        catalog.order([(catalog.product(2), 1)])
+    assert catalog.quantity == 747
+    catalog.close()
+
+    # the changes were written into the file
+    catalog = MappedCatalog(catalog_path)
+    assert catalog.quantity == 747
+    assert catalog.product(1).quantity == 497
+    assert not catalog.product(0).active
+    assert catalog.product(0).quantity == 0
+    # prices are stored in integer cents in the records
+    catalog.product(1).price_cents = 24999
+    catalog.close()
+    catalog = MappedCatalog(catalog_path)
+    assert catalog.product(1).price == 249.99 and catalog.product(1).buy_cents(2) == 49998
+    catalog.close()
@@ -0,0 +1,83 @@
+import pytest
+from src.products import Product, LimitedProduct, NonStockedProduct
+from src.promotions import PercentDiscount, SecondHalfPrice
+from src.store import Store
+from src.catalog_io import import_catalog, export_catalog, import_rows, iter_jsonl_rows
+
+CSV_CATALOG = """name,price,quantity,kind,maximum,active,promotion,promotion_name,percent
+MacBook Air M2,1450,100,,,,,,
+Bose QuietComfort Earbuds,250,500,product,,true,percent_discount,30% off,30
+Google Pixel 7,500,250,limited,1,,second_half_price,Second half price,
+Photoshop,200,,non_stocked,,false,,,
+,100,10,,,,,,
+Broken price,hello,10,,,,,,
+Pixel without maximum,500,250,limited,,,,,
+Strange promotion,500,250,,,,buy_nothing,,
+"""
+
+
+def describe(store):
+    """
+    return the state of all products of a store as a list of comparable tuples
+    """
+    return [(product._name, product.price, product.quantity, product.active, type(product).__name__,
+             str(product.promotion)) for product in store._products_index.values()]
+
+
+def test_import_csv_catalog(tmp_path):
+    """
+    Testing the import of a CSV catalog with valid and invalid rows
+    """
+    catalog_path = tmp_path / "catalog.csv"
+    catalog_path.write_text(CSV_CATALOG)
+    best_buy = Store([])
+    report = import_catalog(catalog_path, best_buy)
+
+    assert report.imported == 4
+    assert report.rejected == 4
+    assert [row_number for row_number, _ in report.errors] == [5, 6, 7, 8]
+    assert "empty name" in report.errors[0][1]
+    assert describe(best_buy) == [
+        ("MacBook Air M2", 1450, 100, True, "Product", "None"),
+        ("Bose QuietComfort Earbuds", 250, 500, True, "Product", "30% off"),
+        ("Google Pixel 7", 500, 250, True, "LimitedProduct", "Second half price"),
+        ("Photoshop", 200, 0, False, "NonStockedProduct", "None")]
+    bose = best_buy.products[1]
+    assert bose.buy(2) == 350
+
+
+def test_export_and_import_round_trip(tmp_path):
+    """
+    Testing that an exported store is imported again unchanged, in CSV and in JSON Lines
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    mac.promotion = PercentDiscount("Half price", 50)
+    pixel = LimitedProduct("Google Pixel 7", price=500, quantity=250, maximum=2)
+    pixel.promotion = SecondHalfPrice("Second half price")
+    photoshop = NonStockedProduct("Photoshop", price=200)
+    photoshop.deactivate()
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=2)
+    bose.buy(2)  # sold out: quantity 0 and inactive
+    best_buy = Store([mac, pixel, photoshop, bose])
+
+    for file_name in ("catalog.csv", "catalog.jsonl"):
+        assert export_catalog(best_buy, tmp_path / file_name) == 4
+        imported_store = Store([])
+        assert import_catalog(tmp_path / file_name, imported_store).imported == 4
+        assert describe(imported_store) == describe(best_buy)
+
+    with pytest.raises(Exception, match="only .csv and .jsonl catalogs can be exported"):
+        export_catalog(best_buy, tmp_path / "catalog.txt")
+
+
+def test_import_invalid_json_lines():
+    """
+    Testing that invalid JSON lines are rejected without stopping the import
+    """
+    lines = ['{"name": "MacBook Air M2", "price": 1450, "quantity": 100}\n', "not json\n", "\n", "[1, 2]\n",
+             '{"name": "Bose QuietComfort Earbuds", "price": 250, "quantity": 500}\n']
+    best_buy = Store([])
+    report = import_rows(iter_jsonl_rows(lines), best_buy)
+    assert str(report) == "2 rows imported, 2 rows rejected"
+    assert "invalid JSON" in report.errors[0][1]
+    assert best_buy.quantity == 600
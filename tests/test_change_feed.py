@@ -0,0 +1,62 @@
+from src.products import Product
+from src.promotions import SecondHalfPrice
+from src.store import Store
+from src.change_feed import ChangeFeed, EVENT_CHANGED, EVENT_ADDED, EVENT_REMOVED
+
+
+def test_change_feed_events():
+    """
+    Testing the events published for orders, setters and added or removed products
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    best_buy = Store([mac, bose])
+    feed = ChangeFeed(best_buy)
+    subscription = feed.subscribe()
+
+    best_buy.order([(mac, 100)])
+    bose.price = 200
+    bose.promotion = SecondHalfPrice("Second Half price!")
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    best_buy.add_product(pixel)
+    pixel.quantity = 300
+    best_buy.remove_product(bose)
+    bose.price = 150  # not in the store anymore
+
+    events = subscription.poll()
+    assert [(event.kind, event.product, event.field, event.old_value, event.new_value) for event in events] == [
+        (EVENT_CHANGED, mac, "quantity", 100, 0),
+        (EVENT_CHANGED, mac, "active", True, False),
+        (EVENT_CHANGED, bose, "price", 250, 200),
+        (EVENT_CHANGED, bose, "promotion", None, bose.promotion),
+        (EVENT_ADDED, pixel, None, None, None),
+        (EVENT_CHANGED, pixel, "quantity", 250, 300),
+        (EVENT_REMOVED, bose, None, None, None),
+    ]
+    assert [event.sequence for event in events] == list(range(7))
+    assert subscription.poll() == [] and subscription.lag == 0
+
+
+def test_change_feed_batches_and_slow_consumers():
+    """
+    Testing batched reads, independent cursors and the bounded ring buffer
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=10 ** 6)
+    best_buy = Store([mac])
+    feed = ChangeFeed(best_buy, capacity=100)
+    fast, slow = feed.subscribe(), feed.subscribe()
+    for _ in range(60):
+        best_buy.order([(mac, 1)])
+    assert len(fast.poll(max_events=50)) == 50
+    assert len(fast.poll(max_events=50)) == 10
+    for _ in range(90):
+        best_buy.order([(mac, 1)])
+    assert fast.lag == 90 and slow.lag == 150
+
+    # the slow subscription lost the 50 oldest events, the buffer never holds more than 100
+    events = slow.poll(max_events=None)
+    assert slow.missed == 50 and len(events) == 100
+    assert events[0].sequence == 50 and events[-1].new_value == 10 ** 6 - 150
+    assert len(fast.poll(max_events=None)) == 90 and fast.missed == 0
+    assert len(feed.subscribe(from_start=True).poll(max_events=None)) == 100
+    assert len(feed._buffer) == 100
@@ -0,0 +1,85 @@
+import pytest
+from src.products import Product, LimitedProduct
+from src.promotions import PercentDiscount
+
+np = pytest.importorskip("numpy")
+from src.columnar import ColumnarInventory
+
+
+def test_columnar_products_behave_like_products():
+    """
+    Testing that the product views of a ColumnarInventory work like normal products
+    """
+    inventory = ColumnarInventory(capacity=1)
+    mac = inventory.add_product("MacBook Air M2", price=1450, quantity=100)
+    pixel = inventory.add_product("Google Pixel 7", price=500, quantity=250, maximum=1)
+    photoshop = inventory.add_product("Photoshop", price=200, quantity=0, non_stocked=True)
+    best_buy = inventory.to_store(debug=True)
+
+    assert isinstance(pixel, LimitedProduct)
+    assert str(mac) == "MacBook Air M2, Price: 1450, Quantity: 100"
+    assert str(photoshop) == "Photoshop, Price: 200, non stocked product"
+    assert best_buy.quantity == 350
+    assert best_buy.order([(mac, 100), (pixel, 1), (photoshop, 1)]) == 145700
+    with pytest.raises(Exception, match="please order a quantity less than 1"):
+        pixel.buy(2)
+
+    # the changes of the views are written into the columns
+    assert not mac.active
+    assert best_buy.products == (pixel, photoshop)
+    assert inventory.total_quantity() == 249
+    assert inventory.active_count() == 2
+
+    pixel.promotion = PercentDiscount("Half price", 50)
+    assert pixel.buy(1) == 250
+    with pytest.raises(Exception, match="not an object of Class Promotion"):
+        pixel.promotion = "hello"
+
+    with pytest.raises(Exception, match="price can not be negative"):
+        inventory.add_product("Broken", price=-1, quantity=1)
+
+
+def test_columnar_bulk_operations():
+    """
+    Testing the vectorized aggregates, filters and price changes of ColumnarInventory
+    """
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    bose.deactivate()
+    inventory = ColumnarInventory.from_products([Product("MacBook Air M2", price=1450, quantity=100), bose])
+    inventory.add_products([f"Cable {i}" for i in range(1000)], np.full(1000, 10.0), np.arange(1, 1001))
+
+    assert len(inventory) == 1002
+    assert inventory.total_quantity() == 100 + 500 + 500500
+    assert inventory.total_quantity(active_only=True) == 100 + 500500
+    assert inventory.inventory_value() == 145000 + 125000 + 5005000
+    assert inventory.active_count() == 1001
+    assert [product._name for product in inventory.select(min_price=200, max_price=2000)] == \
+        ["MacBook Air M2", "Bose QuietComfort Earbuds"]
+    assert len(inventory.select(max_price=10, active_only=True)) == 1000
+
+    inventory.reprice(factor=1.5, selected=inventory.mask(max_price=10))
+    assert inventory.product(2).price == 15
+    assert inventory.product(0).price == 1450
+    inventory.reprice(new_price=99.5)
+    assert inventory.inventory_value() == 99.5 * (100 + 500 + 500500)
+    with pytest.raises(Exception, match="price can't take a negative value"):
+        inventory.reprice(factor=-1)
+    assert inventory.product(0).price == 99.5
+
+    with pytest.raises(Exception, match="quantity can not be negative"):
+        inventory.add_products(["Broken"], [10], [0])
+    assert len(inventory) == 1002
+
+
+def test_columnar_reprice_updates_store():
+    """
+    Testing that a bulk price change of the inventory keeps the price index of a store sorted
+    """
+    inventory = ColumnarInventory()
+    inventory.add_products(["Cable", "Charger", "Adapter"], [30, 20, 10], [5, 5, 5])
+    best_buy = inventory.to_store()
+    cable, charger, adapter = inventory.products
+    assert best_buy.cheapest_products(3) == [adapter, charger, cable]
+
+    inventory.reprice(new_price=[5, 25], selected=inventory.mask(min_price=20))
+    assert best_buy.cheapest_products(3) == [cable, adapter, charger]
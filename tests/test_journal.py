@@ -0,0 +1,97 @@
+import os
+import time
+from src.products import Product, LimitedProduct, NonStockedProduct
+from src.promotions import PercentDiscount, SecondHalfPrice
+from src.store import Store
+from src.journal import StoreJournal, recover_store, JOURNAL_FILE_NAME
+
+
+def describe(store):
+    """
+    return the state of all products of a store as a list of comparable tuples
+    """
+    return [(product._name, product.price, product.quantity, product.active, str(product.promotion))
+            for product in store._products_index.values()]
+
+
+def test_journal_recovers_store(tmp_path):
+    """
+    Testing that a store is rebuilt from its snapshot and journal
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    pixel = LimitedProduct("Google Pixel 7", price=500, quantity=250, maximum=1)
+    best_buy = Store([mac, bose])
+    journal = StoreJournal(best_buy, tmp_path, group_size=3)
+
+    best_buy.order([(mac, 10), (bose, 5)])
+    best_buy.add_product(pixel)
+    best_buy.add_product(NonStockedProduct("Photoshop", price=200))
+    best_buy.order([(pixel, 1), (mac, 90)])
+    bose.quantity = 1000
+    bose.price = 300
+    bose.price_cents = 29999
+    bose.promotion = PercentDiscount("30% off", 30)
+    pixel.promotion = SecondHalfPrice("Second half price")
+    pixel.deactivate()
+    try:
+        best_buy.order([(bose, 1), (pixel, 1)])
+    except Exception:
+        pass
+    best_buy.remove_product(pixel)
+    journal.close()
+
+    recovered_store = recover_store(tmp_path, debug=True)
+    assert describe(recovered_store) == describe(best_buy)
+    assert not recovered_store.get_product(id(mac))
+    assert recovered_store.quantity == best_buy.quantity == 1000
+
+
+def test_journal_snapshots_and_torn_tail(tmp_path):
+    """
+    Testing automatic snapshots and the recovery from a journal with a torn last record
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=1000)
+    best_buy = Store([mac])
+    journal = StoreJournal(best_buy, tmp_path, group_size=1, snapshot_every=10)
+    for _ in range(25):
+        best_buy.order([(mac, 1)])
+    journal.close()
+    # 20 orders are in the snapshot, the 5 last ones in the journal
+    assert recover_store(tmp_path).quantity == 975
+
+    # a crash in the middle of writing the last record loses only that record
+    journal_path = os.path.join(tmp_path, JOURNAL_FILE_NAME)
+    with open(journal_path, "r+b") as journal_file:
+        journal_file.truncate(os.path.getsize(journal_path) - 3)
+    recovered_store = recover_store(tmp_path)
+    assert recovered_store.quantity == 976
+
+    # attaching a journal to the recovered store starts from its state
+    journal = StoreJournal(recovered_store, tmp_path)
+    recovered_store.order([(recovered_store.products[0], 6)])
+    journal.close()
+    assert recover_store(tmp_path).quantity == 970
+
+
+def test_journal_syncs_after_max_delay(tmp_path):
+    """
+    Testing that a pending group is synced once max_delay passed, even when no further record is added
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=1000)
+    best_buy = Store([mac])
+    # with a long delay the order stays pending
+    journal = StoreJournal(best_buy, tmp_path / "slow", group_size=100, max_delay=600)
+    best_buy.order([(mac, 1)])
+    assert recover_store(tmp_path / "slow").quantity == 1000
+    journal.close()
+    assert recover_store(tmp_path / "slow").quantity == 999
+
+    # with a short delay the timer syncs it without any further record
+    journal = StoreJournal(best_buy, tmp_path / "fast", group_size=100, max_delay=0.05)
+    best_buy.order([(mac, 1)])
+    deadline = time.monotonic() + 5
+    while recover_store(tmp_path / "fast").quantity != 998 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert recover_store(tmp_path / "fast").quantity == 998
+    journal.close()
@@ -0,0 +1,31 @@
+import io
+import pytest
+import main
+from src.products import Product
+from src.store import Store
+
+
+def test_batch_mode():
+    """
+    Testing the non-interactive batch mode of main
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    best_buy = Store([mac, bose])
+    orders = io.StringIO("1:2 2:1\n# yesterday's orders\n\n1:1000\n2:x\n3:1\n1:98\n2:4\n")
+    results = io.StringIO()
+
+    summary = main.run_batch(best_buy, orders, results, batch_size=2)
+    lines = results.getvalue().splitlines()
+    assert lines[:6] == ["1\tOK\t3150",
+                         "4\tERROR\tnot enough MacBook Air M2 in the warehouse",
+                         "5\tERROR\t'2:x' is not in the form <product #>:<amount>",
+                         "6\tERROR\tproduct #3 doesn't exist on the list",
+                         "7\tOK\t142100",
+                         "8\tOK\t1000"]
+    # the product numbers don't shift when the MacBook sells out
+    assert not mac.active and bose.quantity == 495
+    assert lines[6] == f"# {summary}"
+    assert summary.startswith("6 orders, 3 completed, 3 failed")
+    with pytest.raises(Exception, match="batch size"):
+        main.run_batch(best_buy, orders, results, batch_size=0)
@@ -0,0 +1,89 @@
+import pytest
+from src import metrics
+from src.products import Product, LimitedProduct
+from src.promotions import SecondHalfPrice
+from src.store import Store
+
+
+@pytest.fixture
+def registry():
+    registry = metrics.enable()
+    yield registry
+    metrics.disable()
+
+
+def test_disabled_by_default():
+    """
+    Test that nothing is collected while the instrumentation is disabled
+    """
+    assert metrics.registry is None
+    store = Store([Product("MacBook Air M2", price=1450, quantity=100)])
+    assert store.order([(store.products[0], 1)]) == 1450
+
+
+def test_order_and_buy_counters(registry):
+    """
+    Test that orders, purchases, promotions and queries are counted with their latency
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    mac.promotion = SecondHalfPrice("Second Half price!")
+    store = Store([mac])
+    assert store.order([(mac, 2)]) == 2175
+    store.find_by_prefix("mac", limit=1)
+    assert registry.counter("store_order_total") == 1
+    assert registry.counter("product_buy_total") == 1
+    assert registry.counter("promotion_apply_total", (("promotion", "SecondHalfPrice"),)) == 1
+    assert registry.counter("store_query_total", (("query", "find_by_prefix"),)) == 1
+    histogram = registry.snapshot()["histograms"][("store_order_seconds", ())]
+    assert histogram["count"] == 1 and sum(histogram["buckets"]) == 1
+
+
+def test_rejection_reasons(registry):
+    """
+    Test that rejected purchases are counted with the reason of the rejection
+    """
+    shipping = LimitedProduct("Shipping", price=10, quantity=250, maximum=1)
+    with pytest.raises(Exception):
+        shipping.buy(2)
+    with pytest.raises(Exception):
+        shipping.buy(300)
+    assert registry.counter("product_buy_errors_total", (("reason", "maximum"),)) == 1
+    assert registry.counter("product_buy_errors_total", (("reason", "stock"),)) == 1
+    assert registry.counter("product_buy_total") == 2
+
+
+def test_export(registry):
+    """
+    Test the Prometheus text format and the export callback
+    """
+    Store([Product("Bose QuietComfort Earbuds", price=250, quantity=500)]).quantity
+    text = registry.to_prometheus()
+    assert "# TYPE store_query_total counter" in text
+    assert 'store_query_total{query="quantity"} 1' in text
+    assert 'store_query_seconds_bucket{query="quantity",le="+Inf"} 1' in text
+    exported = []
+    registry.export(exported.append)
+    assert exported[0]["counters"][("store_query_total", (("query", "quantity"),))] == 1
+    assert metrics.disable() is registry
+    Store([]).quantity
+    assert registry.counter("store_query_total", (("query", "quantity"),)) == 1
+
+
+def test_plain_methods_while_disabled():
+    """
+    Test that the instrumented methods are only swapped in while the instrumentation is enabled
+    """
+    store = Store([Product("MacBook Air M2", price=1450, quantity=100)])
+    assert not hasattr(Store.__contains__, "__wrapped__")
+    assert not hasattr(Store.quantity.fget, "__wrapped__")
+    registry = metrics.enable()
+    try:
+        assert hasattr(Store.__contains__, "__wrapped__") and hasattr(Product.buy, "__wrapped__")
+        assert store.quantity == 100 and store.products[0] in store
+        assert registry.counter("store_query_total", (("query", "contains"),)) == 1
+    finally:
+        metrics.disable()
+    assert not hasattr(Store.__contains__, "__wrapped__")
+    assert not hasattr(Store.quantity.fget, "__wrapped__")
+    assert not hasattr(Product.buy, "__wrapped__")
+    assert store.quantity == 100
@@ -1,6 +1,7 @@
 import pytest
 from src.products import Product, LimitedProduct, NonStockedProduct
 from src.promotions import Promotion, SecondHalfPrice, ThirdOneFree, PercentDiscount
+from src.quote_cache import QuoteCache
 
 
 def test_creating_prod():
@@ -163,3 +164,81 @@ def test_magic_methods():
     second_half_price = SecondHalfPrice("Second Half Price!")
     product_two.promotion = second_half_price
     assert str(product_two) == "Airfryer 3000, Price: 500, Quantity: 1000, Promotion: Second Half Price!"
+
+
+def test_from_trusted():
+    """
+    Testing the unchecked constructors used for bulk loads of trusted catalogs
+    """
+    product = Product.from_trusted("Airfryer 3000", price=500, quantity=1000)
+    limited_product = LimitedProduct.from_trusted("Macbook", price=1000, quantity=500, maximum=10)
+    non_stocked_product = NonStockedProduct.from_trusted("Photoshop", price=200)
+
+    assert str(product) == "Airfryer 3000, Price: 500, Quantity: 1000"
+    assert product.buy(10) == 5000
+    with pytest.raises(Exception, match="please order a quantity less than 10"):
+        limited_product.buy(11)
+    assert non_stocked_product.buy(1) == 200
+
+    # the products have no per-instance __dict__
+    with pytest.raises(AttributeError):
+        product.color = "red"
+
+
+def test_quote():
+    """
+    Testing that Product.quote prices a quantity without buying it, and the LRU cache behind it
+    """
+    cache = QuoteCache(max_size=2)
+    product = Product("Airfryer 3000", price=500, quantity=10)
+    product.promotion = ThirdOneFree("Third one free!")
+
+    assert product.quote(3, cache) == 1000
+    assert product.quote(3, cache) == 1000
+    assert product.quantity == 10
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "evictions": 0, "invalidations": 0}
+
+    # changing the price or the promotion invalidates the cached quotes
+    product.price = 400
+    assert product.quote(3, cache) == 800
+    product.promotion = PercentDiscount("Half price", 50)
+    assert product.quote(3, cache) == 600
+    assert cache.invalidations == 2
+
+    # the least recently used entry is evicted
+    product.quote(1, cache)
+    product.quote(2, cache)
+    assert cache.evictions == 1
+    assert len(cache) == 2
+
+    with pytest.raises(Exception, match="not enough Airfryer 3000 in the warehouse"):
+        product.quote(11, cache)
+
+
+def test_cached_str():
+    """
+    Testing that the text of a product is cached until one of its fields changes
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    text = str(mac)
+    assert text == "MacBook Air M2, Price: 1450, Quantity: 100"
+    assert str(mac) is text
+    mac.buy(2)
+    assert str(mac) == "MacBook Air M2, Price: 1450, Quantity: 98"
+    mac.price = 1300
+    mac.promotion = SecondHalfPrice("Second Half price!")
+    assert str(mac) == "MacBook Air M2, Price: 1300, Quantity: 98, Promotion: Second Half price!"
+
+
+def test_price_stored_in_cents():
+    """
+    Testing that the price is stored in integer cents and handed out in major units by price
+    """
+    speaker = Product.from_trusted("Sonos One", 19.99, 10)
+    assert speaker._price_cents == 1999
+    assert speaker.price == 19.99 and speaker.price_cents == 1999
+    speaker.price = 25
+    assert speaker._price_cents == 2500 and type(speaker.price) is int
+    speaker.price_cents = 2550
+    assert speaker.price == 25.5
+    assert speaker.buy(3) == 76.5 and speaker.buy_cents(3) == 7650
@@ -58,3 +58,18 @@ def test_percent_discount_promotion():
     assert new_product.buy(3) == 1500
     assert new_product.buy(6) == 3000
 
+
+def test_promotions_in_cents():
+    """
+    Testing the fixed-point (integer cents) calculation of the promotions
+    """
+    # 19.99 per item: the half price of a pair is 9.995, rounded half up once for the line
+    assert SecondHalfPrice("Second Half price!").apply_promotion_cents(1999, 2) == 2999
+    assert SecondHalfPrice("Second Half price!").apply_promotion_cents(1999, 5) == 7996
+    assert ThirdOneFree("Third one free!").apply_promotion_cents(1999, 7) == 9995
+    assert PercentDiscount("Percent Discount!", 30).apply_promotion_cents(1999, 3) == 4198
+    # the cents agree with the float calculation wherever the float one is exact
+    for promotion in (SecondHalfPrice("a"), ThirdOneFree("b"), PercentDiscount("c", 25)):
+        for quantity in range(1, 10):
+            assert promotion.apply_promotion_cents(100000, quantity) == \
+                round(promotion.apply_promotion(Product("Macbook", price=1000, quantity=100), quantity) * 100)
@@ -0,0 +1,147 @@
+import asyncio
+import pytest
+from src import metrics
+from src.products import Product, LimitedProduct, NonStockedProduct
+from src.promotions import ThirdOneFree, PercentDiscount
+from src.service import StoreService
+from src.store import Store
+
+
+def test_service_orders_from_many_clients():
+    """
+    Testing StoreService with many simulated clients ordering at the same time
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=1000)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=1000)
+    bose.promotion = ThirdOneFree("Third one free!")
+    best_buy = Store([mac, bose], debug=True)
+
+    async def client(service):
+        prices = []
+        for _ in range(5):
+            prices.append(await service.order([(mac, 1), (bose, 3)]))
+        return prices
+
+    async def run_clients():
+        async with StoreService(best_buy, max_queue_size=10, max_batch_size=20) as service:
+            results = await asyncio.gather(*(client(service) for _ in range(50)))
+            total_quantity = await service.total_quantity()
+        return results, total_quantity, service.stats()
+
+    results, total_quantity, stats = asyncio.run(run_clients())
+    # every order is priced on its own, even when the stock is taken for a whole batch at once
+    assert all(price == 1450 + 500 for prices in results for price in prices)
+    assert mac.quantity == 750
+    assert bose.quantity == 250
+    assert total_quantity == 1000
+    assert stats["completed_orders"] == 250
+    assert stats["failed_orders"] == 0
+    assert stats["batches"] < 250
+    assert stats["p99_latency_ms"] >= stats["p50_latency_ms"] > 0
+    assert stats["orders_per_second"] > 0
+
+
+def test_service_failing_orders():
+    """
+    Testing that invalid orders and orders without enough stock fail without affecting the other orders
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=10)
+    pixel = LimitedProduct("Google Pixel 7", price=500, quantity=250, maximum=1)
+    best_buy = Store([mac, pixel], debug=True)
+
+    async def run_orders():
+        async with StoreService(best_buy) as service:
+            return await asyncio.gather(service.order([(mac, 6)]),
+                                        service.order([(pixel, 2)]),
+                                        service.order([(mac, 6)]),
+                                        service.order([(pixel, 1), (mac, 4)]),
+                                        return_exceptions=True)
+
+    results = asyncio.run(run_orders())
+    assert results[0] == 8700
+    assert "please order a quantity less than 1" in str(results[1])
+    assert "not enough MacBook Air M2 in the warehouse" in str(results[2])
+    assert results[3] == 6300
+    assert mac.quantity == 0
+    assert not mac.active
+    assert best_buy.quantity == 249
+
+    with pytest.raises(Exception, match="the service is not running"):
+        asyncio.run(StoreService(best_buy).order([(pixel, 1)]))
+
+
+def test_service_survives_bad_requests():
+    """
+    Testing that malformed requests only fail themselves and the worker keeps serving orders
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    best_buy = Store([mac])
+
+    async def run():
+        async with StoreService(best_buy, max_batch_size=10) as service:
+            requests = [service.order([(mac, 1)]), service.order([()]), service.order(None),
+                        service.order([(mac,)]), service.order([(mac, 2)])]
+            results = await asyncio.gather(*requests, return_exceptions=True)
+            later_order = await asyncio.wait_for(service.order([(mac, 3)]), timeout=5)
+        return results, later_order
+
+    results, later_order = asyncio.run(run())
+    assert results[0] == 1450 and results[4] == 2900
+    assert all(isinstance(result, Exception) for result in results[1:4])
+    assert later_order == 4350
+    assert mac.quantity == 94
+
+
+def test_promoted_non_stocked_product_prices_agree():
+    """
+    Testing that quote, the batched service and order charge a promoted non-stocked product the same
+    """
+    license_key = NonStockedProduct("Windows License", price=200)
+    license_key.promotion = PercentDiscount("50% off!", percent=50)
+    best_buy = Store([license_key])
+
+    async def run():
+        async with StoreService(best_buy) as service:
+            return await service.order([(license_key, 1)])
+
+    assert license_key.quote(1) == best_buy.quote([(license_key, 1)]) == 200
+    assert asyncio.run(run()) == 200
+    assert best_buy.order([(license_key, 1)]) == 200
+    assert best_buy.order_cents([(license_key, 1)]) == license_key.price_for_cents(1) == 20000
+
+
+def test_batched_orders_are_observed_like_single_orders():
+    """
+    Testing that orders committed together in a batch are announced to the store listeners and counted in the
+    store_order metrics once per order
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=100)
+    best_buy = Store([mac, bose])
+
+    class EventRecorder:
+        def __init__(self):
+            self.events = []
+
+        def store_changed(self, store, event, data):
+            self.events.append((event, list(data)))
+
+    recorder = EventRecorder()
+    best_buy.add_listener(recorder)
+
+    async def run_clients():
+        async with StoreService(best_buy, max_batch_size=10) as service:
+            prices = await asyncio.gather(*(service.order([(mac, 1), (bose, 2)]) for _ in range(5)))
+        return prices, service.stats()
+
+    registry = metrics.enable()
+    try:
+        prices, stats = asyncio.run(run_clients())
+    finally:
+        metrics.disable()
+    assert prices == [1950] * 5
+    assert stats["batches"] < 5
+    assert registry.counter("store_order_total") == 5
+    assert [event for event, _ in recorder.events] == ["order_started"] * 5 + ["order_committed"] * 5
+    assert all(lines == [(mac, 1), (bose, 2)] for _, lines in recorder.events)
+    assert mac.quantity == 95 and bose.quantity == 90
@@ -0,0 +1,61 @@
+import pytest
+from src.products import Product, LimitedProduct, NonStockedProduct
+from src.promotions import SecondHalfPrice
+from src.sharded_store import ShardedStore, shard_of
+
+
+def make_products():
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    mac.promotion = SecondHalfPrice("Second Half price!")
+    return [mac,
+            Product("Bose QuietComfort Earbuds", price=250, quantity=500),
+            Product("Google Pixel 7", price=500, quantity=250),
+            NonStockedProduct("Windows License", price=125),
+            LimitedProduct("Shipping", price=10, quantity=250, maximum=1)]
+
+
+def test_sharded_orders():
+    """
+    Testing single-shard and multi-shard orders of a sharded store
+    """
+    names = [product._name for product in make_products()]
+    assert len({shard_of(name, 3) for name in names}) > 1
+    with ShardedStore(make_products(), shards=3) as store:
+        assert store.shards == 3
+        assert store.quantity == 1100
+        assert sorted(product._name for product in store.products) == sorted(names)
+
+        assert store.order([("MacBook Air M2", 2)]) == 2175
+        assert store.order([("Google Pixel 7", 1), ("Shipping", 1), ("Windows License", 1)]) == 635
+        assert store.quantity == 1096
+
+        # a multi-shard order failing on one shard gives the stock held by the other shards back
+        with pytest.raises(Exception, match="not enough"):
+            store.order([("Bose QuietComfort Earbuds", 10), ("Google Pixel 7", 1000)])
+        with pytest.raises(Exception, match="doesn't exist"):
+            store.order([("Bose QuietComfort Earbuds", 10), ("Galaxy Buds", 1)])
+        assert store.quantity == 1096
+
+        results = store.order_batch([[("Bose QuietComfort Earbuds", 1)], [("Shipping", 2)], [],
+                                     [("MacBook Air M2", 1), ("Google Pixel 7", 1)]])
+        assert results[0] == 250 and results[3] == 1950
+        assert "maximum" in str(results[1]) or "less than" in str(results[1])
+        assert "empty" in str(results[2])
+
+        store.add_product(Product("Galaxy Buds", price=120, quantity=10))
+        assert store.order([("Galaxy Buds", 3), ("Bose QuietComfort Earbuds", 1)]) == 610
+        assert store.quantity == 1096 - 3 + 10 - 4
+
+
+def test_abort_keeps_stock_taken_by_other_orders():
+    """
+    Testing that aborting a multi-shard order only gives back its own held stock
+    """
+    with ShardedStore(make_products(), shards=3) as store:
+        results = store.order_batch([[("MacBook Air M2", 10), ("Bose QuietComfort Earbuds", 1000)],
+                                     [("MacBook Air M2", 5)]])
+        assert "not enough" in str(results[0])
+        assert results[1] == 5800  # second half price
+        assert store.quantity == 1095
+        mac, = [product for product in store.products if product._name == "MacBook Air M2"]
+        assert mac.quantity == 95
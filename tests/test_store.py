@@ -0,0 +1,539 @@
+import threading
+import pytest
+from src.products import Product, LimitedProduct, NonStockedProduct
+from src.promotions import SecondHalfPrice, PercentDiscount
+from src.store import Store, MergedStore
+from src.reservations import Reservations
+from src.quote_cache import default_quote_cache
+
+
+def test_store_membership_and_lookup():
+    """
+    Testing the product index of class Store
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    best_buy = Store([mac, bose])
+
+    assert mac in best_buy
+    assert pixel not in best_buy
+    assert best_buy.get_product(id(bose)) is bose
+    assert best_buy.get_product(id(pixel)) is None
+
+    # adding the same product twice is not allowed
+    best_buy.add_product(pixel)
+    with pytest.raises(Exception, match="product is already in the store"):
+        best_buy.add_product(pixel)
+
+    # the insertion order of the products is kept
+    assert best_buy.products == (mac, bose, pixel)
+
+    best_buy.remove_product(bose)
+    assert bose not in best_buy
+    assert best_buy.products == (mac, pixel)
+
+
+def test_store_active_products():
+    """
+    Testing the cached active products of class Store
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    best_buy = Store([mac, bose, pixel])
+
+    # the same tuple is returned as long as nothing changes
+    products_list = best_buy.products
+    assert products_list is best_buy.products
+    mac.buy(1)
+    assert products_list is best_buy.products
+
+    # a product which is sold out or deactivated disappears from the list
+    bose.buy(500)
+    assert best_buy.products == (mac, pixel)
+    mac.deactivate()
+    assert best_buy.products == (pixel,)
+
+    # a reactivated product keeps its place in the store
+    mac.activate()
+    assert best_buy.products == (mac, pixel)
+
+
+def test_store_add_operator():
+    """
+    Testing the (+) operator of class Store
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    new_store = Store([mac]) + Store([bose])
+
+    assert mac in new_store
+    assert bose in new_store
+    assert new_store.quantity == 600
+
+
+def test_merged_store():
+    """
+    Testing the lazy merged stores created by the (+) operator
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    north, south, west = Store([mac]), Store([bose, mac]), Store([pixel])
+    national = north + south + west
+
+    assert isinstance(national, MergedStore)
+    assert national.stores == (north, south, west)
+    assert list(national) == [mac, bose, pixel]
+    assert national.products == (mac, bose, pixel)
+    assert national.quantity == 850
+
+    # ordering takes the stock from the products, so every member store holding them sees it
+    assert national.order([(mac, 2), (pixel, 1)]) == 3400
+    assert north.quantity == 98 and south.quantity == 598 and west.quantity == 249
+    assert national.quantity == 847
+
+    # an order failing in one member store takes no stock from the others
+    with pytest.raises(Exception, match="not enough"):
+        national.order([(bose, 1), (pixel, 1000)])
+    assert bose.quantity == 500 and pixel.quantity == 249
+
+    # changes of the member stores are seen without merging again
+    earbuds = Product("Galaxy Buds", price=120, quantity=10)
+    west.add_product(earbuds)
+    south.remove_product(mac)
+    assert earbuds in national and mac in national
+    assert national.products == (mac, bose, pixel, earbuds)
+    assert national.quantity == 98 + 500 + 249 + 10
+    with pytest.raises(Exception, match="doesn't exist"):
+        national.order([(Product("Pixel Buds", price=100, quantity=5), 1)])
+
+
+def test_store_total_quantity():
+    """
+    Testing the running total quantity of class Store
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    best_buy = Store([mac, bose], debug=True)
+    assert best_buy.quantity == 600
+
+    mac.buy(10)
+    assert best_buy.quantity == 590
+    bose.quantity = 100
+    assert best_buy.quantity == 190
+    best_buy.add_product(pixel)
+    assert best_buy.quantity == 440
+    best_buy.remove_product(mac)
+    assert best_buy.quantity == 350
+
+    # a removed product doesn't change the total of the store anymore
+    mac.buy(10)
+    assert best_buy.order([(bose, 50), (pixel, 50)]) == 37500
+    assert best_buy.quantity == 250
+
+    # the debug mode detects a total quantity which got out of sync
+    best_buy._total_quantity += 1
+    with pytest.raises(Exception, match="doesn't match the recounted total quantity"):
+        best_buy.quantity
+
+
+def test_store_order_is_all_or_nothing():
+    """
+    Testing that Store.order either buys the whole shopping list or nothing
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    pixel = LimitedProduct("Google Pixel 7", price=500, quantity=250, maximum=1)
+    best_buy = Store([mac, bose, pixel], debug=True)
+
+    # the second pixel line goes over the maximum of the LimitedProduct once the lines are aggregated
+    with pytest.raises(Exception, match="please order a quantity less than 1"):
+        best_buy.order([(mac, 10), (bose, 5), (pixel, 1), (pixel, 1)])
+    assert mac.quantity == 100
+    assert bose.quantity == 500
+    assert pixel.quantity == 250
+
+    # not enough stock for the last line
+    with pytest.raises(Exception, match="not enough Bose QuietComfort Earbuds in the warehouse"):
+        best_buy.order([(mac, 100), (bose, 300), (bose, 300)])
+    assert mac.quantity == 100
+    assert mac.active
+    assert best_buy.quantity == 850
+
+    # lines of the same product are aggregated into a single purchase
+    assert best_buy.order([(mac, 50), (bose, 10), (mac, 50), (pixel, 1)]) == 148000
+    assert mac.quantity == 0
+    assert not mac.active
+    assert best_buy.products == (bose, pixel)
+    assert best_buy.quantity == 739
+
+
+def test_store_order_rolls_back_failed_purchase():
+    """
+    Testing that Store.order gives back the stock already taken when a purchase fails half way
+    """
+    class FailingPromotion(SecondHalfPrice):
+        def apply_promotion(self, product, quantity):
+            raise Exception("promotion failed")
+
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    bose.promotion = FailingPromotion("Broken promotion")
+    best_buy = Store([mac, bose], debug=True)
+
+    with pytest.raises(Exception, match="promotion failed"):
+        best_buy.order([(mac, 100), (bose, 500)])
+    assert mac.quantity == 100
+    assert mac.active
+    assert bose.quantity == 500
+    assert best_buy.products == (mac, bose)
+    assert best_buy.quantity == 600
+
+
+def test_store_concurrent_orders_never_oversell():
+    """
+    Stress test: many threads order from the same thread safe store, no product may be oversold
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=1000)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=1000)
+    pixel = LimitedProduct("Google Pixel 7", price=500, quantity=1000, maximum=2)
+    best_buy = Store([mac, bose, pixel], debug=True, thread_safe=True)
+    successful_orders = []
+
+    def worker(shopping_list, repeat):
+        for _ in range(repeat):
+            try:
+                best_buy.order(shopping_list)
+                successful_orders.append(shopping_list)
+            except Exception:
+                pass
+
+    # the workers order the same products in a different order, which would deadlock without ordered locking
+    threads = [threading.Thread(target=worker, args=([(mac, 3), (bose, 2), (pixel, 1)], 300)),
+               threading.Thread(target=worker, args=([(pixel, 2), (bose, 1), (mac, 1)], 300)),
+               threading.Thread(target=worker, args=([(bose, 5), (mac, 2)], 300)),
+               threading.Thread(target=worker, args=([(mac, 1)], 50))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ordered = {id(mac): 0, id(bose): 0, id(pixel): 0}
+    for shopping_list in successful_orders:
+        for product, amount in shopping_list:
+            ordered[id(product)] += amount
+    for product in (mac, bose, pixel):
+        assert product.quantity >= 0
+        assert product.quantity == 1000 - ordered[id(product)]
+    assert best_buy.quantity == mac.quantity + bose.quantity + pixel.quantity
+
+
+def test_store_name_search():
+    """
+    Testing the exact, prefix and word search of class Store
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    mac_pro = Product("MacBook Pro M2", price=2450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    pixel = LimitedProduct("Google Pixel 7", price=500, quantity=250, maximum=1)
+    best_buy = Store([mac_pro, bose, mac])
+
+    assert best_buy.find_by_name("MacBook Air M2") == [mac]
+    assert best_buy.find_by_name("macbook air m2") == []
+    assert best_buy.find_by_prefix("macbook") == [mac, mac_pro]
+    assert best_buy.find_by_prefix("MACBOOK", limit=1) == [mac]
+    assert best_buy.find_by_prefix("z") == []
+    assert best_buy.find_by_token("pixel") == []
+
+    best_buy.add_product(pixel)
+    assert best_buy.find_by_token("pixel") == [pixel]
+    assert best_buy.find_by_token("M2") == [mac_pro, mac]
+    assert best_buy.find_by_prefix("g") == [pixel]
+
+    best_buy.remove_product(mac)
+    assert best_buy.find_by_name("MacBook Air M2") == []
+    assert best_buy.find_by_prefix("mac") == [mac_pro]
+    assert best_buy.find_by_token("m2") == [mac_pro]
+
+    mac_pro.deactivate()
+    assert best_buy.find_by_prefix("mac", active_only=True) == []
+    assert best_buy.find_by_token("m2", active_only=True) == []
+
+
+def test_store_name_search_non_ascii():
+    """
+    Testing the word and prefix search with names which are not plain ASCII
+    """
+    coffee_machine = Product("Café Crème Maschine", price=300, quantity=10)
+    strasse = Product("Straße Navigator", price=150, quantity=10)
+    best_buy = Store([coffee_machine, strasse])
+
+    assert best_buy.find_by_token("café") == [coffee_machine]
+    assert best_buy.find_by_token("CRÈME") == [coffee_machine]
+    assert best_buy.find_by_token("strasse") == [strasse]
+    assert best_buy.find_by_prefix("CAFÉ") == [coffee_machine]
+    assert best_buy.find_by_prefix("STRASSE") == [strasse]
+
+
+def test_store_price_queries():
+    """
+    Testing the price range and top-N queries of class Store
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    pixel = LimitedProduct("Google Pixel 7", price=500, quantity=250, maximum=1)
+    iphone = Product("iPhone 15", price=900, quantity=10)
+    best_buy = Store([mac, bose, pixel])
+
+    assert best_buy.products_in_price_range(200, 600) == [bose, pixel]
+    assert best_buy.products_in_price_range(min_price=500) == [pixel, mac]
+    assert best_buy.products_in_price_range(max_price=500, limit=1) == [bose]
+    assert best_buy.cheapest_products(2) == [bose, pixel]
+    assert best_buy.most_expensive_products(1) == [mac]
+    assert best_buy.cheapest_products(0) == best_buy.cheapest_products(-1) == []
+    assert best_buy.most_expensive_products(0) == best_buy.most_expensive_products(-1) == []
+
+    best_buy.add_product(iphone)
+    mac.price = 100
+    assert best_buy.cheapest_products(5) == [mac, bose, pixel, iphone]
+
+    # inactive products are skipped
+    iphone.buy(10)
+    pixel.deactivate()
+    assert best_buy.most_expensive_products(2) == [bose, mac]
+    pixel.price = 50
+    pixel.activate()
+    assert best_buy.cheapest_products(1) == [pixel]
+    best_buy.remove_product(pixel)
+    assert best_buy.products_in_price_range() == [mac, bose]
+
+
+def test_store_quote():
+    """
+    Testing that Store.quote prices a shopping list like order() without changing the store
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    bose.promotion = SecondHalfPrice("Second Half price!")
+    pixel = LimitedProduct("Google Pixel 7", price=500, quantity=250, maximum=1)
+    best_buy = Store([mac, bose, pixel])
+    shopping_list = [(mac, 2), (bose, 1), (bose, 1)]
+
+    assert best_buy.quote(shopping_list) == 3275
+    assert best_buy.quantity == 850
+    with pytest.raises(Exception, match="please order a quantity less than 1"):
+        best_buy.quote([(pixel, 2)])
+    assert best_buy.order(shopping_list) == 3275
+
+
+def test_store_reservations():
+    """
+    Testing stock holds with a time to live
+    """
+    now = [0.0]
+    mac = Product("MacBook Air M2", price=1450, quantity=2)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    best_buy = Store([mac, bose])
+    best_buy._reservations = Reservations(best_buy, clock=lambda: now[0])
+
+    first_cart = best_buy.reserve([(mac, 1), (bose, 2)], ttl=60)
+    second_cart = best_buy.reserve([(mac, 1)], ttl=30)
+    assert best_buy.available_quantity(mac) == 0
+    assert mac.quantity == 2
+    # held stock can neither be ordered nor reserved by somebody else
+    with pytest.raises(Exception, match="reserved"):
+        best_buy.order([(mac, 1)])
+    with pytest.raises(Exception, match="reserved"):
+        best_buy.reserve([(mac, 1)], ttl=30)
+    assert best_buy.order([(bose, 498)]) == 124500
+
+    assert best_buy.commit_reservation(first_cart) == 1950
+    assert mac.quantity == 1 and bose.quantity == 0
+    with pytest.raises(Exception, match="already committed"):
+        best_buy.commit_reservation(first_cart)
+
+    # the second hold expires after 30 seconds and its stock can be ordered again
+    now[0] = 31.0
+    assert best_buy.available_quantity(mac) == 1
+    assert best_buy.reservations.expired == 1
+    with pytest.raises(Exception, match="expired"):
+        best_buy.commit_reservation(second_cart)
+    third_cart = best_buy.reserve([(mac, 1)], ttl=30)
+    assert best_buy.release_reservation(third_cart)
+    assert not best_buy.release_reservation(third_cart)
+    assert best_buy.order([(mac, 1)]) == 1450
+
+
+def test_many_reservations_expire_from_the_heap():
+    """
+    Testing that released holds don't pile up in the expiry heap
+    """
+    now = [0.0]
+    mac = Product("MacBook Air M2", price=1450, quantity=10 ** 6)
+    best_buy = Store([mac])
+    reservations = best_buy._reservations = Reservations(best_buy, clock=lambda: now[0])
+    holds = [best_buy.reserve([(mac, 1)], ttl=10 + number % 7) for number in range(5000)]
+    for hold in holds[::2]:
+        best_buy.release_reservation(hold)
+    assert len(reservations) == 2500
+    assert len(reservations._expiry_heap) <= 2 * 2500 + 64
+    assert best_buy.available_quantity(mac) == 10 ** 6 - 2500
+    now[0] = 100.0
+    assert reservations.expire() == 2500 and len(reservations) == 0
+    assert reservations.expired == 2500
+    assert best_buy.available_quantity(mac) == 10 ** 6
+
+
+def test_expire_reads_the_heap_again_under_the_lock():
+    """
+    Testing that expire() works on the current expiry heap when another thread compacted it in between
+    """
+    main_thread = threading.current_thread()
+    now = [0.0]
+    compact_during_peek = [False]
+    mac = Product("MacBook Air M2", price=1450, quantity=1000)
+    best_buy = Store([mac])
+    holds = []
+
+    def clock():
+        if threading.current_thread() is not main_thread:
+            return 0.0  # the other thread doesn't see any hold expire
+        if compact_during_peek[0]:
+            compact_during_peek[0] = False
+            # releasing this hold makes the stale entries the majority, so the heap is rebuilt
+            releasing_thread = threading.Thread(target=reservations.release, args=(holds[82],))
+            releasing_thread.start()
+            releasing_thread.join()
+        return now[0]
+
+    reservations = best_buy._reservations = Reservations(best_buy, clock=clock)
+    holds.extend(best_buy.reserve([(mac, 1)], ttl=10) for _ in range(100))
+    for hold in holds[:82]:
+        best_buy.release_reservation(hold)
+    assert len(reservations._expiry_heap) == 100
+    now[0] = 100.0
+    compact_during_peek[0] = True
+    assert reservations.expire() == 17
+    assert len(reservations) == 0 and reservations._expiry_heap == []
+    assert best_buy.available_quantity(mac) == 1000
+
+
+def test_store_order_in_cents():
+    """
+    Testing exact order totals in the fixed-point pricing mode
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    mac.price_cents = 145099
+    assert mac.price == 1450.99 and mac.price_cents == 145099
+    mac.promotion = PercentDiscount("30% off!", percent=30)
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    bose.promotion = SecondHalfPrice("Second Half price!")
+    shipping = NonStockedProduct("Shipping", price=10)
+    best_buy = Store([mac, bose, shipping])
+
+    # 3 * 1450.99 * 0.7 = 3047.079 -> 3047.08, 3 * 250 - 125 = 625, shipping 10
+    assert best_buy.order_cents([(mac, 3), (bose, 3), (shipping, 1)]) == 368208
+    assert mac.quantity == 97 and bose.quantity == 497
+    with pytest.raises(Exception, match="not enough"):
+        best_buy.order_cents([(bose, 1), (mac, 1000)])
+    assert bose.quantity == 497
+
+
+def test_store_pagination():
+    """
+    Testing the cursor-based pages and the generator listing of class Store
+    """
+    products_list = [Product(f"Product {number:02d}", price=100 - number, quantity=5) for number in range(25)]
+    promotion = SecondHalfPrice("Second Half price!")
+    for product in products_list[::5]:
+        product.promotion = promotion
+    products_list[3].deactivate()
+    best_buy = Store(products_list)
+
+    page, cursor = best_buy.products_page(10)
+    assert page == [product for product in products_list[:11] if product.active]
+    page, cursor = best_buy.products_page(10, cursor)
+    assert page == products_list[11:21]
+    page, cursor = best_buy.products_page(10, cursor)
+    assert page == products_list[21:] and cursor is None
+
+    # sorted pages continue after the last product shown, even when products are added in between
+    page, cursor = best_buy.products_page(4, sort_key="price")
+    assert [product.price for product in page] == [76, 77, 78, 79]
+    best_buy.add_product(Product("Cheap", price=1, quantity=5))
+    best_buy.add_product(Product("Middle", price=80, quantity=5))
+    page, cursor = best_buy.products_page(4, cursor, sort_key="price")
+    assert [product.price for product in page] == [80, 80, 81, 82]
+    with pytest.raises(Exception, match="another sort key"):
+        best_buy.products_page(4, cursor, sort_key="name")
+
+    assert [product._name for product in best_buy.iter_products(sort_key="name", active_only=False)][:5] == \
+        ["Cheap", "Middle", "Product 00", "Product 01", "Product 02"]
+    assert list(best_buy.iter_products(promotion=True)) == products_list[::5]
+    assert list(best_buy.iter_products(promotion=promotion, sort_key="price"))[0] is products_list[20]
+    assert len(list(best_buy.iter_products(promotion=False, active_only=False))) == 22
+
+
+def test_store_rejects_non_positive_lines():
+    """
+    Testing that every line of an order needs an amount larger than 0, before the lines are added up
+    """
+    mac = Product("MacBook Air M2", price=100, quantity=10)
+    pixel = LimitedProduct("Google Pixel 7", price=500, quantity=250, maximum=1)
+    best_buy = Store([mac, pixel])
+    with pytest.raises(Exception, match="larger than 0"):
+        best_buy.order([(mac, 5), (mac, -3)])
+    with pytest.raises(Exception, match="larger than 0"):
+        best_buy.order([(pixel, 1), (pixel, 0)])
+    with pytest.raises(Exception, match="integer"):
+        best_buy.order([(mac, 1.5)])
+    assert mac.quantity == 10 and pixel.quantity == 250
+
+
+def test_store_order_pages_follow_changes():
+    """
+    Testing that pages in store order continue after the last product shown when products are removed or added,
+    and that the listing of all products is only rebuilt after such a change
+    """
+    products_list = [Product(f"Product {number:02d}", price=100, quantity=5) for number in range(12)]
+    best_buy = Store(products_list)
+
+    page, cursor = best_buy.products_page(4, active_only=False)
+    assert page == products_list[:4]
+    listing_view = best_buy._listing_view
+    page, cursor = best_buy.products_page(4, cursor, active_only=False)
+    assert page == products_list[4:8] and best_buy._listing_view is listing_view
+    best_buy.remove_product(products_list[0])
+    best_buy.remove_product(products_list[8])
+    new_product = Product("New Product", price=100, quantity=5)
+    best_buy.add_product(new_product)
+    page, cursor = best_buy.products_page(4, cursor, active_only=False)
+    assert page == products_list[9:] + [new_product] and cursor is None
+
+    # the product of the cursor itself may be gone
+    page, cursor = best_buy.products_page(3)
+    best_buy.remove_product(page[-1])
+    page, cursor = best_buy.products_page(3, cursor)
+    assert page == products_list[4:7]
+
+
+def test_removed_products_leave_the_quote_cache():
+    """
+    Testing that the shared quote cache doesn't keep products alive which were removed from the store
+    """
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    mac.promotion = SecondHalfPrice("Second Half price!")
+    bose = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    best_buy = Store([mac, bose])
+    assert best_buy.quote([(mac, 2), (bose, 3)]) == 2175 + 750
+    assert best_buy.quote([(mac, 4)]) == 4350
+    cached_products = [product for product, _ in default_quote_cache._entries]
+    assert cached_products.count(mac) == 2 and bose in cached_products
+
+    best_buy.remove_product(mac)
+    cached_products = [product for product, _ in default_quote_cache._entries]
+    assert mac not in cached_products and bose in cached_products
+    assert best_buy.quote([(bose, 3)]) == 750